@@ -1,16 +1,19 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox,
-    QDateEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QLabel, QMessageBox, QLineEdit, QHeaderView, QGroupBox,
-    QSpinBox, QInputDialog, QFileDialog
+    QDateEdit, QPushButton, QLabel, QMessageBox, QLineEdit,
+    QGroupBox, QSpinBox, QInputDialog, QFileDialog, QProgressDialog
 )
 from PyQt6.QtCore import QDate, Qt
-import pandas as pd
+from table_models import SqlQueryTableModel, SqlTableView
+from workers import WorkerPool
+from export_engine import ExportEngine, EXPORT_FILE_FILTER, absences_export, export_path
 
 class AbsencesTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        self.workers = WorkerPool()
+        self.exporter = ExportEngine(db_manager)
         self.setup_ui()
         self.load_employees()
         self.load_absences()
@@ -66,13 +69,10 @@ class AbsencesTab(QWidget):
         filter_layout.addWidget(self.month_filter)
         main_layout.addLayout(filter_layout)
         
-        self.absences_table = QTableWidget()
-        self.absences_table.setColumnCount(5)
-        self.absences_table.setHorizontalHeaderLabels([
+        self.absences_model = SqlQueryTableModel(self.db, [
             "الموظف", "التاريخ", "النوع", "المدة", "ملاحظات"
-        ])
-        self.absences_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.absences_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        ], empty_text="لا يوجد سجل غياب")
+        self.absences_table = SqlTableView(self.absences_model)
         
         main_layout.addWidget(QLabel("سجل الغياب:"))
         main_layout.addWidget(self.absences_table)
@@ -106,36 +106,40 @@ class AbsencesTab(QWidget):
 
     def export_absences_month(self, year, month, emp_id=None):
         month_str = f"{year}-{month:02d}"
-        if emp_id:
-            query = """
-                SELECT e.name, a.date, a.type, a.duration, a.notes
-                FROM absences a JOIN employees e ON a.employee_id = e.id
-                WHERE strftime('%Y-%m', a.date) = ? AND a.employee_id = ?
-                ORDER BY a.date ASC
-            """
-            params = (month_str, emp_id)
-        else:
-            query = """
-                SELECT e.name, a.date, a.type, a.duration, a.notes
-                FROM absences a JOIN employees e ON a.employee_id = e.id
-                WHERE strftime('%Y-%m', a.date) = ?
-                ORDER BY a.date ASC
-            """
-            params = (month_str,)
-        self.db.execute_query(query, params, commit=False)
-        absences = self.db.cursor.fetchall()
-        if not absences:
-            QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر.")
+        self.start_export(
+            absences_export(month_str, emp_id),
+            "حفظ تقرير الغياب",
+            "لا يوجد غياب لهذا الشهر.",
+            "تم حفظ التقرير بنجاح."
+        )
+
+    def start_export(self, export_query, dialog_title, empty_message, done_message):
+        """اختيار ملف التصدير ثم كتابته في الخلفية مع نافذة تقدم قابلة للإلغاء"""
+        if not self.exporter.count_rows(export_query):
+            QMessageBox.information(self, "لا يوجد بيانات", empty_message)
             return
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "حفظ تقرير الغياب", f"absences_{month_str}.xlsx", "Excel Files (*.xlsx)"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, dialog_title, f"absences_{export_query.sheet_name}.xlsx", EXPORT_FILE_FILTER
         )
         if not file_path:
             return
-        df = pd.DataFrame(absences, columns=['الموظف', 'التاريخ', 'النوع', 'المدة', 'ملاحظات'])
-        df.to_excel(file_path, index=False)
-        QMessageBox.information(self, "تم", "تم حفظ التقرير بنجاح.")
+        file_path = export_path(file_path, selected_filter)
 
+        progress_dialog = QProgressDialog("جاري التصدير...", "إلغاء", 0, 100, self)
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+        worker = self.workers.start(
+            lambda worker: self.exporter.export(
+                export_query, file_path,
+                progress=worker.report_progress,
+                check_cancelled=worker.check_cancelled
+            ),
+            on_progress=lambda value, message: (progress_dialog.setValue(value), progress_dialog.setLabelText(message)),
+            on_result=lambda count: QMessageBox.information(self, "تم", done_message),
+            on_error=lambda message: QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {message}"),
+            on_finished=progress_dialog.close
+        )
+        progress_dialog.canceled.connect(worker.cancel)
 
     def load_employees(self):
         try:
@@ -222,36 +226,18 @@ class AbsencesTab(QWidget):
         """تحميل سجل الغياب وعرضه في الجدول حسب الشهر المحدد"""
         try:
             filter_month = self.month_filter.currentData()
+            query = (
+                "SELECT e.name, a.date, a.type, a.duration, a.notes "
+                "FROM absences a JOIN employees e ON a.employee_id = e.id"
+            )
             if filter_month:
-                self.db.execute_query(
-                    "SELECT e.name, a.date, a.type, a.duration, a.notes "
-                    "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                    "WHERE strftime('%Y-%m', a.date) = ? "
-                    "ORDER BY a.date DESC, e.name ASC",
+                self.absences_model.set_query(
+                    query + " WHERE a.year_month = ?",
                     (filter_month,),
-                    commit=False
+                    order_by="a.date DESC, e.name ASC"
                 )
             else:
-                self.db.execute_query(
-                    "SELECT e.name, a.date, a.type, a.duration, a.notes "
-                    "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                    "ORDER BY a.date DESC, e.name ASC",
-                    commit=False
-                )
-            absences = self.db.cursor.fetchall()
-            self.absences_table.setRowCount(len(absences) if absences else 1)
-            if not absences:
-                empty_item = QTableWidgetItem("لا يوجد سجل غياب")
-                empty_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.absences_table.setItem(0, 0, empty_item)
-                self.absences_table.setSpan(0, 0, 1, self.absences_table.columnCount())
-                return
-            for row_idx, (name, date, abs_type, duration, notes) in enumerate(absences):
-                self.absences_table.setItem(row_idx, 0, QTableWidgetItem(name))
-                self.absences_table.setItem(row_idx, 1, QTableWidgetItem(date))
-                self.absences_table.setItem(row_idx, 2, QTableWidgetItem(abs_type))
-                self.absences_table.setItem(row_idx, 3, QTableWidgetItem(str(duration)))
-                self.absences_table.setItem(row_idx, 4, QTableWidgetItem(notes))
+                self.absences_model.set_query(query, order_by="a.date DESC, e.name ASC")
         except Exception as e:
             QMessageBox.critical(
                 self,
@@ -260,32 +246,17 @@ class AbsencesTab(QWidget):
             )
 
     def export_month_absences(self):
-        """تصدير سجل الغياب لشهر محدد إلى Excel"""
-        import pandas as pd
+        """تصدير سجل الغياب للشهر المعروض"""
         filter_month = self.month_filter.currentData()
         if not filter_month:
             QMessageBox.warning(self, "تنبيه", "يرجى اختيار شهر أولا")
             return
         try:
-            self.db.execute_query(
-                "SELECT e.name, a.date, a.type, a.duration, a.notes "
-                "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                "WHERE strftime('%Y-%m', a.date) = ? "
-                "ORDER BY a.date DESC, e.name ASC",
-                (filter_month,),
-                commit=False
+            self.start_export(
+                absences_export(filter_month, newest_first=True),
+                "تصدير سجل الغياب",
+                "لا يوجد غياب لهذا الشهر",
+                "تم التصدير بنجاح"
             )
-            absences = self.db.cursor.fetchall()
-            if not absences:
-                QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر")
-                return
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "تصدير سجل الغياب", f"absences_{filter_month}.xlsx", "Excel Files (*.xlsx)"
-            )
-            if not file_path:
-                return
-            df = pd.DataFrame(absences, columns=["الموظف", "التاريخ", "النوع", "المدة", "ملاحظات"])
-            df.to_excel(file_path, index=False)
-            QMessageBox.information(self, "تم", "تم التصدير بنجاح")
         except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {str(e)}")
\ No newline at end of file
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {str(e)}")
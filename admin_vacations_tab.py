@@ -1,7 +1,10 @@
 from approval_flow import ApprovalFlow
+from table_models import SqlQueryTableModel, SqlTableView, StatusColorDelegate
+from vacation_ledger import VacationLedger
+from database_queries import DatabaseQueries
+from staffing_rules import StaffingRules
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
-    QPushButton, QMessageBox, QHeaderView
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox
 )
 from PyQt6.QtCore import QTimer
 
@@ -11,7 +14,11 @@ class AdminVacationsTab(QWidget):
         self.db = db_manager
         self.approval_flow = ApprovalFlow(db_manager)
 
-        self.table = QTableWidget()
+        self.model = SqlQueryTableModel(db_manager, [
+            "ID", "اسم الموظف", "القسم", "نوع الإجازة", "من", "إلى", "المدة", "الحالة"
+        ])
+        self.table = SqlTableView(self.model)
+        self.table.setItemDelegate(StatusColorDelegate(7, parent=self.table))
         self.refresh_btn = QPushButton("تحديث")
         self.approve_btn = QPushButton("موافقة")
         self.reject_btn = QPushButton("رفض")
@@ -31,12 +38,6 @@ class AdminVacationsTab(QWidget):
         btn_layout.addWidget(self.approve_btn)
         btn_layout.addWidget(self.reject_btn)
 
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels([
-            "ID", "اسم الموظف", "القسم", "نوع الإجازة", "من", "إلى", "المدة", "الحالة"
-        ])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
 
         layout.addLayout(btn_layout)
         layout.addWidget(QLabel("طلبات الإجازة بانتظار موافقة المدير:"))
@@ -49,24 +50,18 @@ class AdminVacationsTab(QWidget):
         self.reject_btn.clicked.connect(self.reject_vacation)
 
     def load_vacations(self):
-        self.db.execute_query("""
+        self.model.set_query("""
             SELECT v.id, e.name, e.department, v.type, v.start_date, v.end_date, v.duration, v.status
             FROM vacations v
             JOIN employees e ON v.employee_id = e.id
             WHERE v.status = 'بانتظار موافقة المدير'
-            ORDER BY v.created_at DESC
-        """)
-        vacations = self.db.cursor.fetchall()
-        self.vacations_table.setRowCount(len(vacations))
-        for row_idx, row in enumerate(vacations):
-            for col_idx, value in enumerate(row):
-                self.vacations_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
+        """, order_by="v.created_at DESC")
 
     def get_selected_vacation_id(self):
-        row = self.table.currentRow()
-        if row < 0:
+        values = self.model.row_values(self.table.currentIndex().row())
+        if values is None:
             return None
-        return int(self.table.item(row, 0).text())
+        return values[0]
 
 
     def approve_vacation(self):
@@ -92,15 +87,17 @@ class AdminVacationsTab(QWidget):
             if duration > balance:
                 QMessageBox.warning(self, "خطأ", "رصيد الإجازات غير كافٍ للموافقة على الطلب.")
                 return
-            self.db.execute_query(
-                "UPDATE employees SET vacation_balance = vacation_balance - ? WHERE id=?",
-                (duration, emp_id)
-            )
 
-        self.db.execute_query(
-            "UPDATE vacations SET status='موافق' WHERE id=?",
-            (vac_id,)
-        )
+        try:
+            with self.db.transaction() as conn:
+                # الحالة المقروءة أعلاه قد تكون قديمة، فلا يُخصم الرصيد إلا إذا نجح تغييرها هنا
+                DatabaseQueries.change_status(conn, vac_id, "بانتظار موافقة المدير", "موافق")
+                StaffingRules.check(conn, vac_id)
+                if vac_type == "سنوية":
+                    VacationLedger.deduct(conn, emp_id, duration, vac_id)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"تعذرت الموافقة على الإجازة:\n{str(e)}")
+            return
 
         # إشعار الموظف بالموافقة
         self.notify_employee_status(emp_id, vac_id, approved=True)
@@ -125,10 +122,12 @@ class AdminVacationsTab(QWidget):
             QMessageBox.warning(self, "خطأ", "لا يمكن رفض إلا الطلبات بانتظار موافقة المدير.")
             return
 
-        self.db.execute_query(
-            "UPDATE vacations SET status='مرفوض من المدير', seen_by_admin=0 WHERE id=?",
-            (vac_id,)
-        )
+        try:
+            with self.db.transaction() as conn:
+                DatabaseQueries.change_status(conn, vac_id, "بانتظار موافقة المدير", "مرفوض من المدير", seen_by_admin=0)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"تعذر رفض الإجازة:\n{str(e)}")
+            return
 
         self.notify_employee_status(emp_id, vac_id, approved=False)
         QMessageBox.information(self, "تم الرفض", "تم رفض الإجازة بنجاح.")
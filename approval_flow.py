@@ -14,8 +14,11 @@ class ApprovalFlow:
         if vacation["status"] != "بانتظار موافقة رئيس القسم":
             return False, "لا يمكن الموافقة إلا على الطلبات بانتظار موافقة رئيس القسم."
 
-        # تحديث حالة الإجازة
-        self.db.update_vacation_status(vacation_id, "بانتظار موافقة المدير")
+        # تحديث حالة الإجازة بعد فحص حدود الحضور الدنيا للقسم
+        try:
+            self.db.approve_by_head(vacation_id)
+        except Exception as e:
+            return False, str(e)
 
         # إرسال إشعار للمدير
         manager_id = self.db.get_manager_id()
@@ -41,7 +44,10 @@ class ApprovalFlow:
             return False, "لا يمكن رفض إلا الطلبات بانتظار موافقة رئيس القسم."
 
         # تحديث حالة الإجازة
-        self.db.update_vacation_status(vacation_id, "مرفوض من رئيس القسم", reason)
+        try:
+            self.db.update_vacation_status(vacation_id, "مرفوض من رئيس القسم", reason, expected="بانتظار موافقة رئيس القسم")
+        except Exception as e:
+            return False, str(e)
 
         # إرسال إشعار للموظف
         msg = (
@@ -63,14 +69,16 @@ class ApprovalFlow:
         if vacation["status"] != "بانتظار موافقة المدير":
             return False, "لا يمكن الموافقة إلا على الطلبات بانتظار موافقة المدير."
 
-        # خصم الرصيد إذا كانت الإجازة سنوية
+        # خصم الرصيد إذا كانت الإجازة سنوية، مع تحديث الحالة في نفس المعاملة
+        deduct_days = 0
         if vacation["type"] == "سنوية":
             if vacation["duration"] > vacation["employee_balance"]:
                 return False, "رصيد الإجازات غير كافٍ للموافقة على الطلب."
-            self.db.update_employee_balance(vacation["employee_id"], -vacation["duration"])
-
-        # تحديث حالة الإجازة
-        self.db.update_vacation_status(vacation_id, "موافق")
+            deduct_days = vacation["duration"]
+        try:
+            self.db.approve_vacation(vacation_id, vacation["employee_id"], deduct_days)
+        except Exception as e:
+            return False, str(e)
 
         # إرسال إشعار للموظف
         msg = (
@@ -92,7 +100,10 @@ class ApprovalFlow:
             return False, "لا يمكن رفض إلا الطلبات بانتظار موافقة المدير."
 
         # تحديث حالة الإجازة
-        self.db.update_vacation_status(vacation_id, "مرفوض من المدير", reason)
+        try:
+            self.db.update_vacation_status(vacation_id, "مرفوض من المدير", reason, expected="بانتظار موافقة المدير")
+        except Exception as e:
+            return False, str(e)
 
         # إرسال إشعار للموظف
         msg = (
@@ -0,0 +1,38 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class AsyncDatabase:
+    """واجهة غير متزامنة لقاعدة البيانات حتى لا تتوقف حلقة أحداث البوت أثناء الاستعلامات"""
+
+    def __init__(self, db_manager, max_workers=4):
+        self.db = db_manager
+        # كل خيط في المنفذ يحصل على اتصاله الخاص من مجمع DatabaseManager
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-db")
+
+    async def run(self, func, *args, **kwargs):
+        """تشغيل دالة متزامنة على منفذ قاعدة البيانات وانتظار نتيجتها"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def execute(self, query, params=(), commit=True):
+        return await self.run(self.db.execute_query, query, params, commit)
+
+    async def fetchone(self, query, params=()):
+        result = await self.execute(query, params, commit=False)
+        return result.fetchone()
+
+    async def fetchall(self, query, params=()):
+        result = await self.execute(query, params, commit=False)
+        return result.fetchall()
+
+    async def transaction(self, func, *args):
+        """تنفيذ func(conn, *args) داخل معاملة كتابة واحدة وإرجاع نتيجتها"""
+        def run_in_transaction():
+            with self.db.transaction() as conn:
+                return func(conn, *args)
+        return await self.run(run_in_transaction)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+
+class BackupManager:
+    """نسخ احتياطي متزايد لقاعدة البيانات عبر واجهة SQLite للنسخ المباشر"""
+
+    BACKUP_PREFIX = "backup_"
+    BACKUP_SUFFIX = ".db.gz"
+
+    def __init__(self, db_path, backup_dir, keep_last=10, pages_per_step=256, step_sleep=0.005):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep_last = keep_last
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self._source = None
+        self._last_data_version = None
+
+    def _source_connection(self):
+        # اتصال ثابت للقراءة فقط، حتى يعكس data_version تعديلات الاتصالات الأخرى
+        if self._source is None:
+            self._source = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._source
+
+    def has_changes(self):
+        """هل تغيرت القاعدة منذ آخر نسخة أخذت في هذه الجلسة"""
+        version = self._source_connection().execute("PRAGMA data_version").fetchone()[0]
+        return self._last_data_version is None or version != self._last_data_version
+
+    def create_backup(self, force=False):
+        """أخذ نسخة مضغوطة إذا تغيرت البيانات، وإرجاع مسارها أو None عند التخطي"""
+        if not force and not self.has_changes():
+            return None
+        os.makedirs(self.backup_dir, exist_ok=True)
+        source = self._source_connection()
+        version = source.execute("PRAGMA data_version").fetchone()[0]
+
+        temp_path = os.path.join(self.backup_dir, f".{self.BACKUP_PREFIX}in_progress.db")
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                # نسخ الصفحات على دفعات يتيح للكتّاب العمل بين الخطوات
+                source.backup(target, pages=self.pages_per_step, sleep=self.step_sleep)
+            finally:
+                target.close()
+
+            digest = self.file_hash(temp_path)
+            if not force and digest == self.latest_hash():
+                self._last_data_version = version
+                return None
+
+            name = f"{self.BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}{self.BACKUP_SUFFIX}"
+            backup_path = os.path.join(self.backup_dir, name)
+            with open(temp_path, 'rb') as src, gzip.open(backup_path, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            with open(backup_path + ".sha256", 'w', encoding='utf-8') as f:
+                f.write(digest)
+            self._last_data_version = version
+            self.apply_retention()
+            return backup_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def list_backups(self):
+        """قائمة النسخ المضغوطة مرتبة من الأقدم إلى الأحدث"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = sorted(
+            name for name in os.listdir(self.backup_dir)
+            if name.startswith(self.BACKUP_PREFIX) and name.endswith(self.BACKUP_SUFFIX)
+        )
+        return [os.path.join(self.backup_dir, name) for name in names]
+
+    def latest_hash(self):
+        backups = self.list_backups()
+        if not backups:
+            return None
+        try:
+            with open(backups[-1] + ".sha256", encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def apply_retention(self):
+        """حذف النسخ الأقدم والإبقاء على آخر keep_last نسخة"""
+        backups = self.list_backups()
+        for path in backups[:max(0, len(backups) - self.keep_last)]:
+            for stale in (path, path + ".sha256"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    @staticmethod
+    def file_hash(path):
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
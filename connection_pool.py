@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+import weakref
+
+
+class QueryResult:
+    """نتيجة استعلام مجلوبة بالكامل، مستقلة عن أي مؤشر مشترك"""
+
+    def __init__(self, rows, description=None, lastrowid=None, rowcount=-1):
+        self.rows = rows
+        self.description = description
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self.rows):
+            return None
+        row = self.rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self.rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.rows[self._position:]
+        self._position = len(self.rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class _ThreadConnection:
+    """حامل اتصال الخيط في بياناته المحلية؛ يُحرَّر مع بيانات الخيط عند انتهائه"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """مجمع اتصالات يعطي كل خيط اتصالاً خاصاً به بقاعدة البيانات"""
+
+    def __init__(self, db_path, setup=None):
+        self.db_path = db_path
+        self.setup = setup
+        self._local = threading.local()
+        self._connections = {}
+        # قابل لإعادة الدخول لأن الإغلاق قد يُستدعى من جامع المهملات أثناء الإمساك بالقفل
+        self._lock = threading.RLock()
+
+    def get_connection(self):
+        """إرجاع اتصال الخيط الحالي وإنشاؤه عند أول استخدام"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = self._connect()
+            ident = threading.get_ident()
+            holder = _ThreadConnection(conn)
+            self._local.holder = holder
+            with self._lock:
+                self._connections[ident] = conn
+            # خيوط Qt والخيوط غير المنشأة من بايثون تظهر كـ _DummyThread ولا تنتهي أبداً في نظر threading،
+            # لذلك يُغلق الاتصال عند تحرير بيانات الخيط المحلية بدل فحص is_alive()
+            weakref.finalize(holder, self._release, ident, conn)
+        return holder.conn
+
+    def _connect(self):
+        # الاتصال لا يُستخدم إلا من خيطه، والسماح بالخيوط الأخرى لأجل الإغلاق فقط
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.setup:
+            self.setup(conn)
+        return conn
+
+    def _release(self, ident, conn):
+        """إغلاق اتصال خيط منتهٍ وإزالته من السجل إن لم يحل محله اتصال آخر بنفس المعرف"""
+        with self._lock:
+            if self._connections.get(ident) is conn:
+                del self._connections[ident]
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """إغلاق جميع الاتصالات المفتوحة"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
@@ -1,196 +1,306 @@
-import sys
 import sqlite3
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
 from PyQt6.QtCore import QDate  
-from threading import Lock
-from datetime import datetime
+from connection_pool import ConnectionPool, QueryResult
+from db_retry import RetryPolicy, LockWaitStats, is_lock_error
+from backup import BackupManager
+from migrations import run_migrations
+from query_stats import QueryInstrumentation, TimedConnection
+from vacation_ledger import VacationLedger
+from staffing_rules import StaffingRules
+from database_queries import DatabaseQueries
+
+READ_PREFIXES = ("SELECT", "EXPLAIN", "VALUES")
+# كلمات الكتابة بعد إزالة النصوص الحرفية، لتمييز WITH ... INSERT/UPDATE/DELETE عن WITH ... SELECT
+WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE)\b")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# تفعيل قياس الاستعلامات دون تعديل الكود: MIZRAN_QUERY_STATS=1 وحد البطء اختيارياً MIZRAN_SLOW_QUERY_MS=100
+QUERY_STATS_ENV = "MIZRAN_QUERY_STATS"
+SLOW_QUERY_MS_ENV = "MIZRAN_SLOW_QUERY_MS"
+PENDING_STATUSES = ("بانتظار موافقة رئيس القسم", "بانتظار موافقة المدير")
+
+
+
+def is_read_query(query):
+    """هل العبارة قراءة فقط فلا تحتاج حجز قفل الكتابة (BEGIN IMMEDIATE)"""
+    text = query.lstrip().upper()
+    if text.startswith(READ_PREFIXES):
+        return True
+    if text.startswith("PRAGMA"):
+        # PRAGMA name = value تعدّل الإعداد، وPRAGMA name أو name(arg) قراءة
+        return "=" not in text
+    if text.startswith("WITH"):
+        return not WRITE_KEYWORDS.search(STRING_LITERAL.sub("''", text))
+    return False
+
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), 'employees.db')
-        self.connection_lock = Lock()
-        self.conn = None
-        self.cursor = None
+    def __init__(self, journal_mode="WAL", busy_timeout=5000, max_retries=5, db_path=None):
+        # ملف القاعدة بجوار البرنامج افتراضياً، ويمكن تمرير مسار آخر (كما في الاختبارات)
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), 'employees.db')
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.lock_stats = LockWaitStats()
+        self.instrumentation = None
+        self.backup_manager = BackupManager(
+            self.db_path,
+            os.path.join(os.path.dirname(self.db_path), 'backups')
+        )
+        self.pool = None
+        self._local = threading.local()
         self.initialize_connection()
         self.initialize_database()
-        self.create_indexes()
+        if os.environ.get(QUERY_STATS_ENV, "").strip() not in ("", "0"):
+            self.enable_instrumentation(
+                slow_threshold_ms=float(os.environ.get(SLOW_QUERY_MS_ENV) or 100),
+                slow_log_path=os.path.join(os.path.dirname(__file__), 'slow_queries.log')
+            )
 
     def initialize_connection(self):
-        """تهيئة اتصال قاعدة البيانات"""
+        """تهيئة مجمع اتصالات قاعدة البيانات"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.execute("PRAGMA foreign_keys = ON")
-            self.cursor = self.conn.cursor()
+            self.pool = ConnectionPool(self.db_path, setup=self.configure_connection)
+            conn = self.pool.get_connection()
+            if self.journal_mode:
+                # وضع WAL يُحفظ في ملف القاعدة نفسه، لذا يكفي ضبطه مرة واحدة
+                self.retry_policy.run(
+                    lambda: conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+                )
         except sqlite3.Error as e:
             print(f"فشل في الاتصال بقاعدة البيانات: {e}")
             raise
 
-    def initialize_database(self):
-        """إنشاء الجداول إذا لم تكن موجودة"""
-        tables = [
-            """CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                serial_number TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                national_id TEXT UNIQUE NOT NULL,
-                department TEXT,
-                job_grade TEXT,
-                hiring_date TEXT,
-                grade_date TEXT,
-                bonus INTEGER DEFAULT 0,
-                vacation_balance INTEGER DEFAULT 30,
-                work_days TEXT,
-                telegram_user_id TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS departments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS vacations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                type TEXT NOT NULL,
-                subtype TEXT,
-                relation TEXT, 
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                duration INTEGER NOT NULL,
-                notes TEXT,
-                status TEXT DEFAULT 'تحت الإجراء',
-                approved_by TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-            )""",
-            """CREATE TABLE IF NOT EXISTS department_heads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                department TEXT NOT NULL,
-                phone_number TEXT,
-                telegram_user_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees (id)
-            )""",
-            """CREATE TABLE IF NOT EXISTS absences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                type TEXT NOT NULL,
-                duration INTEGER DEFAULT 1,
-                notes TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
-                UNIQUE(employee_id, date)
-            )""",
-            """CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action TEXT NOT NULL,
-                table_name TEXT NOT NULL,
-                record_id INTEGER,
-                changes TEXT,
-                user TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )"""
-        ]
+    def configure_connection(self, conn):
+        """ضبط إعدادات كل اتصال جديد في المجمع"""
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        if self.journal_mode and self.journal_mode.upper() == "WAL":
+            conn.execute("PRAGMA synchronous = NORMAL")
 
+    @property
+    def conn(self):
+        """اتصال الخيط الحالي"""
+        return self.pool.get_connection() if self.pool else None
+
+    @property
+    def cursor(self):
+        """آخر نتيجة استعلام في الخيط الحالي (للتوافق مع الاستدعاءات القديمة)"""
+        return getattr(self._local, 'last_result', None)
+
+    def initialize_database(self):
+        """تطبيق ترحيلات المخطط المعلقة (لا شيء إذا كان المخطط محدثاً)"""
+        conn = self.conn
         try:
-            for table in tables:
-                self.cursor.execute(table)
-            
-            # إضافة الأقسام الافتراضية
-            default_depts = [
-                'الإدارة', 'التمريض', 
-                'المحاسبة', 'المختبر', 
-                'الصيدلة'
-            ]
-            
-            insert_query = """
-                INSERT OR IGNORE INTO departments 
-                (name) VALUES (?)
-            """
-            
-            for dept in default_depts:
-                self.cursor.execute(insert_query, (dept,))
-            
-            self.conn.commit()
+            self.retry_policy.run(lambda: run_migrations(conn), on_retry=lambda attempt, e: self.on_lock_retry(conn))
         except sqlite3.Error as e:
-            print(f"خطأ في إنشاء الجداول: {e}")
-            self.conn.rollback()
+            print(f"خطأ في تحديث مخطط قاعدة البيانات: {e}")
             raise
 
-    def create_indexes(self):
-        """إنشاء الفهارس لتحسين الأداء"""
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_emp_national_id ON employees(national_id)",
-            "CREATE INDEX IF NOT EXISTS idx_emp_department ON employees(department)",
-            "CREATE INDEX IF NOT EXISTS idx_vacations_employee ON vacations(employee_id)",
-            "CREATE INDEX IF NOT EXISTS idx_vacations_date ON vacations(start_date, end_date)",
-            "CREATE INDEX IF NOT EXISTS idx_absences_employee_date ON absences(employee_id, date)"
-        ]
-        
+    def execute_query(self, query, params=(), commit=True):
+        """تنفيذ استعلام على اتصال الخيط الحالي وإرجاع نتيجته مجلوبة"""
+        conn = self.conn
+        processed_params = self.convert_params(params)
+        is_write = not is_read_query(query)
+        started = time.perf_counter()
+
+        def run():
+            if is_write and not conn.in_transaction:
+                self.begin_write(conn, started)
+            if self.instrumentation:
+                result = self.instrumentation.timed(
+                    conn, query, processed_params,
+                    lambda: self.fetch_result(conn, query, processed_params)
+                )
+            else:
+                result = self.fetch_result(conn, query, processed_params)
+            if commit:
+                conn.commit()
+            return result
+
         try:
-            for index in indexes:
-                self.cursor.execute(index)
-            self.conn.commit()
+            if conn.in_transaction:
+                # لا يمكن إعادة عبارة منفردة داخل معاملة مفتوحة دون فقدان ما سبقها
+                result = run()
+            else:
+                result = self.retry_policy.run(run, on_retry=lambda attempt, e: self.on_lock_retry(conn))
+            self._local.last_result = result
+            return result
         except sqlite3.Error as e:
-            print(f"خطأ في إنشاء الفهارس: {e}")
+            conn.rollback()
+            if is_lock_error(e):
+                self.lock_stats.record_failure()
+                raise Exception("قاعدة البيانات مشغولة حالياً، الرجاء المحاولة بعد قليل")
+            raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
 
-    def execute_query(self, query, params=(), commit=True):
-        """تنفيذ استعلام مع معالجة الأخطاء"""
-        with self.connection_lock:
-            try:
-                # تحويل التواريخ من QDate إلى نص
-                processed_params = []
-                for param in params:
-                    if isinstance(param, QDate):
-                        processed_params.append(param.toString("yyyy-MM-dd"))
-                    else:
-                        processed_params.append(param)
-                
-                result = self.cursor.execute(query, processed_params)
-                if commit:
-                    self.conn.commit()
-                return result
-            except sqlite3.Error as e:
-                self.conn.rollback()
-                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+    @staticmethod
+    def convert_params(params):
+        """تحويل التواريخ من QDate إلى نص"""
+        processed_params = []
+        for param in params:
+            if isinstance(param, QDate):
+                processed_params.append(param.toString("yyyy-MM-dd"))
+            else:
+                processed_params.append(param)
+        return processed_params
+
+    def open_reader(self):
+        """اتصال قراءة فقط مستقل عن مجمع الاتصالات"""
+        # لقطة القراءة المفتوحة تبقى على هذا الاتصال فلا تعيق كتابات اتصال الخيط
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.configure_connection(conn)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def read_snapshot(self):
+        """معاملة قراءة واحدة: كل الاستعلامات داخلها ترى نفس حالة القاعدة"""
+        conn = self.open_reader()
+        try:
+            conn.execute("BEGIN")
+            # أول قراءة تثبت اللقطة، وكتابات الآخرين بعدها لا تظهر حتى نهاية المعاملة
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield TimedConnection(conn, self.instrumentation) if self.instrumentation else conn
+        finally:
+            conn.rollback()
+            conn.close()
+
+    def stream_query(self, query, params=(), batch_size=500):
+        """قراءة نتيجة استعلام على دفعات عبر اتصال قراءة مستقل"""
+        conn = self.open_reader()
+        instrumentation = self.instrumentation
+        params = self.convert_params(params)
+        # الزمن داخل SQLite فقط (التنفيذ وجلب الدفعات)، دون وقت معالجة المستدعي بين الدفعات
+        elapsed = 0.0
+        try:
+            started = time.perf_counter()
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                yield rows
+                started = time.perf_counter()
+        except sqlite3.Error as e:
+            raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+        finally:
+            if instrumentation:
+                instrumentation.observe(conn, query, params, elapsed)
+            conn.close()
+
+    @staticmethod
+    def fetch_result(conn, query, params):
+        cursor = conn.execute(query, params)
+        result = QueryResult(
+            cursor.fetchall(),
+            cursor.description,
+            cursor.lastrowid,
+            cursor.rowcount
+        )
+        cursor.close()
+        return result
+
+    def change_version(self, name):
+        """قيمة عداد تغييرات تزيده القوادح (مثل employee_roster و employee_listing) عند تعديل ما يخصه"""
+        row = self.execute_query(
+            "SELECT version FROM change_counters WHERE name = ?", (name,), commit=False
+        ).fetchone()
+        return row[0] if row else None
+
+    def enable_instrumentation(self, slow_threshold_ms=100, slow_log_path="slow_queries.log"):
+        """تفعيل قياس زمن الاستعلامات وسجل الاستعلامات البطيئة"""
+        self.instrumentation = QueryInstrumentation(slow_threshold_ms, slow_log_path, lock_stats=self.lock_stats)
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    def export_query_stats(self, directory=None):
+        """كتابة إحصائيات الاستعلامات وانتظار القفل إلى query_stats.csv وlock_waits.csv إذا كان القياس مفعلاً"""
+        if not self.instrumentation:
+            return False
+        directory = directory or os.path.dirname(__file__)
+        try:
+            self.instrumentation.export_csv(os.path.join(directory, 'query_stats.csv'))
+            self.instrumentation.export_lock_waits_csv(os.path.join(directory, 'lock_waits.csv'))
+            return True
+        except OSError as e:
+            print(f"فشل في حفظ إحصائيات الاستعلامات: {e}")
+            return False
 
+    def begin_write(self, conn, started=None):
+        """حجز قفل الكتابة وتسجيل مدة الانتظار عليه منذ أول محاولة"""
+        if started is None:
+            started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        self.lock_stats.record_wait(time.perf_counter() - started)
+
+    def on_lock_retry(self, conn):
+        self.lock_stats.record_retry()
+        if conn.in_transaction:
+            conn.rollback()
+
+    @contextmanager
+    def transaction(self):
+        """معاملة كتابة على اتصال الخيط الحالي مع حجز قفل الكتابة من البداية"""
+        conn = self.conn
+        started = time.perf_counter()
+        try:
+            self.retry_policy.run(lambda: self.begin_write(conn, started), on_retry=lambda attempt, e: self.on_lock_retry(conn))
+        except sqlite3.OperationalError as e:
+            if is_lock_error(e):
+                self.lock_stats.record_failure()
+                raise Exception("قاعدة البيانات مشغولة حالياً، الرجاء المحاولة بعد قليل")
+            raise
+        try:
+            yield TimedConnection(conn, self.instrumentation) if self.instrumentation else conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def vacation_status_count(self, statuses=PENDING_STATUSES, department=None):
+        """عدد الإجازات في الحالات المحددة من جدول العدادات دون مسح جدول الإجازات"""
+        placeholders = ", ".join("?" for _ in statuses)
+        query = f"SELECT COALESCE(SUM(count), 0) FROM vacation_counters WHERE status IN ({placeholders})"
+        params = list(statuses)
+        if department is not None:
+            query += " AND department = ?"
+            params.append(department)
+        return self.execute_query(query, params, commit=False).fetchone()[0]
 
     def approve_vacation_by_head(self, vacation_id, approved, notes="", approved_by=None):
-        with self.connection_lock:
-            try:
-                self.cursor.execute("SELECT status FROM vacations WHERE id=?", (vacation_id,))
-                result = self.cursor.fetchone()
+        try:
+            with self.transaction() as conn:
+                result = conn.execute("SELECT status FROM vacations WHERE id=?", (vacation_id,)).fetchone()
                 if not result:
                     raise Exception("طلب الإجازة غير موجود")
                 current_status = result[0]
                 if current_status != "بانتظار موافقة رئيس القسم":
                     raise Exception("لا يمكن اعتماد هذا الطلب إلا من قبل رئيس القسم في مرحلته الصحيحة")
                 if approved:
-                    self.cursor.execute(
-                        "UPDATE vacations SET status='بانتظار موافقة المدير', approved_by=? WHERE id=?",
-                        (approved_by, vacation_id)
+                    DatabaseQueries.change_status(
+                        conn, vacation_id, current_status, "بانتظار موافقة المدير", approved_by=approved_by
                     )
+                    StaffingRules.check(conn, vacation_id)
                 else:
-                    self.cursor.execute(
-                        "UPDATE vacations SET status='مرفوض من رئيس القسم', notes=? WHERE id=?",
-                        (notes, vacation_id)
-                    )
-                self.conn.commit()
-                return True
-            except Exception as e:
-                self.conn.rollback()
-                raise Exception(f"خطأ في موافقة رئيس القسم: {e}")
+                    DatabaseQueries.change_status(conn, vacation_id, current_status, "مرفوض من رئيس القسم", notes=notes)
+            return True
+        except Exception as e:
+            raise Exception(f"خطأ في موافقة رئيس القسم: {e}")
 
 
     def approve_vacation_by_manager(self, vacation_id, approved, notes="", approved_by=None):
         """موافقة أو رفض المدير على الإجازة"""
-        with self.connection_lock:
-            try:
-                self.cursor.execute("SELECT employee_id, type, duration, status FROM vacations WHERE id=?", (vacation_id,))
-                vacation = self.cursor.fetchone()
+        try:
+            with self.transaction() as conn:
+                vacation = conn.execute(
+                    "SELECT employee_id, type, duration, status FROM vacations WHERE id=?", (vacation_id,)
+                ).fetchone()
                 if not vacation:
                     raise Exception("طلب الإجازة غير موجود")
                 employee_id, vac_type, duration, current_status = vacation
@@ -199,61 +309,41 @@ class DatabaseManager:
                     raise Exception("لا يمكن اعتماد هذا الطلب إلا من قبل المدير في مرحلته الصحيحة")
 
                 if approved:
+                    DatabaseQueries.change_status(conn, vacation_id, current_status, "موافق", approved_by=approved_by)
+                    StaffingRules.check(conn, vacation_id)
                     # تحقق وخصم الرصيد إذا سنوية
                     if vac_type == "سنوية":
-                        self.cursor.execute("SELECT vacation_balance FROM employees WHERE id=?", (employee_id,))
-                        employee = self.cursor.fetchone()
-                        if not employee:
-                            raise Exception("الموظف غير موجود")
-                        balance = employee[0]
-                        if duration > balance:
-                            raise Exception("رصيد الإجازات غير كافٍ")
-                        self.cursor.execute(
-                            "UPDATE employees SET vacation_balance = vacation_balance - ? WHERE id=?",
-                            (duration, employee_id)
-                        )
-                    self.cursor.execute(
-                        "UPDATE vacations SET status='موافق', approved_by=? WHERE id=?",
-                        (approved_by, vacation_id)
-                    )
+                        VacationLedger.deduct(conn, employee_id, duration, vacation_id)
                 else:
-                    self.cursor.execute(
-                        "UPDATE vacations SET status='مرفوض من المدير', notes=? WHERE id=?",
-                        (notes, vacation_id)
-                    )
-                self.conn.commit()
-                return True
-            except Exception as e:
-                self.conn.rollback()
-                raise Exception(f"خطأ في موافقة المدير: {e}")
+                    DatabaseQueries.change_status(conn, vacation_id, current_status, "مرفوض من المدير", notes=notes)
+            return True
+        except Exception as e:
+            raise Exception(f"خطأ في موافقة المدير: {e}")
 
 
-    def create_backup(self):
-        """إنشاء نسخة احتياطية من قاعدة البيانات"""
+    def create_backup(self, force=False):
+        """إنشاء نسخة احتياطية مضغوطة إذا تغيرت البيانات منذ آخر نسخة"""
         try:
-            backup_dir = os.path.join(
-                os.path.dirname(__file__), 
-                'backups'
-            )
-            os.makedirs(backup_dir, exist_ok=True)
-            
-            backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            backup_path = os.path.join(backup_dir, backup_filename)
-            
-            with open(backup_path, 'wb') as f:
-                for line in self.conn.iterdump():
-                    f.write(f"{line}\n".encode('utf-8'))
+            backup_path = self.backup_manager.create_backup(force=force)
+            if backup_path is None:
+                print("لا توجد تغييرات منذ آخر نسخة احتياطية، تم تخطي النسخ")
             return True
         except Exception as e:
             print(f"فشل في إنشاء النسخة الاحتياطية: {e}")
             return False
 
+    def close(self):
+        """إغلاق جميع اتصالات المجمع"""
+        if self.pool:
+            self.pool.close_all()
+            self.pool = None
+        self.backup_manager.close()
+
     def __del__(self):
         """إغلاق اتصال قاعدة البيانات"""
-        if self.conn:
+        # النسخ الاحتياطي يتم عند إغلاق النافذة الرئيسية فقط وليس مع كل نسخة من المدير
+        if getattr(self, 'pool', None):
             try:
-                if sys and sys.meta_path:
-                    self.create_backup()
-                self.conn.close()
+                self.close()
             except Exception as e:
                 print(f"تحذير: خطأ أثناء الإغلاق: {e}")
\ No newline at end of file
@@ -1,18 +1,21 @@
+from vacation_ledger import VacationLedger
+from staffing_rules import StaffingRules
+
+
 class DatabaseQueries:
     def __init__(self, db_manager):
         self.db = db_manager
 
     def get_vacation_details(self, vacation_id):
         """جلب تفاصيل الإجازة"""
-        self.db.execute_query("""
+        row = self.db.execute_query("""
             SELECT v.id, v.type, v.start_date, v.end_date, v.duration, v.status,
                    e.id AS employee_id, e.name AS employee_name, e.telegram_user_id AS employee_telegram_id,
                    e.vacation_balance AS employee_balance
             FROM vacations v
             JOIN employees e ON v.employee_id = e.id
             WHERE v.id = ?
-        """, (vacation_id,))
-        row = self.db.cursor.fetchone()
+        """, (vacation_id,)).fetchone()
         if not row:
             return None
         return {
@@ -28,29 +31,50 @@ class DatabaseQueries:
             "employee_balance": row[9]
         }
 
-    def update_vacation_status(self, vacation_id, status, reason=None):
-        """تحديث حالة الإجازة"""
-        self.db.execute_query("""
-            UPDATE vacations
-            SET status = ?, rejection_reason = ?
-            WHERE id = ?
-        """, (status, reason, vacation_id), commit=True)
-
-    def update_employee_balance(self, employee_id, amount):
-        """تحديث رصيد الإجازات"""
-        self.db.execute_query("""
-            UPDATE employees
-            SET vacation_balance = vacation_balance + ?
-            WHERE id = ?
-        """, (amount, employee_id), commit=True)
+    @staticmethod
+    def change_status(conn, vacation_id, expected, status, **columns):
+        """نقل الإجازة من الحالة expected إلى status داخل المعاملة، ورفع استثناء إذا غيّرها طلب آخر قبلنا"""
+        assignments = "".join(f", {column} = ?" for column in columns)
+        cursor = conn.execute(
+            f"UPDATE vacations SET status = ?{assignments} WHERE id = ? AND status = ?",
+            (status, *columns.values(), vacation_id, expected)
+        )
+        if cursor.rowcount != 1:
+            raise Exception("تغيرت حالة طلب الإجازة من جهة أخرى، الرجاء تحديث البيانات والمحاولة مجدداً")
+
+    def update_vacation_status(self, vacation_id, status, reason=None, expected=None):
+        """تحديث حالة الإجازة، ومن الحالة expected فقط إذا حُددت"""
+        if expected is None:
+            self.db.execute_query("""
+                UPDATE vacations
+                SET status = ?, rejection_reason = ?
+                WHERE id = ?
+            """, (status, reason, vacation_id), commit=True)
+            return
+        with self.db.transaction() as conn:
+            self.change_status(conn, vacation_id, expected, status, rejection_reason=reason)
+
+    def approve_by_head(self, vacation_id):
+        """موافقة رئيس القسم بعد فحص حدود الحضور الدنيا للقسم"""
+        with self.db.transaction() as conn:
+            self.change_status(conn, vacation_id, "بانتظار موافقة رئيس القسم", "بانتظار موافقة المدير")
+            StaffingRules.check(conn, vacation_id)
+
+    def approve_vacation(self, vacation_id, employee_id, deduct_days=0):
+        """الموافقة النهائية وخصم الأيام من الرصيد عبر دفتر الإجازات في معاملة واحدة"""
+        with self.db.transaction() as conn:
+            # الخصم بعد نجاح تغيير الحالة فقط، فلا تُخصم الإجازة مرتين عند موافقتين متزامنتين
+            self.change_status(conn, vacation_id, "بانتظار موافقة المدير", "موافق")
+            StaffingRules.check(conn, vacation_id)
+            if deduct_days:
+                VacationLedger.deduct(conn, employee_id, deduct_days, vacation_id)
 
     def get_manager_id(self):
         """جلب معرف المدير"""
-        self.db.execute_query("""
+        row = self.db.execute_query("""
             SELECT telegram_user_id
             FROM employees
             WHERE job_grade = 'مدير'
             LIMIT 1
-        """)
-        row = self.db.cursor.fetchone()
+        """).fetchone()
         return row[0] if row else None
\ No newline at end of file
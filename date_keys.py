@@ -0,0 +1,23 @@
+from datetime import date
+
+# الفرق بين رقم اليوم اليولياني في SQLite (CAST(julianday(d) AS INTEGER)) وtoordinal في بايثون
+JULIAN_OFFSET = 1721424
+
+
+def to_date(value):
+    """تحويل نص 'yyyy-MM-dd' أو QDate أو date إلى date"""
+    if isinstance(value, date):
+        return value
+    if hasattr(value, 'toPyDate'):
+        return value.toPyDate()
+    return date.fromisoformat(str(value)[:10])
+
+
+def day_number(value):
+    """رقم اليوم المطابق للأعمدة المولّدة day_num في قاعدة البيانات"""
+    return to_date(value).toordinal() + JULIAN_OFFSET
+
+
+def from_day_number(day_num):
+    return date.fromordinal(day_num - JULIAN_OFFSET)
+
@@ -0,0 +1,83 @@
+import random
+import sqlite3
+import threading
+import time
+
+
+def is_lock_error(error):
+    """هل الخطأ ناتج عن قفل قاعدة البيانات من اتصال آخر"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class RetryPolicy:
+    """سياسة إعادة المحاولة عند قفل قاعدة البيانات مع تأخير تصاعدي محدود"""
+
+    def __init__(self, max_retries=5, base_delay=0.05, max_delay=1.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """مدة الانتظار قبل المحاولة رقم attempt (تبدأ من 1)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def run(self, operation, on_retry=None):
+        """تنفيذ العملية وإعادتها عند أخطاء القفل حتى الحد الأقصى"""
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                attempt += 1
+                if not is_lock_error(e) or attempt > self.max_retries:
+                    raise
+                if on_retry:
+                    on_retry(attempt, e)
+                time.sleep(self.delay(attempt))
+
+
+class LockWaitStats:
+    """إحصائيات زمن انتظار الكُتّاب على قفل قاعدة البيانات"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.acquisitions = 0
+            self.retries = 0
+            self.failures = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.acquisitions += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self):
+        """نسخة من الإحصائيات الحالية (الأزمنة بالميلي ثانية)"""
+        with self._lock:
+            average = self.total_wait / self.acquisitions if self.acquisitions else 0.0
+            return {
+                'acquisitions': self.acquisitions,
+                'retries': self.retries,
+                'failures': self.failures,
+                'total_wait_ms': round(self.total_wait * 1000, 3),
+                'avg_wait_ms': round(average * 1000, 3),
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
@@ -1,7 +1,10 @@
 from approval_flow import ApprovalFlow
+from staffing_coverage import StaffingCoverage
+from staffing_rules import StaffingRules
+from work_schedule import SHIFT_NAMES, SHIFTS
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
-    QPushButton, QComboBox, QLineEdit, QMessageBox, QHeaderView, QInputDialog
+    QPushButton, QComboBox, QLineEdit, QMessageBox, QHeaderView, QInputDialog, QSpinBox
 )
 
 class DepartmentHeadsTab(QWidget):
@@ -9,6 +12,8 @@ class DepartmentHeadsTab(QWidget):
         super().__init__()
         self.db = db_manager
         self.approval_flow = ApprovalFlow(db_manager)
+        self.coverage = StaffingCoverage(db_manager)
+        self.staffing_rules = StaffingRules(db_manager)
 
         self.heads_table = QTableWidget()
         self.employee_combo = QComboBox()
@@ -19,6 +24,12 @@ class DepartmentHeadsTab(QWidget):
         self.delete_head_btn = QPushButton("حذف رئيس قسم")
         self.approve_vacation_btn = QPushButton("موافقة على الإجازة")
         self.reject_vacation_btn = QPushButton("رفض الإجازة")
+        self.pending_label = QLabel()
+        self.coverage_table = QTableWidget()
+        self.rule_shift_combo = QComboBox()
+        self.rule_min_spin = QSpinBox()
+        self.save_rule_btn = QPushButton("حفظ الحد الأدنى")
+        self.rules_label = QLabel()
 
         self.setup_ui()
         self.load_employees()
@@ -49,10 +60,29 @@ class DepartmentHeadsTab(QWidget):
         layout.addWidget(self.delete_head_btn)
 
         actions_layout = QHBoxLayout()
+        actions_layout.addWidget(self.pending_label)
         actions_layout.addWidget(self.approve_vacation_btn)
         actions_layout.addWidget(self.reject_vacation_btn)
         layout.addLayout(actions_layout)
 
+        self.coverage_table.setColumnCount(2 + len(SHIFTS))
+        self.coverage_table.setHorizontalHeaderLabels(["التاريخ", "اليوم"] + [SHIFT_NAMES[shift] for shift in SHIFTS])
+        self.coverage_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.coverage_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for shift in SHIFTS:
+            self.rule_shift_combo.addItem(SHIFT_NAMES[shift], shift)
+        self.rule_min_spin.setRange(0, 500)
+        rules_layout = QHBoxLayout()
+        rules_layout.addWidget(QLabel("الحد الأدنى للحضور:"))
+        rules_layout.addWidget(self.rule_shift_combo)
+        rules_layout.addWidget(self.rule_min_spin)
+        rules_layout.addWidget(self.save_rule_btn)
+        rules_layout.addWidget(self.rules_label)
+        layout.addLayout(rules_layout)
+
+        layout.addWidget(QLabel("الحضور المتوقع في القسم للأيام القادمة:"))
+        layout.addWidget(self.coverage_table)
+
         self.setLayout(layout)
 
     def load_employees(self):
@@ -89,6 +119,72 @@ class DepartmentHeadsTab(QWidget):
         self.delete_head_btn.clicked.connect(self.delete_department_head)
         self.approve_vacation_btn.clicked.connect(self.approve_vacation)
         self.reject_vacation_btn.clicked.connect(self.reject_vacation)
+        self.department_combo.currentTextChanged.connect(self.update_pending_count)
+        self.department_combo.currentTextChanged.connect(self.load_coverage)
+        self.department_combo.currentTextChanged.connect(self.load_rules)
+        self.rule_shift_combo.currentIndexChanged.connect(self.load_rules)
+        self.save_rule_btn.clicked.connect(self.save_rule)
+        self.update_pending_count()
+        self.load_coverage()
+        self.load_rules()
+
+    def update_pending_count(self):
+        """عرض عدد الطلبات بانتظار رئيس القسم المحدد من جدول العدادات"""
+        department = self.department_combo.currentText()
+        try:
+            count = self.db.vacation_status_count(("بانتظار موافقة رئيس القسم",), department)
+            self.pending_label.setText(f"طلبات بانتظار الموافقة: {count}")
+        except Exception as e:
+            self.pending_label.setText("")
+            print(f"تعذر تحديث عدد الطلبات المعلقة: {e}")
+
+    def load_coverage(self):
+        """عرض عدد الحاضرين المتوقع لكل يوم وفترة في القسم المحدد"""
+        department = self.department_combo.currentText()
+        try:
+            rows = self.coverage.coverage_rows(department) if department else []
+        except Exception as e:
+            rows = []
+            print(f"تعذر حساب الحضور المتوقع: {e}")
+        self.coverage_table.setRowCount(len(rows))
+        for row_idx, values in enumerate(rows):
+            for col_idx, value in enumerate(values):
+                self.coverage_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
+
+    def load_rules(self):
+        """عرض حدود الحضور الدنيا للقسم المحدد"""
+        department = self.department_combo.currentText()
+        try:
+            rules = self.staffing_rules.rules(department) if department else {}
+        except Exception as e:
+            rules = {}
+            print(f"تعذر تحميل حدود الحضور: {e}")
+        self.rule_min_spin.setValue(rules.get(self.rule_shift_combo.currentData(), 0))
+        self.rules_label.setText("، ".join(
+            f"{SHIFT_NAMES[shift]}: {rules[shift]}" for shift in SHIFTS if shift in rules
+        ) or "لا توجد حدود")
+
+    def save_rule(self):
+        department = self.department_combo.currentText()
+        if not department:
+            QMessageBox.warning(self, "تحذير", "يرجى اختيار القسم.")
+            return
+        try:
+            self.staffing_rules.set_rule(department, self.rule_shift_combo.currentData(), self.rule_min_spin.value())
+            self.load_rules()
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء حفظ الحد الأدنى:\n{str(e)}")
+
+    def coverage_impact_text(self, vacation_id):
+        """وصف أثر الإجازة على حضور القسم لرسالة التأكيد"""
+        self.db.execute_query("SELECT employee_id, start_date, end_date FROM vacations WHERE id=?", (vacation_id,))
+        row = self.db.cursor.fetchone()
+        if not row:
+            return ""
+        lines = self.coverage.impact_lines(self.coverage.vacation_impact(*row))
+        if not lines:
+            return "لا تؤثر هذه الإجازة على فترات عمل القسم."
+        return "أدنى حضور متوقع في القسم خلال الإجازة:\n" + "\n".join(lines)
 
     def add_department_head(self):
         emp_id = self.employee_combo.currentData()
@@ -130,12 +226,17 @@ class DepartmentHeadsTab(QWidget):
         if vacation_id is None:
             return
         try:
-            # تحديث الحالة فقط
-            self.db.execute_query(
-                "UPDATE vacations SET status='بانتظار موافقة المدير', approved_by=? WHERE id=?",
-                (approved_by, vacation_id)
+            reply = QMessageBox.question(
+                self, "تأكيد الموافقة",
+                f"{self.coverage_impact_text(vacation_id)}\n\nهل تريد الموافقة على الإجازة؟",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            # تحديث الحالة بعد فحص حدود الحضور الدنيا للقسم
+            self.db.approve_vacation_by_head(vacation_id, approved=True, approved_by=approved_by)
             QMessageBox.information(self, "نجاح", "تم إرسال الطلب للمدير بانتظار الموافقة النهائية.")
+            self.update_pending_count()
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء الموافقة:\n{str(e)}")
 
@@ -150,6 +251,7 @@ class DepartmentHeadsTab(QWidget):
         try:
             self.db.approve_vacation_by_head(vacation_id, approved=False, notes=reason, approved_by=approved_by)
             QMessageBox.information(self, "تم الرفض", "تم رفض الإجازة وسيتم إشعار الموظف.")
+            self.update_pending_count()
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء الرفض:\n{str(e)}")
 
@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import (
     QDialogButtonBox, QDateEdit, QGroupBox
 )
 from PyQt6.QtCore import QDate
+from vacation_calendar import VacationCalendar
 
 class DepartmentDialog(QDialog):
     def __init__(self, parent=None):
@@ -245,4 +246,81 @@ class SearchDialog(QDialog):
                 'type': 'date',
                 'from': self.date_from.date().toString("yyyy-MM-dd"),
                 'to': self.date_to.date().toString("yyyy-MM-dd")
-            }
\ No newline at end of file
+            }
+
+
+class HolidaysDialog(QDialog):
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.calendar = VacationCalendar(db_manager)
+        self.setup_ui()
+        self.load_holidays()
+
+    def setup_ui(self):
+        """تهيئة واجهة إدارة العطل الرسمية"""
+        self.setWindowTitle("العطل الرسمية")
+        self.setFixedSize(400, 300)
+
+        layout = QVBoxLayout()
+
+        add_group = QGroupBox("إضافة عطلة")
+        add_layout = QFormLayout()
+        self.holiday_date = QDateEdit(QDate.currentDate())
+        self.holiday_date.setCalendarPopup(True)
+        add_layout.addRow("التاريخ:", self.holiday_date)
+        self.holiday_name = QLineEdit()
+        self.holiday_name.setPlaceholderText("اسم العطلة")
+        add_layout.addRow("الاسم:", self.holiday_name)
+        self.add_btn = QPushButton("إضافة")
+        self.add_btn.clicked.connect(self.add_holiday)
+        add_layout.addRow(self.add_btn)
+        add_group.setLayout(add_layout)
+
+        delete_group = QGroupBox("حذف عطلة")
+        delete_layout = QFormLayout()
+        self.holidays_combo = QComboBox()
+        delete_layout.addRow("اختر عطلة:", self.holidays_combo)
+        self.delete_btn = QPushButton("حذف")
+        self.delete_btn.clicked.connect(self.delete_holiday)
+        delete_layout.addRow(self.delete_btn)
+        delete_group.setLayout(delete_layout)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+
+        layout.addWidget(add_group)
+        layout.addWidget(delete_group)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+    def load_holidays(self):
+        """تحميل العطل الرسمية من السنة الحالية فصاعداً"""
+        try:
+            self.holidays_combo.clear()
+            for holiday_date, name in self.calendar.holidays():
+                if holiday_date >= f"{QDate.currentDate().year()}-01-01":
+                    self.holidays_combo.addItem(f"{holiday_date} - {name}", holiday_date)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"خطأ في تحميل العطل: {str(e)}")
+
+    def add_holiday(self):
+        name = self.holiday_name.text().strip()
+        if not name:
+            QMessageBox.warning(self, "تحذير", "الرجاء إدخال اسم العطلة")
+            return
+        try:
+            self.calendar.add_holiday(self.holiday_date.date(), name)
+            self.holiday_name.clear()
+            self.load_holidays()
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ: {str(e)}")
+
+    def delete_holiday(self):
+        holiday_date = self.holidays_combo.currentData()
+        if not holiday_date:
+            return
+        try:
+            self.calendar.remove_holiday(holiday_date)
+            self.load_holidays()
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ: {str(e)}")
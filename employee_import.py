@@ -0,0 +1,304 @@
+import os
+import sqlite3
+import time
+import pandas as pd
+from openpyxl import load_workbook
+from vacation_ledger import VacationLedger
+from work_schedule import SPECIAL_WORK_STATUSES
+
+REQUIRED_COLUMNS = ['serial_number', 'name', 'national_id']
+DEFAULT_WORK_DAYS = "0:M,1:M,2:M,3:M,4:M,5:M,6:M"
+DEFAULT_DEPARTMENT = "غير محدد"
+# أيام العمل: رقم اليوم (0 السبت) ثم الفترة (M صباحية، E مسائية، F كامل اليوم)
+WORK_DAYS_PATTERN = r"[0-6]:[MEF](?:,[0-6]:[MEF])*"
+NATIONAL_ID_PATTERN = r"\d{12}"
+VALIDATION_COLUMNS = ['serial_number', 'name', 'national_id', 'department', 'work_days']
+
+# ترتيب الأعمدة المطابق لمعاملات upsert_employee_sql
+INSERT_COLUMNS = [
+    'serial_number', 'name', 'national_id', 'department', 'job_grade',
+    'hiring_date', 'grade_date', 'bonus', 'vacation_balance', 'work_days'
+]
+
+
+def upsert_employee_sql(update_columns):
+    """تحديث الموظف القائم في مكانه بدلاً من INSERT OR REPLACE الذي يحذفه
+    (فيتغير معرفه وتُحذف إجازاته وغيابه بالتتابع). الموظف الجديد يأخذ كل INSERT_COLUMNS
+    بقيمها الافتراضية، والقائم لا تُحدّث إلا الأعمدة الموجودة في الملف"""
+    return (
+        f"INSERT INTO employees ({', '.join(INSERT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in INSERT_COLUMNS)}) "
+        "ON CONFLICT(serial_number) DO UPDATE SET "
+        + "".join(f"{column} = excluded.{column}, " for column in update_columns)
+        + "updated_at = CURRENT_TIMESTAMP"
+    )
+
+
+class EmployeeImporter:
+    """استيراد الموظفين من Excel أو CSV على دفعات، لكل دفعة معاملتها"""
+
+    def __init__(self, db_manager, chunk_size=500):
+        self.db = db_manager
+        self.chunk_size = chunk_size
+
+    def read_chunks(self, file_path):
+        """قراءة الملف دفعة بعد دفعة، وإرجاع (DataFrame، العدد التقديري الكلي)"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == ".csv":
+            total = None
+            for chunk in pd.read_csv(file_path, dtype=str, chunksize=self.chunk_size, encoding="utf-8-sig"):
+                yield chunk, total
+        elif extension == ".xlsx":
+            yield from self.read_xlsx_chunks(file_path)
+        else:
+            # openpyxl لا يقرأ صيغة xls القديمة، فتُقرأ كاملة ثم تُقسم
+            df = pd.read_excel(file_path)
+            for start in range(0, len(df), self.chunk_size):
+                yield df.iloc[start:start + self.chunk_size], len(df)
+
+    def read_xlsx_chunks(self, file_path):
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            total = sheet.max_row - 1 if sheet.max_row else None
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name).strip() if name is not None else "" for name in header]
+            batch = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                batch.append(row)
+                if len(batch) >= self.chunk_size:
+                    yield pd.DataFrame(batch, columns=columns), total
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns), total
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def text_column(df, column, default=""):
+        if column not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        values = df[column].astype(object).where(df[column].notna(), default).astype(str).str.strip()
+        # الأرقام المقروءة كأعداد عشرية (1001.0) تعود نصاً صحيحاً
+        return values.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+
+    def normalize_chunk(self, df):
+        """توحيد أنواع وقيم دفعة كاملة بعمليات متجهية وإرجاعها بأعمدة INSERT_COLUMNS"""
+        cleaned = pd.DataFrame(index=df.index)
+        for column in ['serial_number', 'name', 'national_id', 'job_grade']:
+            cleaned[column] = self.text_column(df, column)
+        cleaned['department'] = self.text_column(df, 'department', DEFAULT_DEPARTMENT)
+        cleaned['work_days'] = self.text_column(df, 'work_days', DEFAULT_WORK_DAYS)
+
+        for column in ['hiring_date', 'grade_date']:
+            if column in df.columns:
+                cleaned[column] = pd.to_datetime(df[column], errors='coerce').dt.strftime('%Y-%m-%d')
+            else:
+                cleaned[column] = None
+        cleaned[['hiring_date', 'grade_date']] = cleaned[['hiring_date', 'grade_date']].astype(object).where(
+            cleaned[['hiring_date', 'grade_date']].notna(), None
+        )
+
+        if 'bonus' in df.columns:
+            cleaned['bonus'] = pd.to_numeric(df['bonus'], errors='coerce').fillna(0).astype(int)
+        else:
+            cleaned['bonus'] = 0
+        if 'vacation_balance' in df.columns:
+            cleaned['vacation_balance'] = pd.to_numeric(df['vacation_balance'], errors='coerce').fillna(0).astype(int).clip(lower=0)
+        else:
+            cleaned['vacation_balance'] = 30
+        return cleaned[INSERT_COLUMNS]
+
+    def clean_chunk(self, df):
+        cleaned = self.normalize_chunk(df)
+        # الصفوف بلا رقم آلي لا يمكن ربطها بموظف فتُتجاهل
+        return cleaned[cleaned['serial_number'] != ""]
+
+    def file_chunks(self, file_path, check_cancelled=None):
+        """دفعات الملف مرقمة بمواقعها فيه بعد التحقق من الأعمدة المطلوبة"""
+        offset = 0
+        for chunk, total in self.read_chunks(file_path):
+            if check_cancelled:
+                check_cancelled()
+            if offset == 0:
+                missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                if missing_columns:
+                    raise ValueError(f"الأعمدة المفقودة: {', '.join(missing_columns)}")
+            # ترقيم الصفوف حسب موقعها في الملف لرسائل الأخطاء
+            chunk.index = range(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk, total
+
+    def validate_file(self, file_path, check_cancelled=None):
+        """فحص الملف كاملاً دون أي كتابة وإرجاع تقرير الأخطاء لكل سطر"""
+        frames = [
+            self.normalize_chunk(chunk)[VALIDATION_COLUMNS]
+            for chunk, total in self.file_chunks(file_path, check_cancelled)
+        ]
+        if not frames:
+            return self.validation_report([])
+        return self.validate_frame(pd.concat(frames))
+
+    def validate_frame(self, data):
+        """فحوص متجهية على الملف كله: الرقم الوطني والتكرار والأقسام وأيام العمل"""
+        departments = {
+            row[0] for row in self.db.execute_query("SELECT name FROM departments", commit=False).fetchall()
+        }
+        departments.add(DEFAULT_DEPARTMENT)
+        owners = dict(self.db.execute_query(
+            "SELECT national_id, serial_number FROM employees", commit=False
+        ).fetchall())
+
+        missing_serial = data['serial_number'] == ""
+        invalid_national_id = ~data['national_id'].str.fullmatch(NATIONAL_ID_PATTERN)
+        owner = data['national_id'].map(owners)
+        checks = [
+            (missing_serial, "الرقم الآلي مفقود"),
+            (data['name'] == "", "حقل الاسم الكامل مطلوب"),
+            (invalid_national_id, "الرقم الوطني يجب أن يتكون من 12 رقمًا"),
+            (~missing_serial & data['serial_number'].duplicated(keep=False), "الرقم الآلي مكرر في الملف"),
+            (~invalid_national_id & data['national_id'].duplicated(keep=False), "الرقم الوطني مكرر في الملف"),
+            (owner.notna() & (owner != data['serial_number']), "الرقم الوطني مسجل لموظف آخر"),
+            (~data['department'].isin(departments), "قسم غير معروف: " + data['department']),
+            (
+                ~(data['work_days'].isin(SPECIAL_WORK_STATUSES) | data['work_days'].str.fullmatch(WORK_DAYS_PATTERN)),
+                "صيغة أيام العمل غير صحيحة: " + data['work_days']
+            ),
+        ]
+        parts = []
+        for mask, message in checks:
+            failed = data[mask]
+            if failed.empty:
+                continue
+            parts.append(pd.DataFrame({
+                'row': failed.index + 2,
+                'serial_number': failed['serial_number'],
+                'error': message[mask] if isinstance(message, pd.Series) else message,
+            }))
+        return self.validation_report(parts)
+
+    @staticmethod
+    def validation_report(parts):
+        if not parts:
+            return pd.DataFrame(columns=['row', 'serial_number', 'error'])
+        return pd.concat(parts).sort_values('row', kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def report_lines(report):
+        return [f"سطر {row}: {error}" for row, error in zip(report['row'], report['error'])]
+
+    @staticmethod
+    def chunk_params(cleaned):
+        return [
+            (serial, name, national_id, department, job_grade, hiring_date,
+             grade_date, int(bonus), int(balance), work_days)
+            for serial, name, national_id, department, job_grade, hiring_date,
+                grade_date, bonus, balance, work_days in cleaned.itertuples(index=False, name=None)
+        ]
+
+    @staticmethod
+    def update_columns(file_columns):
+        """أعمدة الموظف القائم التي يحدّثها الملف: الموجودة فيه فقط، فلا تُستبدل غيرها بالقيم الافتراضية"""
+        return [column for column in INSERT_COLUMNS[1:] if column in file_columns]
+
+    @staticmethod
+    def row_hashes(frame, columns=INSERT_COLUMNS):
+        """بصمة لكل صف بعد توحيد القيم كنصوص، للمقارنة بين الملف والقاعدة"""
+        # الخلية الفارغة و NULL و '' بصمة واحدة، حتى لا يُعاد كتابة صف لم يتغير
+        normalized = frame[columns].astype(object).where(frame[columns].notna(), '').astype(str)
+        return pd.util.hash_pandas_object(normalized, index=False)
+
+    def stored_hashes(self, conn, serials, columns=INSERT_COLUMNS):
+        """بصمات أعمدة columns للموظفين المسجلين مسبقاً بأرقامهم الآلية"""
+        if not serials:
+            return {}
+        placeholders = ", ".join("?" for _ in serials)
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM employees WHERE serial_number IN ({placeholders})",
+            serials
+        ).fetchall()
+        if not rows:
+            return {}
+        stored = pd.DataFrame(rows, columns=columns)
+        return dict(zip(stored['serial_number'], self.row_hashes(stored, columns)))
+
+    @staticmethod
+    def reconcile_balances(conn, serials):
+        """قيود تسوية لأرصدة الموظفين التي غيّرها الاستيراد"""
+        if serials:
+            placeholders = ", ".join("?" for _ in serials)
+            VacationLedger.reconcile(conn, f"e.serial_number IN ({placeholders})", serials, "استيراد")
+
+    def write_chunk(self, conn, cleaned, errors, counts, file_columns=INSERT_COLUMNS):
+        """كتابة الصفوف الجديدة والمعدلة فقط بـ executemany، والرجوع إلى الصفوف فرادى عند فشل أحدها"""
+        update_columns = self.update_columns(file_columns)
+        compared = ['serial_number', *update_columns]
+        upsert_sql = upsert_employee_sql(update_columns)
+        # عند تكرار الرقم الآلي داخل الدفعة يُعتمد آخر ظهور له
+        cleaned = cleaned.drop_duplicates('serial_number', keep='last')
+        stored = self.stored_hashes(conn, cleaned['serial_number'].tolist(), compared)
+        existing = cleaned['serial_number'].map(lambda serial: serial in stored)
+        previous = cleaned['serial_number'].map(stored)
+        unchanged = existing & (previous == self.row_hashes(cleaned, compared))
+        counts['unchanged'] += int(unchanged.sum())
+
+        pending = cleaned[~unchanged]
+        is_update = existing[~unchanged]
+        params = self.chunk_params(pending)
+        conn.execute("SAVEPOINT import_chunk")
+        try:
+            conn.executemany(upsert_sql, params)
+            conn.execute("RELEASE import_chunk")
+            counts['updated'] += int(is_update.sum())
+            counts['inserted'] += int((~is_update).sum())
+            self.reconcile_balances(conn, pending['serial_number'].tolist())
+            return
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO import_chunk")
+            conn.execute("RELEASE import_chunk")
+
+        for row_number, row, update in zip(pending.index, params, is_update):
+            try:
+                conn.execute(upsert_sql, row)
+                counts['updated' if update else 'inserted'] += 1
+            except sqlite3.IntegrityError as e:
+                errors.append(f"سطر {row_number + 2}: {str(e)}")
+        self.reconcile_balances(conn, pending['serial_number'].tolist())
+
+    def import_file(self, file_path, progress=None, check_cancelled=None):
+        """استيراد الملف وإرجاع ملخص يشمل أعداد المضاف والمعدل وغير المتغير.
+
+        كل دفعة تُكتب في معاملة قصيرة مستقلة حتى لا يُحجز قفل الكتابة طوال الاستيراد فتتعطل كتابات
+        البوت والموافقات. عند الإلغاء أو الخطأ تبقى الدفعات المكتملة محفوظة، وإعادة استيراد الملف نفسه
+        تكمل الباقي لأن الكتابة UPSERT بالرقم الآلي وتتخطى الصفوف غير المتغيرة.
+        """
+        started = time.perf_counter()
+        errors = []
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        read = 0
+        for chunk, total in self.file_chunks(file_path, check_cancelled):
+            read += len(chunk)
+            cleaned = self.clean_chunk(chunk)
+            with self.db.transaction() as conn:
+                self.write_chunk(conn, cleaned, errors, counts, chunk.columns)
+
+            if progress:
+                elapsed = time.perf_counter() - started
+                rate = read / elapsed if elapsed else 0
+                percent = int(read / total * 100) if total else 50
+                progress(min(percent, 99), f"تمت معالجة {read} سجل ({rate:.0f} سجل/ثانية)")
+
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': read,
+            'imported': counts['inserted'] + counts['updated'],
+            **counts,
+            'errors': errors,
+            'elapsed': elapsed,
+            'rows_per_second': read / elapsed if elapsed else 0,
+        }
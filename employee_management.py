@@ -3,10 +3,14 @@ from PyQt6.QtGui import QColor
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel,
     QPushButton, QComboBox, QDateEdit, QMessageBox, QCheckBox,
-    QGroupBox, QSpinBox, QTableWidget, QTableWidgetItem,
-    QFormLayout, QHeaderView, QMenu, QTabWidget, QGridLayout
+    QGroupBox, QSpinBox, QFormLayout, QHeaderView, QMenu,
+    QTabWidget, QGridLayout, QInputDialog
 )
 from dialogs import DepartmentDialog
+from table_models import SqlQueryTableModel, SqlTableView
+from vacation_ledger import VacationLedger
+from vacation_rollover import VacationRollover
+from work_schedule import DAY_NAMES, SHIFTS, SHIFT_NAMES, slot_bit, parse_work_days, format_work_days, day_shift
 from tabs.department_heads_tab import DepartmentHeadsTab
 
 class EmployeeManagementTab(QWidget):
@@ -15,7 +19,14 @@ class EmployeeManagementTab(QWidget):
         self.db = db_manager
         self.main_window = main_window
         self.current_employee_id = None
-        self.employees_table = QTableWidget()
+        self.employees_model = SqlQueryTableModel(db_manager, [
+            "ID", "الرقم الآلي", "الاسم", "الرقم الوطني", "القسم",
+            "الدرجة", "تاريخ التعيين", "العلاوة", "رصيد الإجازات", "أيام العمل"
+        ], empty_text="لا يوجد موظفين مسجلين")
+        self.employees_model.sort_expressions = {
+            0: "id", 1: "CAST(serial_number AS INTEGER)", 2: "name, id", 8: "vacation_balance"
+        }
+        self.employees_table = SqlTableView(self.employees_model)
         self.days_checkboxes = []
         self.day_periods = {}
         self.department_heads_btn = QPushButton("إدارة رؤساء الأقسام")
@@ -51,6 +62,7 @@ class EmployeeManagementTab(QWidget):
         self.sort_name_btn = QPushButton("فرز بالأسماء")
         self.resize_btn = QPushButton("ضبط الأعمدة")
         self.refresh_btn = QPushButton("تحديث البيانات")
+        self.rollover_btn = QPushButton("ترحيل أرصدة نهاية السنة")
 
     def setup_ui(self):
         main_layout = QVBoxLayout()
@@ -70,13 +82,12 @@ class EmployeeManagementTab(QWidget):
         work_layout = QVBoxLayout()
         work_group = QGroupBox("أيام العمل والفترات")
         grid = QGridLayout()
-        days = ["السبت", "الأحد", "الإثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة"]
-        for row, day in enumerate(days):
+        for row, day in enumerate(DAY_NAMES):
             cb = QCheckBox(day)
             cb.setChecked(True)
             self.days_checkboxes.append(cb)
             period_combo = QComboBox()
-            period_combo.addItems(["صباحية", "مسائية", "كامل اليوم"])
+            period_combo.addItems([SHIFT_NAMES[shift] for shift in SHIFTS])
             self.day_periods[day] = period_combo
             grid.addWidget(cb, row, 0)
             grid.addWidget(period_combo, row, 1)
@@ -114,26 +125,19 @@ class EmployeeManagementTab(QWidget):
         control_buttons.addWidget(self.clear_btn)
         control_buttons.addWidget(self.dept_btn)
         control_buttons.addWidget(self.refresh_btn)
+        control_buttons.addWidget(self.rollover_btn)
 
         sort_buttons = QHBoxLayout()
         sort_buttons.addWidget(self.sort_id_btn)
         sort_buttons.addWidget(self.sort_name_btn)
         sort_buttons.addWidget(self.resize_btn)
 
-        self.employees_table.setColumnCount(10)
-        self.employees_table.setHorizontalHeaderLabels([
-            "ID", "الرقم الآلي", "الاسم", "الرقم الوطني", "القسم",
-            "الدرجة", "تاريخ التعيين", "العلاوة", "رصيد الإجازات", "أيام العمل"
-        ])
-        self.employees_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.employees_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.employees_table.cellClicked.connect(self.load_employee_for_edit)
         self.employees_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #f0f0f0;
                 gridline-color: #d0d0d0;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #4a90e2;
                 color: white;
             }
@@ -165,7 +169,8 @@ class EmployeeManagementTab(QWidget):
         self.sort_name_btn.clicked.connect(lambda: self.sort_table(2))
         self.resize_btn.clicked.connect(self.resize_columns)
         self.refresh_btn.clicked.connect(self.load_employees)
-        self.employees_table.cellClicked.connect(self.load_employee_for_edit)
+        self.rollover_btn.clicked.connect(self.rollover_balances)
+        self.employees_table.clicked.connect(self.load_employee_for_edit)
         # ربط خيارات الندب والتفرغ
         self.secondment_checkbox.toggled.connect(self.toggle_special_work_status)
         self.dedication_checkbox.toggled.connect(self.toggle_special_work_status)
@@ -186,25 +191,12 @@ class EmployeeManagementTab(QWidget):
 
     def load_employees(self):
         try:
-            self.db.execute_query("""
+            # الصفوف تُقرأ على دفعات عند التمرير
+            self.employees_model.set_query("""
                 SELECT id, serial_number, name, national_id, department,
                        job_grade, hiring_date, bonus, vacation_balance, work_days
                 FROM employees
-                ORDER BY name
-            """, commit=False)
-            employees = self.db.cursor.fetchall()
-            self.employees_table.setRowCount(len(employees))
-            for row_idx, employee in enumerate(employees):
-                for col_idx, value in enumerate(employee):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                    self.employees_table.setItem(row_idx, col_idx, item)
-            if not employees:
-                empty_item = QTableWidgetItem("لا يوجد موظفين مسجلين")
-                empty_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.employees_table.setRowCount(1)
-                self.employees_table.setItem(0, 0, empty_item)
-                self.employees_table.setSpan(0, 0, 1, self.employees_table.columnCount())
+            """, order_by=self.employees_model.order_by or "name, id")
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل الموظفين:\n{str(e)}")
 
@@ -226,26 +218,27 @@ class EmployeeManagementTab(QWidget):
                 max(0, self.vacation_balance.value()),
                 self.get_work_days()
             )
-            if self.current_employee_id:
-                query = """
-                    UPDATE employees SET
-                        serial_number=?, name=?, national_id=?, department=?,
-                        job_grade=?, hiring_date=?, grade_date=?, bonus=?,
-                        vacation_balance=?, work_days=?, updated_at=CURRENT_TIMESTAMP
-                    WHERE id=?
-                """
-                self.db.execute_query(query, employee_data + (self.current_employee_id,))
-            else:
-                query = """
-                    INSERT INTO employees (
-                        serial_number, name, national_id, department,
-                        job_grade, hiring_date, grade_date, bonus,
-                        vacation_balance, work_days
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                self.db.execute_query(query, employee_data)
-                self.db.execute_query("SELECT last_insert_rowid()")
-                self.current_employee_id = self.db.cursor.fetchone()[0]
+            with self.db.transaction() as conn:
+                if self.current_employee_id:
+                    query = """
+                        UPDATE employees SET
+                            serial_number=?, name=?, national_id=?, department=?,
+                            job_grade=?, hiring_date=?, grade_date=?, bonus=?,
+                            vacation_balance=?, work_days=?, updated_at=CURRENT_TIMESTAMP
+                        WHERE id=?
+                    """
+                    conn.execute(query, employee_data + (self.current_employee_id,))
+                else:
+                    query = """
+                        INSERT INTO employees (
+                            serial_number, name, national_id, department,
+                            job_grade, hiring_date, grade_date, bonus,
+                            vacation_balance, work_days
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """
+                    self.current_employee_id = conn.execute(query, employee_data).lastrowid
+                # تغيير الرصيد من النموذج يُسجَّل قيد تسوية في دفتر الإجازات
+                VacationLedger.reconcile(conn, "e.id = ?", (self.current_employee_id,), "تعديل يدوي")
             QMessageBox.information(self, "تم", "تم حفظ بيانات الموظف بنجاح")
             self.load_employees()
             self.clear_form()
@@ -272,18 +265,13 @@ class EmployeeManagementTab(QWidget):
         QMessageBox.information(self, "معلومة", "الرجاء تعبئة بيانات الموظف الجديد ثم الضغط على حفظ")
 
     def sort_table(self, column):
-        self.employees_table.sortByColumn(column, Qt.SortOrder.AscendingOrder)
-        if column in [0, 1, 8]:
-            for row in range(self.employees_table.rowCount()):
-                item = self.employees_table.item(row, column)
-                if item:
-                    item.setData(Qt.ItemDataRole.DisplayRole, int(item.text()))
-
-    def load_employee_for_edit(self, row, col):
+        self.employees_model.sort(column, Qt.SortOrder.AscendingOrder)
+
+    def load_employee_for_edit(self, index):
         try:
-            item = self.employees_table.item(row, 0)
-            if item is not None:
-                self.load_employee_data(item.text())
+            employee = self.employees_model.row_values(index.row())
+            if employee is not None:
+                self.load_employee_data(employee[0])
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل الموظف:\n{str(e)}")
 
@@ -322,21 +310,13 @@ class EmployeeManagementTab(QWidget):
             else:
                 self.secondment_checkbox.setChecked(False)
                 self.dedication_checkbox.setChecked(False)
-                # تحميل الأيام والفترات
-                work_days = employee[10].split(',') if employee[10] else []
-                days_map = {"0":"السبت","1":"الأحد","2":"الإثنين",
-                           "3":"الثلاثاء","4":"الأربعاء","5":"الخميس","6":"الجمعة"}
-                for cb in self.days_checkboxes:
-                    day_name = cb.text()
-                    day_code = next((k for k,v in days_map.items() if v == day_name), None)
-                    cb.setChecked(any(wd.startswith(f"{day_code}:") for wd in work_days))
-                    if day_code:
-                        for wd in work_days:
-                            if wd.startswith(f"{day_code}:"):
-                                period_code = wd.split(':')[1]
-                                period_map = {"M":0, "E":1, "F":2}
-                                self.day_periods[day_name].setCurrentIndex(period_map.get(period_code, 2))
-                                break
+                # تحميل الأيام والفترات من قناع البتات
+                mask = parse_work_days(employee[10])
+                for day, cb in enumerate(self.days_checkboxes):
+                    shift = day_shift(mask, day)
+                    cb.setChecked(shift is not None)
+                    if shift:
+                        self.day_periods[cb.text()].setCurrentIndex(SHIFTS.index(shift))
             self.toggle_special_work_status()  # لضبط حالة التمكين/التعطيل
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل البيانات:\n{str(e)}")
@@ -383,23 +363,50 @@ class EmployeeManagementTab(QWidget):
             return "الندب"
         if self.dedication_checkbox.isChecked():
             return "تفرغ"
-        days_map = {
-            "السبت": "0", "الأحد": "1", "الإثنين": "2",
-            "الثلاثاء": "3", "الأربعاء": "4", 
-            "الخميس": "5", "الجمعة": "6"
-        }
-        periods_map = {"صباحية": "M", "مسائية": "E", "كامل اليوم": "F"}
-        work_days = []
-        for cb in self.days_checkboxes:
+        mask = 0
+        for day, cb in enumerate(self.days_checkboxes):
             if cb.isChecked():
-                day = cb.text()
-                period = self.day_periods[day].currentText()
-                work_days.append(f"{days_map[day]}:{periods_map[period]}")
-        return ",".join(work_days)
+                shift = SHIFTS[self.day_periods[cb.text()].currentIndex()]
+                mask |= 1 << slot_bit(day, shift)
+        return format_work_days(mask)
+
+    def rollover_balances(self):
+        """عرض خطة ترحيل أرصدة السنة للمراجعة ثم تطبيقها على كل الموظفين دفعة واحدة"""
+        year, ok = QInputDialog.getInt(
+            self, "ترحيل الأرصدة", "سنة الترحيل:",
+            QDate.currentDate().year() - 1, 2000, QDate.currentDate().year() - 1
+        )
+        if not ok:
+            return
+        rollover = VacationRollover(self.db)
+        try:
+            if rollover.is_done(year):
+                QMessageBox.warning(self, "تنبيه", f"تم ترحيل أرصدة سنة {year} مسبقاً")
+                return
+            plan = rollover.summary(rollover.dry_run(year))
+            reply = QMessageBox.question(
+                self, "تأكيد الترحيل",
+                f"سيتم ترحيل أرصدة سنة {year}:\n"
+                f"• عدد الموظفين: {plan['employees']}\n"
+                f"• أيام مستحقة: {plan['accrued']}\n"
+                f"• أيام تسقط لتجاوز حد الترحيل ({rollover.carry_over_cap} يوم): {plan['forfeited']}\n\n"
+                "هل تريد المتابعة؟",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            result = rollover.run(year)
+            QMessageBox.information(
+                self, "تم",
+                f"تم ترحيل أرصدة {result['employees']} موظف في {result['elapsed']:.2f} ثانية"
+            )
+            self.load_employees()
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء ترحيل الأرصدة:\n{str(e)}")
 
     def resize_columns(self):
         header = self.employees_table.horizontalHeader()
-        for col in range(self.employees_table.columnCount()):
+        for col in range(self.employees_model.columnCount()):
             header.setSectionResizeMode(col, QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
 
@@ -0,0 +1,57 @@
+import re
+
+# توحيد أشكال الحروف التي تختلف في كتابة الأسماء العربية
+ARABIC_LETTER_VARIANTS = {
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    "ـ": "",
+}
+# الحركات والتنوين والشدة والسكون
+ARABIC_DIACRITICS = [chr(code) for code in range(0x064B, 0x0653)]
+
+_TRANSLATION = str.maketrans({
+    **ARABIC_LETTER_VARIANTS,
+    **{mark: "" for mark in ARABIC_DIACRITICS},
+})
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize_arabic(text):
+    """توحيد النص العربي للبحث: الهمزات والتاء المربوطة والألف المقصورة والتطويل والحركات"""
+    return (text or "").translate(_TRANSLATION)
+
+
+def build_match_query(text):
+    """تحويل نص البحث إلى استعلام FTS5 يطابق بادئات كل الكلمات"""
+    tokens = _TOKEN.findall(normalize_arabic(text))
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class EmployeeSearchIndex:
+    """البحث في فهرس employee_search النصي (FTS5) بالاسم أو الرقم الآلي أو الوطني"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def search(self, text, department=None, limit=None):
+        """أرقام الموظفين المطابقين لبادئات الكلمات مرتبة حسب درجة المطابقة (bm25) ثم الاسم"""
+        match = build_match_query(text)
+        if not match:
+            return []
+        query = """
+            SELECT s.rowid FROM employee_search s
+            JOIN employees e ON e.id = s.rowid
+            WHERE employee_search MATCH ?
+        """
+        params = [match]
+        if department:
+            query += " AND e.department = ?"
+            params.append(department)
+        query += " ORDER BY bm25(employee_search), e.name, e.id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.db.execute_query(query, params, commit=False).fetchall()
+        return [row[0] for row in rows]
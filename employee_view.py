@@ -1,17 +1,24 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QComboBox, QLabel, QPushButton, QMessageBox, QHeaderView,
-    QLineEdit, QGroupBox
+    QLineEdit, QGroupBox, QSpinBox
 )
 from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QColor
+from employee_search import EmployeeSearchIndex, build_match_query
 
 class EmployeeViewTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        self.search_index = EmployeeSearchIndex(db_manager)
         self.current_page = 0
         self.page_size = 50
+        self.filter_dept = None
+        self.search_text = ""
+        # حدود الصفحات وعدد الصفوف لكل تصفية، تُلغى فقط عند تعديل يمس ترتيب الموظفين أو تصفيتهم أو بحثهم
+        self.page_cache = {}
+        self.cache_version = None
         self.setup_ui()
         self.load_departments()
         self.load_employees()
@@ -33,7 +40,7 @@ class EmployeeViewTab(QWidget):
 
         # البحث بالاسم
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("بحث بالاسم...")
+        self.search_input.setPlaceholderText("بحث بالاسم أو الرقم الآلي أو الوطني...")
         self.search_input.textChanged.connect(self.on_search_text_changed)
         control_layout.addWidget(QLabel("بحث:"))
         control_layout.addWidget(self.search_input)
@@ -64,9 +71,18 @@ class EmployeeViewTab(QWidget):
         
         self.page_label = QLabel("الصفحة: 1")
         
+        # الانتقال المباشر إلى صفحة محددة
+        self.page_spin = QSpinBox()
+        self.page_spin.setMinimum(1)
+        self.go_btn = QPushButton("انتقال")
+        self.go_btn.clicked.connect(lambda: self.go_to_page(self.page_spin.value() - 1))
+        
         nav_layout.addWidget(self.prev_btn)
         nav_layout.addWidget(self.page_label)
         nav_layout.addWidget(self.next_btn)
+        nav_layout.addWidget(QLabel("صفحة:"))
+        nav_layout.addWidget(self.page_spin)
+        nav_layout.addWidget(self.go_btn)
         nav_group.setLayout(nav_layout)
         
         main_layout.addWidget(self.employees_table)
@@ -100,15 +116,15 @@ class EmployeeViewTab(QWidget):
 
     def on_department_changed(self, department):
         """تصفية الموظفين حسب القسم"""
+        self.filter_dept = department
         self.current_page = 0
-        self.load_employees(filter_dept=department)
-        self.page_label.setText(f"الصفحة: {self.current_page + 1}")
+        self.load_employees()
 
     def on_search_text_changed(self, text):
-        """بحث الموظفين بالاسم"""
+        """بحث الموظفين بالاسم أو الرقم الآلي أو الوطني"""
+        self.search_text = text
         self.current_page = 0
-        self.load_employees(search_text=text)
-        self.page_label.setText(f"الصفحة: {self.current_page + 1}")
+        self.load_employees()
 
     def load_departments(self):
         """تحميل قائمة الأقسام للفلترة"""
@@ -131,34 +147,92 @@ class EmployeeViewTab(QWidget):
                 f"خطأ في تحميل الأقسام: {str(e)}"
             )
 
-    def load_employees(self, filter_dept=None, search_text=None):
-        """تحميل بيانات الموظفين مع إمكانية التصفية والبحث"""
+    def department_filter(self):
+        return self.filter_dept if self.filter_dept and self.filter_dept != "جميع الأقسام" else None
+
+    def is_searching(self):
+        return bool(build_match_query(self.search_text))
+
+    def filter_clause(self):
+        """جزء FROM/WHERE ومعاملاته حسب تصفية القسم (البحث النصي له مسار مرتب بالمطابقة)"""
+        from_clause = " FROM employees e"
+        conditions = []
+        params = []
+        if self.department_filter():
+            conditions.append("e.department = ?")
+            params.append(self.department_filter())
+
+        return from_clause, conditions, params
+
+    def page_boundaries(self):
+        """مفتاح (الاسم، المعرف) لأول صف في كل صفحة مع عدد الصفوف للتصفية الحالية،
+        وعند البحث أرقام موظفي كل صفحة بترتيب المطابقة"""
+        version = self.db.change_version('employee_listing')
+        if version != self.cache_version:
+            self.page_cache.clear()
+            self.cache_version = version
+
+        if self.is_searching():
+            key = ("search", self.search_text, self.department_filter(), self.page_size)
+            if key not in self.page_cache:
+                # البحث عبر فهرس FTS5 بعد توحيد الحروف العربية، الأقرب مطابقة أولاً
+                ids = self.search_index.search(self.search_text, self.department_filter())
+                pages = [ids[start:start + self.page_size] for start in range(0, len(ids), self.page_size)]
+                self.page_cache[key] = (pages, len(ids))
+            return self.page_cache[key]
+
+        from_clause, conditions, params = self.filter_clause()
+        key = (from_clause, tuple(conditions), tuple(params), self.page_size)
+        if key not in self.page_cache:
+            where = " WHERE " + " AND ".join(conditions) if conditions else ""
+            # مرور واحد يحسب حدود كل الصفحات، فيصبح التنقل لأي صفحة بحثاً في الفهرس
+            rows = self.db.execute_query(f"""
+                SELECT name, id, total FROM (
+                    SELECT e.name, e.id,
+                           ROW_NUMBER() OVER (ORDER BY e.name, e.id) AS position,
+                           COUNT(*) OVER () AS total
+                    {from_clause}{where}
+                )
+                WHERE (position - 1) % ? = 0
+                ORDER BY position
+            """, params + [self.page_size], commit=False).fetchall()
+            total = rows[0][2] if rows else 0
+            self.page_cache[key] = ([(row[0], row[1]) for row in rows], total)
+        return self.page_cache[key]
+
+    def load_employees(self):
+        """تحميل صفحة الموظفين الحالية مع التصفية والبحث"""
         try:
-            query = """
-                SELECT id, serial_number, name, national_id, department,
-                       job_grade, hiring_date, bonus, vacation_balance, work_days
-                FROM employees
-            """
-            params = []
-            
-            conditions = []
-            if filter_dept and filter_dept != "جميع الأقسام":
-                conditions.append("department = ?")
-                params.append(filter_dept)
-                
-            if search_text:
-                conditions.append("name LIKE ?")
-                params.append(f"%{search_text}%")
-                
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-                
-            query += " ORDER BY name LIMIT ? OFFSET ?"
-            params.extend([self.page_size, self.current_page * self.page_size])
-            
-            self.db.execute_query(query, params, commit=False)
-            employees = self.db.cursor.fetchall()
+            boundaries, total = self.page_boundaries()
+            self.current_page = max(0, min(self.current_page, len(boundaries) - 1))
+
+            employees = []
+            if boundaries and self.is_searching():
+                page_ids = boundaries[self.current_page]
+                rows = self.db.execute_query(f"""
+                    SELECT e.id, e.serial_number, e.name, e.national_id, e.department,
+                           e.job_grade, e.hiring_date, e.bonus, e.vacation_balance, e.work_days
+                    FROM employees e
+                    WHERE e.id IN ({", ".join("?" for _ in page_ids)})
+                """, page_ids, commit=False).fetchall()
+                position = {emp_id: index for index, emp_id in enumerate(page_ids)}
+                employees = sorted(rows, key=lambda row: position[row[0]])
+            elif boundaries:
+                from_clause, conditions, params = self.filter_clause()
+                conditions.append("(e.name, e.id) >= (?, ?)")
+                params.extend(boundaries[self.current_page])
+                query = f"""
+                    SELECT e.id, e.serial_number, e.name, e.national_id, e.department,
+                           e.job_grade, e.hiring_date, e.bonus, e.vacation_balance, e.work_days
+                    {from_clause}
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY e.name, e.id
+                    LIMIT ?
+                """
+                params.append(self.page_size)
+                employees = self.db.execute_query(query, params, commit=False).fetchall()
             
+            self.employees_table.clearSpans()
             self.employees_table.setRowCount(len(employees))
             for row_idx, employee in enumerate(employees):
                 for col_idx, value in enumerate(employee):
@@ -183,7 +257,7 @@ class EmployeeViewTab(QWidget):
                 self.employees_table.setSpan(0, 0, 1, self.employees_table.columnCount())
             
             # تحديث حالة أزرار التنقل
-            self.update_navigation_buttons()
+            self.update_navigation_buttons(len(boundaries), total)
             
         except Exception as e:
             QMessageBox.critical(
@@ -192,31 +266,25 @@ class EmployeeViewTab(QWidget):
                 f"حدث خطأ في تحميل البيانات: {str(e)}"
             )
 
-    def update_navigation_buttons(self):
-        """تحديث حالة أزرار التنقل بين الصفحات"""
+    def update_navigation_buttons(self, page_count, total):
+        """تحديث حالة أزرار التنقل حسب عدد صفحات التصفية الحالية"""
+        page_count = max(page_count, 1)
         self.prev_btn.setEnabled(self.current_page > 0)
-        
-        # التحقق مما إذا كانت هناك المزيد من الصفحات
-        try:
-            self.db.execute_query(
-                "SELECT COUNT(*) FROM employees",
-                commit=False
-            )
-            total_count = self.db.cursor.fetchone()[0]
-            self.next_btn.setEnabled(total_count > (self.current_page + 1) * self.page_size)
-        except Exception as e:
-            print(f"Error checking next page: {e}")
-            self.next_btn.setEnabled(False)
+        self.next_btn.setEnabled(self.current_page + 1 < page_count)
+        self.page_spin.setMaximum(page_count)
+        self.page_spin.setValue(self.current_page + 1)
+        self.page_label.setText(f"الصفحة: {self.current_page + 1} من {page_count} ({total} موظف)")
+
+    def go_to_page(self, page):
+        """الانتقال إلى صفحة محددة (تبدأ من 0)"""
+        self.current_page = page
+        self.load_employees()
 
     def prev_page(self):
         """الانتقال إلى الصفحة السابقة"""
         if self.current_page > 0:
-            self.current_page -= 1
-            self.load_employees()
-            self.page_label.setText(f"الصفحة: {self.current_page + 1}")
+            self.go_to_page(self.current_page - 1)
 
     def next_page(self):
         """الانتقال إلى الصفحة التالية"""
-        self.current_page += 1
-        self.load_employees()
-        self.page_label.setText(f"الصفحة: {self.current_page + 1}")
+        self.go_to_page(self.current_page + 1)
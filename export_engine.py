@@ -0,0 +1,351 @@
+import csv
+import os
+import queue
+import threading
+from openpyxl import Workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FILE_FILTER = "Excel Files (*.xlsx);;CSV Files (*.csv);;Parquet Files (*.parquet)"
+FILTER_EXTENSIONS = {"Excel": ".xlsx", "CSV": ".csv", "Parquet": ".parquet"}
+
+
+class ExportQuery:
+    """استعلام تصدير مع عناوين أعمدته واسم ورقته"""
+
+    def __init__(self, query, headers, params=(), sheet_name="Sheet1"):
+        self.query = query
+        self.headers = list(headers)
+        self.params = tuple(params)
+        self.sheet_name = sheet_name
+
+
+EMPLOYEES_EXPORT = ExportQuery(
+    """
+    SELECT serial_number, name, national_id, department,
+           job_grade, hiring_date, grade_date, bonus, vacation_balance, work_days
+    FROM employees
+    ORDER BY name
+    """,
+    # أسماء الأعمدة نفسها في نموذج الاستيراد ليمكن إعادة استيراد الملف
+    ['serial_number', 'name', 'national_id', 'department',
+     'job_grade', 'hiring_date', 'grade_date', 'bonus', 'vacation_balance', 'work_days'],
+    sheet_name="الموظفون"
+)
+
+ABSENCE_HEADERS = ['الموظف', 'التاريخ', 'النوع', 'المدة', 'ملاحظات']
+
+
+def absences_export(month, employee_id=None, newest_first=False):
+    """سجل غياب شهر (yyyy-MM) لكل الموظفين أو لموظف واحد"""
+    conditions = ["a.year_month = ?"]
+    params = [month]
+    if employee_id:
+        conditions.append("a.employee_id = ?")
+        params.append(employee_id)
+    order = "a.date DESC, e.name ASC" if newest_first else "a.date ASC"
+    return ExportQuery(
+        f"""
+        SELECT e.name, a.date, a.type, a.duration, a.notes
+        FROM absences a JOIN employees e ON a.employee_id = e.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {order}
+        """,
+        ABSENCE_HEADERS,
+        params,
+        sheet_name=month
+    )
+
+
+# حزمة الموارد البشرية الشهرية: ورقة لكل جدول
+HR_WORKBOOK_SHEETS = [
+    ExportQuery(
+        """
+        SELECT serial_number, name, national_id, department, job_grade,
+               hiring_date, grade_date, bonus, vacation_balance, work_days
+        FROM employees
+        ORDER BY name, id
+        """,
+        ['serial_number', 'name', 'national_id', 'department', 'job_grade',
+         'hiring_date', 'grade_date', 'bonus', 'vacation_balance', 'work_days'],
+        sheet_name="الموظفون"
+    ),
+    ExportQuery(
+        """
+        SELECT v.id, e.serial_number, e.name, e.department, v.type, v.relation,
+               v.start_date, v.end_date, v.duration, v.status, v.approved_by,
+               v.rejection_reason, v.notes, v.created_at
+        FROM vacations v JOIN employees e ON v.employee_id = e.id
+        ORDER BY v.start_date, v.id
+        """,
+        ['رقم الإجازة', 'الرقم الآلي', 'الموظف', 'القسم', 'النوع', 'صلة القرابة',
+         'من', 'إلى', 'المدة', 'الحالة', 'المعتمد', 'سبب الرفض', 'ملاحظات', 'تاريخ الطلب'],
+        sheet_name="الإجازات"
+    ),
+    ExportQuery(
+        """
+        SELECT e.serial_number, e.name, e.department, a.date, a.type, a.duration, a.notes
+        FROM absences a JOIN employees e ON a.employee_id = e.id
+        ORDER BY a.date, e.name
+        """,
+        ['الرقم الآلي', 'الموظف', 'القسم', 'التاريخ', 'النوع', 'المدة', 'ملاحظات'],
+        sheet_name="الغياب"
+    ),
+    ExportQuery(
+        """
+        SELECT dh.department, e.serial_number, e.name, dh.phone_number, dh.telegram_user_id
+        FROM department_heads dh JOIN employees e ON dh.employee_id = e.id
+        ORDER BY dh.department
+        """,
+        ['القسم', 'الرقم الآلي', 'رئيس القسم', 'رقم الهاتف', 'معرف تليجرام'],
+        sheet_name="رؤساء الأقسام"
+    ),
+    ExportQuery(
+        """
+        SELECT id, action, table_name, record_id, changes, user, created_at
+        FROM audit_log
+        ORDER BY id
+        """,
+        ['#', 'الإجراء', 'الجدول', 'رقم السجل', 'التغييرات', 'المستخدم', 'التاريخ'],
+        sheet_name="سجل التدقيق"
+    ),
+]
+
+
+def export_path(file_path, selected_filter=""):
+    """إضافة امتداد الصيغة المختارة في نافذة الحفظ إذا لم يكتبه المستخدم"""
+    if os.path.splitext(file_path)[1]:
+        return file_path
+    for name, extension in FILTER_EXTENSIONS.items():
+        if selected_filter.startswith(name):
+            return file_path + extension
+    return file_path + ".xlsx"
+
+
+class XlsxStreamWriter:
+    """كتابة Excel بوضع write_only: الصفوف تُكتب للملف ولا تبقى في الذاكرة"""
+
+    def __init__(self, file_path, headers, sheet_name="Sheet1", workbook=None):
+        self.file_path = file_path
+        # عند تمرير workbook تكون الورقة جزءاً من ملف متعدد الأوراق يحفظه المستدعي
+        self.owns_workbook = workbook is None
+        self.workbook = workbook or Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title=sheet_name[:31])
+        self.sheet.append(headers)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        if self.owns_workbook:
+            self.workbook.save(self.file_path)
+
+
+class CsvStreamWriter:
+    def __init__(self, file_path, headers, sheet_name=None):
+        # utf-8-sig حتى يعرض Excel النص العربي بشكل صحيح
+        self.file = open(file_path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetStreamWriter:
+    """كتابة Parquet على دفعات (row groups) بمخطط يُستنتج من أول دفعة"""
+
+    def __init__(self, file_path, headers, sheet_name=None):
+        if pa is None:
+            raise Exception("تصدير Parquet يتطلب تثبيت مكتبة pyarrow")
+        self.file_path = file_path
+        self.headers = headers
+        self.writer = None
+        self.schema = None
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows))
+        if self.schema is None:
+            arrays = [pa.array(column) for column in columns]
+            # الأعمدة الفارغة كلياً في أول دفعة تُعامل كنصوص
+            arrays = [array.cast(pa.string()) if pa.types.is_null(array.type) else array for array in arrays]
+            self.schema = pa.schema([pa.field(name, array.type) for name, array in zip(self.headers, arrays)])
+            self.writer = pq.ParquetWriter(self.file_path, self.schema)
+        else:
+            arrays = [pa.array(column, type=field.type) for column, field in zip(columns, self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self.writer is None:
+            pq.write_table(pa.table({name: pa.array([], pa.string()) for name in self.headers}), self.file_path)
+        else:
+            self.writer.close()
+
+
+WRITERS = {
+    ".xlsx": XlsxStreamWriter,
+    ".csv": CsvStreamWriter,
+    ".parquet": ParquetStreamWriter,
+}
+
+
+class ExportEngine:
+    """تصدير نتيجة استعلام إلى Excel أو CSV أو Parquet بذاكرة ثابتة"""
+
+    def __init__(self, db_manager, batch_size=1000):
+        self.db = db_manager
+        self.batch_size = batch_size
+
+    @staticmethod
+    def writer_class(file_path):
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in WRITERS:
+            raise Exception(f"صيغة ملف غير مدعومة: {extension}")
+        return WRITERS[extension]
+
+    def count_rows(self, export_query):
+        return self.db.execute_query(
+            f"SELECT COUNT(*) FROM ({export_query.query})", export_query.params, commit=False
+        ).fetchone()[0]
+
+    def export(self, export_query, file_path, progress=None, check_cancelled=None):
+        """كتابة نتيجة الاستعلام على دفعات وإرجاع عدد الصفوف (0 دون إنشاء ملف إذا لم توجد بيانات)"""
+        writer_class = self.writer_class(file_path)
+        total = self.count_rows(export_query)
+        if not total:
+            return 0
+
+        writer = writer_class(file_path, export_query.headers, export_query.sheet_name)
+        batches = self.db.stream_query(export_query.query, export_query.params, self.batch_size)
+        written = 0
+        try:
+            for rows in batches:
+                if check_cancelled:
+                    check_cancelled()
+                writer.write_rows(rows)
+                written += len(rows)
+                if progress:
+                    progress(min(99, int(written / total * 100)), f"تم تصدير {written} من {total} سجل")
+        except Exception:
+            batches.close()
+            writer.close()
+            # لا يُترك ملف ناقص عند الإلغاء أو الخطأ
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        writer.close()
+        return written
+
+    def workbook_paths(self, sheets, file_path):
+        """مسار ملف كل ورقة: ملف واحد لـ Excel، وملف مستقل لكل ورقة في CSV و Parquet"""
+        base, extension = os.path.splitext(file_path)
+        if extension.lower() == ".xlsx":
+            return [file_path] * len(sheets)
+        return [f"{base}_{sheet.sheet_name}{extension}" for sheet in sheets]
+
+    def export_workbook(self, sheets, file_path, progress=None, check_cancelled=None):
+        """تصدير عدة أوراق من لقطة قراءة واحدة وإرجاع عدد الصفوف لكل ورقة"""
+        # القارئ (هذا الخيط) يمرر الدفعات عبر طوابير محدودة إلى خيوط الكتابة. أوراق Excel
+        # تشترك في ملف وجدول نصوص واحد فتُكتب بخيط واحد، ولكل ورقة CSV/Parquet ملفها وخيطها
+        writer_class = self.writer_class(file_path)
+        paths = self.workbook_paths(sheets, file_path)
+        single_file = writer_class is XlsxStreamWriter
+        # الكتابة إلى ملفات مؤقتة لا تأخذ أسماءها النهائية إلا بعد نجاح التصدير كله، بما فيه الإغلاق والحفظ
+        temp_paths = {path: self.temp_path(path) for path in paths}
+
+        try:
+            with self.db.read_snapshot() as conn:
+                totals = [
+                    conn.execute(f"SELECT COUNT(*) FROM ({sheet.query})", sheet.params).fetchone()[0]
+                    for sheet in sheets
+                ]
+                workbook = Workbook(write_only=True) if single_file else None
+                writers = [
+                    XlsxStreamWriter(temp_paths[path], sheet.headers, sheet.sheet_name, workbook=workbook)
+                    if single_file else writer_class(temp_paths[path], sheet.headers, sheet.sheet_name)
+                    for sheet, path in zip(sheets, paths)
+                ]
+                groups = [list(range(len(sheets)))] if single_file else [[index] for index in range(len(sheets))]
+                queues = [queue.Queue(maxsize=8) for _ in groups]
+                queue_of = {index: queues[number] for number, group in enumerate(groups) for index in group}
+                errors = []
+
+                def write_loop(batches):
+                    while True:
+                        item = batches.get()
+                        if item is None:
+                            return
+                        if errors:
+                            continue  # الاستمرار في التفريغ حتى لا يتوقف القارئ
+                        index, rows = item
+                        try:
+                            writers[index].write_rows(rows)
+                        except Exception as e:
+                            errors.append(e)
+
+                threads = [threading.Thread(target=write_loop, args=(batches,), daemon=True) for batches in queues]
+                for thread in threads:
+                    thread.start()
+
+                grand_total = sum(totals) or 1
+                written = [0] * len(sheets)
+                try:
+                    for index, sheet in enumerate(sheets):
+                        cursor = conn.execute(sheet.query, sheet.params)
+                        while True:
+                            if check_cancelled:
+                                check_cancelled()
+                            if errors:
+                                raise errors[0]
+                            rows = cursor.fetchmany(self.batch_size)
+                            if not rows:
+                                break
+                            queue_of[index].put((index, rows))
+                            written[index] += len(rows)
+                            if progress:
+                                done = sum(written)
+                                progress(min(99, int(done / grand_total * 100)),
+                                         f"{sheet.sheet_name}: تم تصدير {done} من {sum(totals)} سجل")
+                        cursor.close()
+                except Exception:
+                    self.finish_writers(queues, threads, writers)
+                    raise
+
+                self.finish_writers(queues, threads, writers)
+                if errors:
+                    raise errors[0]
+                if workbook is not None:
+                    workbook.save(temp_paths[file_path])
+        except Exception:
+            for temp_path in set(temp_paths.values()):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            raise
+
+        for path, temp_path in temp_paths.items():
+            os.replace(temp_path, path)
+        return {sheet.sheet_name: count for sheet, count in zip(sheets, written)}
+
+    @staticmethod
+    def temp_path(path):
+        """مسار مؤقت بجوار الملف النهائي وبنفس الامتداد"""
+        base, extension = os.path.splitext(path)
+        return f"{base}.part{extension}"
+
+    @staticmethod
+    def finish_writers(queues, threads, writers):
+        for batches in queues:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+        for writer in writers:
+            writer.close()
@@ -0,0 +1,129 @@
+import re
+
+import numpy as np
+
+from date_keys import day_number, from_day_number, to_date
+
+HIJRI_MONTHS = [
+    "محرم", "صفر", "ربيع الأول", "ربيع الآخر", "جمادى الأولى", "جمادى الآخرة",
+    "رجب", "شعبان", "رمضان", "شوال", "ذو القعدة", "ذو الحجة",
+]
+# "1447-09-15" أو "15/9/1447" مع "هـ" اختيارية
+HIJRI_DATE_PATTERN = re.compile(r"^\s*(?:(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})/(\d{1,2})/(\d{4}))\s*(?:هـ)?\s*$")
+
+# التقويم الهجري الجدولي (الحسابي): 1/1/1 هـ يوافق رقم اليوم 1948439 بترقيم date_keys
+ISLAMIC_EPOCH = 1948439
+FIRST_DAY = day_number("2000-01-01")
+LAST_DAY = day_number("2100-12-31")
+
+_table = None
+
+
+def month_start(year, month):
+    """رقم اليوم لأول الشهر الهجري: الأشهر الفردية 30 يوماً والزوجية 29، و11 سنة كبيسة في كل 30"""
+    return (
+        (59 * (month - 1) + 1) // 2 + (year - 1) * 354 + (3 + 11 * year) // 30
+        + ISLAMIC_EPOCH
+    )
+
+
+def build_table():
+    """جدول التحويل في الذاكرة: سنة وشهر ويوم هجري لكل يوم ميلادي، وأول يوم لكل شهر هجري"""
+    days = np.arange(FIRST_DAY, LAST_DAY + 1, dtype=np.int64)
+    first_year = (30 * (FIRST_DAY - ISLAMIC_EPOCH) + 10646) // 10631
+    last_year = (30 * (LAST_DAY - ISLAMIC_EPOCH) + 10646) // 10631
+    years = np.arange(first_year - 1, last_year + 2, dtype=np.int64)
+    months = np.arange(1, 13, dtype=np.int64)
+    starts = month_start(years[:, None], months[None, :]).ravel()
+    # موقع كل يوم بين بدايات الأشهر المرتبة يحدد شهره
+    index = np.searchsorted(starts, days, side="right") - 1
+    return {
+        "year": (years[0] + index // 12).astype(np.int32),
+        "month": (index % 12 + 1).astype(np.int32),
+        "day": (days - starts[index] + 1).astype(np.int32),
+        "month_starts": {
+            (int(years[0] + i // 12), int(i % 12 + 1)): int(start) for i, start in enumerate(starts)
+        },
+    }
+
+
+def table():
+    global _table
+    if _table is None:
+        _table = build_table()
+    return _table
+
+
+def to_hijri(value):
+    """(السنة، الشهر، اليوم) الهجري لتاريخ ميلادي بين 2000 و 2100"""
+    offset = day_number(value) - FIRST_DAY
+    if not 0 <= offset <= LAST_DAY - FIRST_DAY:
+        raise ValueError("التاريخ خارج نطاق جدول التحويل الهجري (2000-2100)")
+    data = table()
+    return int(data["year"][offset]), int(data["month"][offset]), int(data["day"][offset])
+
+
+def month_length(year, month):
+    starts = table()["month_starts"]
+    following = (year + 1, 1) if month == 12 else (year, month + 1)
+    if (year, month) not in starts or following not in starts:
+        raise ValueError("الشهر خارج نطاق جدول التحويل الهجري")
+    return starts[following] - starts[(year, month)]
+
+
+def from_hijri(year, month, day):
+    """التاريخ الميلادي لتاريخ هجري"""
+    if not 1 <= month <= 12:
+        raise ValueError("الشهر الهجري يجب أن يكون بين 1 و 12")
+    if not 1 <= day <= month_length(year, month):
+        raise ValueError("اليوم غير موجود في هذا الشهر الهجري")
+    day_num = table()["month_starts"][(year, month)] + day - 1
+    if not FIRST_DAY <= day_num <= LAST_DAY:
+        raise ValueError("التاريخ خارج نطاق جدول التحويل الهجري (2000-2100)")
+    return from_day_number(day_num)
+
+
+def parse_hijri(text):
+    """تحويل نص تاريخ هجري إلى تاريخ ميلادي، أو None إن لم يكن بصيغة هجرية"""
+    match = HIJRI_DATE_PATTERN.match(text or "")
+    if not match:
+        return None
+    if match.group(1):
+        year, month, day = (int(match.group(i)) for i in (1, 2, 3))
+    else:
+        day, month, year = (int(match.group(i)) for i in (4, 5, 6))
+    if year > 1600:
+        return None
+    return from_hijri(year, month, day)
+
+
+def format_hijri(value):
+    """"15 رمضان 1447هـ" لتاريخ ميلادي، أو نص فارغ خارج نطاق الجدول"""
+    try:
+        year, month, day = to_hijri(to_date(value))
+    except ValueError:
+        return ""
+    return f"{day} {HIJRI_MONTHS[month - 1]} {year}هـ"
+
+
+def hijri_years(day_numbers):
+    """السنوات الهجرية لمصفوفة أرقام أيام (أعمدة day_num في قاعدة البيانات)"""
+    offsets = np.asarray(day_numbers, dtype=np.int64) - FIRST_DAY
+    return table()["year"][np.clip(offsets, 0, LAST_DAY - FIRST_DAY)]
+
+
+def hajj_leaves_by_hijri_year(db_manager, statuses=("موافق",)):
+    """إجازات الحج حسب السنة الهجرية لبدايتها: (السنة الهجرية، عدد الإجازات، مجموع الأيام)"""
+    placeholders = ", ".join("?" for _ in statuses)
+    rows = db_manager.execute_query(f"""
+        SELECT start_day_num, duration FROM vacations
+        WHERE type = 'حج' AND status IN ({placeholders})
+          AND start_day_num BETWEEN ? AND ?
+    """, (*statuses, FIRST_DAY, LAST_DAY), commit=False).fetchall()
+    if not rows:
+        return []
+    start_days, durations = np.array(rows, dtype=np.int64).T
+    years, inverse = np.unique(hijri_years(start_days), return_inverse=True)
+    counts = np.bincount(inverse)
+    days = np.bincount(inverse, weights=durations)
+    return [(int(year), int(count), int(total)) for year, count, total in zip(years, counts, days)]
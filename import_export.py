@@ -6,16 +6,28 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 import pandas as pd
 from datetime import datetime
+from workers import WorkerPool
+from employee_import import EmployeeImporter
+from export_engine import (
+    ExportEngine, EMPLOYEES_EXPORT, HR_WORKBOOK_SHEETS, EXPORT_FILE_FILTER, export_path
+)
 
 class ImportExportTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        self.importer = EmployeeImporter(db_manager)
+        self.exporter = ExportEngine(db_manager)
         self.import_btn = QPushButton("استيراد من Excel")
+        self.validate_btn = QPushButton("فحص ملف قبل الاستيراد")
         self.export_btn = QPushButton("تصدير إلى Excel")  # تم تعريفه هنا
         self.template_btn = QPushButton("تحميل نموذج Excel")
+        self.hr_pack_btn = QPushButton("تصدير حزمة الموارد البشرية")
+        self.cancel_btn = QPushButton("إلغاء العملية")
         self.progress_bar = QProgressBar()
         self.status_label = QLabel()
+        self.workers = WorkerPool()
+        self.current_worker = None
         self.setup_ui()
 
     def refresh_employee_view(self):
@@ -43,13 +55,18 @@ class ImportExportTab(QWidget):
         import_layout = QVBoxLayout()
         
         self.import_btn.clicked.connect(self.import_data)
+        self.validate_btn.clicked.connect(self.validate_data)
         self.progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.progress_bar.setVisible(False)
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.cancel_btn.clicked.connect(self.cancel_operation)
+        self.cancel_btn.setVisible(False)
         
         import_layout.addWidget(self.import_btn)
+        import_layout.addWidget(self.validate_btn)
         import_layout.addWidget(self.progress_bar)
         import_layout.addWidget(self.status_label)
+        import_layout.addWidget(self.cancel_btn)
         import_group.setLayout(import_layout)
         
         # مجموعة التصدير
@@ -58,13 +75,15 @@ class ImportExportTab(QWidget):
         
         self.export_btn.clicked.connect(self.export_data)
         self.template_btn.clicked.connect(self.download_template)
+        self.hr_pack_btn.clicked.connect(self.export_hr_pack)
         
         export_layout.addWidget(self.export_btn)
         export_layout.addWidget(self.template_btn)
+        export_layout.addWidget(self.hr_pack_btn)
         export_group.setLayout(export_layout)
         
         # تحسين مظهر الأزرار
-        for btn in [self.import_btn, self.export_btn, self.template_btn]:
+        for btn in [self.import_btn, self.validate_btn, self.export_btn, self.template_btn, self.hr_pack_btn]:
             btn.setStyleSheet("""
                 QPushButton {
                     background-color: #4CAF50;
@@ -96,14 +115,29 @@ class ImportExportTab(QWidget):
         main_layout.addWidget(export_group)
         self.setLayout(main_layout)
 
-    def import_data(self):
-        """استيراد البيانات من ملف Excel"""
+    def choose_import_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "اختر ملف Excel",
             "",
-            "Excel Files (*.xlsx *.xls)"
+            "Excel/CSV Files (*.xlsx *.xls *.csv)"
+        )
+        return file_path
+
+    def validate_data(self):
+        """فحص ملف الاستيراد دون كتابة أي بيانات"""
+        file_path = self.choose_import_file()
+        if not file_path:
+            return
+        self.start_operation(
+            self.run_validation, file_path,
+            on_result=self.on_validation_finished,
+            error_title="حدث خطأ أثناء فحص الملف"
         )
+
+    def import_data(self):
+        """استيراد البيانات من ملف Excel"""
+        file_path = self.choose_import_file()
     
         if not file_path:
             return
@@ -118,199 +152,194 @@ class ImportExportTab(QWidget):
         if confirm != QMessageBox.StandardButton.Yes:
             return
             
-        try:
-            self.progress_bar.setVisible(True)
-            self.status_label.setText("جاري قراءة الملف...")
-            self.progress_bar.setValue(10)
-        
-            # قراءة ملف Excel
-            df = pd.read_excel(file_path)
-        
-            # التحقق من الأعمدة المطلوبة
-            required_columns = ['serial_number', 'name', 'national_id']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-        
-            if missing_columns:
-                raise ValueError(f"الأعمدة المفقودة: {', '.join(missing_columns)}")
-        
-            self.status_label.setText("جاري معالجة البيانات...")
-            self.progress_bar.setValue(30)
-        
-            # تنظيف البيانات
-            df = self.clean_import_data(df)
-        
-            self.status_label.setText("جاري حفظ البيانات...")
-            self.progress_bar.setValue(50)
-            
-            # حفظ البيانات في قاعدة البيانات
-            self.save_to_database(df)
-        
-            self.progress_bar.setValue(100)
-            self.status_label.setText("تم الاستيراد بنجاح")
-        
-            QMessageBox.information(
+        self.start_operation(
+            self.run_import, file_path,
+            on_result=self.on_import_finished,
+            error_title="حدث خطأ أثناء الاستيراد",
+            cancelled_message="تم إلغاء الاستيراد، وحُفظت الدفعات المكتملة قبل الإلغاء (أعد الاستيراد لإكماله)"
+        )
+
+    def start_operation(self, fn, *args, on_result, error_title, cancelled_message="تم إلغاء العملية"):
+        """تشغيل عملية استيراد/تصدير في الخلفية مع شريط التقدم وزر الإلغاء"""
+        self.set_busy(True)
+        self.current_worker = self.workers.start(
+            fn, *args,
+            on_result=on_result,
+            on_progress=self.on_progress,
+            on_error=lambda message: QMessageBox.critical(self, "خطأ", f"{error_title}: {message}"),
+            on_cancelled=lambda: self.status_label.setText(cancelled_message),
+            on_finished=lambda: self.set_busy(False)
+        )
+
+    def set_busy(self, busy):
+        for btn in [self.import_btn, self.validate_btn, self.export_btn, self.template_btn, self.hr_pack_btn]:
+            btn.setEnabled(not busy)
+        self.cancel_btn.setVisible(busy)
+        self.progress_bar.setVisible(busy)
+        if busy:
+            self.progress_bar.setValue(0)
+        else:
+            self.current_worker = None
+
+    def on_progress(self, value, message):
+        self.progress_bar.setValue(value)
+        if message:
+            self.status_label.setText(message)
+
+    def cancel_operation(self):
+        if self.current_worker:
+            self.current_worker.cancel()
+            self.status_label.setText("جاري إلغاء العملية...")
+
+    def run_validation(self, worker, file_path):
+        """فحص الملف وحفظ تقرير الأخطاء (تعمل في خيط خلفي)"""
+        worker.report_progress(0, "جاري فحص الملف...")
+        report = self.importer.validate_file(file_path, check_cancelled=worker.check_cancelled)
+        self.write_error_log(self.importer.report_lines(report))
+        return report
+
+    def on_validation_finished(self, report):
+        if report.empty:
+            self.status_label.setText("الملف سليم وجاهز للاستيراد")
+            QMessageBox.information(self, "تم", "لم يتم العثور على أخطاء في الملف")
+        else:
+            self.show_validation_report(report)
+
+    def show_validation_report(self, report):
+        self.status_label.setText(f"تم العثور على {len(report)} خطأ في الملف")
+        preview = "\n".join(self.importer.report_lines(report.head(15)))
+        QMessageBox.warning(
+            self,
+            "أخطاء في الملف",
+            f"تم العثور على {len(report)} خطأ في {report['row'].nunique()} سطر، ولم تُحفظ أي بيانات.\n\n"
+            f"{preview}\n\n"
+            "تم حفظ التقرير كاملاً في ملف import_errors.log"
+        )
+
+    @staticmethod
+    def write_error_log(lines):
+        if lines:
+            with open("import_errors.log", "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+
+    def run_import(self, worker, file_path):
+        """فحص الملف ثم استيراده على دفعات (تعمل في خيط خلفي)"""
+        worker.report_progress(0, "جاري فحص الملف...")
+        # لا تبدأ الكتابة إلا إذا اجتاز الملف كله الفحص
+        report = self.importer.validate_file(file_path, check_cancelled=worker.check_cancelled)
+        if not report.empty:
+            self.write_error_log(self.importer.report_lines(report))
+            return {'report': report}
+
+        worker.report_progress(0, "جاري قراءة الملف...")
+        summary = self.importer.import_file(
+            file_path,
+            progress=worker.report_progress,
+            check_cancelled=worker.check_cancelled
+        )
+        self.write_error_log(summary['errors'])
+        return summary
+
+    def on_import_finished(self, summary):
+        if 'report' in summary:
+            self.show_validation_report(summary['report'])
+            return
+        success = summary['imported']
+        errors = summary['errors']
+        rate = f"({summary['rows_per_second']:.0f} سجل/ثانية)"
+        details = (
+            f"جديد: {summary['inserted']}، معدّل: {summary['updated']}، "
+            f"دون تغيير: {summary['unchanged']}"
+        )
+        self.status_label.setText(f"تم الاستيراد بنجاح {rate}")
+        if errors:
+            QMessageBox.warning(
                 self,
-                "تم",
-                f"تم استيراد {len(df)} سجل بنجاح"
+                "تحذير",
+                f"تم استيراد {success} سجل بنجاح، مع {len(errors)} أخطاء.\n"
+                f"{details}\n"
+                "تم حفظ تفاصيل الأخطاء في ملف import_errors.log"
             )
-            
-            # تحديث عرض الموظفين إذا كان موجوداً
-            if hasattr(self.parent(), 'employee_view_tab'):
-                self.parent().employee_view_tab.load_employees()
-            elif hasattr(self.parent(), 'main_window') and hasattr(self.parent().main_window, 'employee_view_tab'):
-                self.parent().main_window.employee_view_tab.load_employees()
-        
-        except Exception as e:
-            QMessageBox.critical(
+        else:
+            QMessageBox.information(
                 self,
-                "خطأ",
-                f"حدث خطأ أثناء الاستيراد: {str(e)}"
+                "تم",
+                f"تم استيراد {success} سجل بنجاح {rate}\n{details}"
             )
-        finally:
-            self.progress_bar.setVisible(False)
-
-    def clean_import_data(self, df):
-        """تنظيف وتهيئة البيانات المستوردة"""
-        # تحويل الأعمدة الرقمية
-        numeric_cols = ['bonus', 'vacation_balance']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-    
-        # تحويل التواريخ
-        date_cols = ['hiring_date', 'grade_date']
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
-    
-        # تعيين القيم الافتراضية
-        if 'vacation_balance' in df.columns:
-            df['vacation_balance'] = df['vacation_balance'].apply(lambda x: max(0, x))
-        else:
-            df['vacation_balance'] = 30  # القيمة الافتراضية
-        
-        if 'bonus' not in df.columns:
-            df['bonus'] = 0
-        
-        if 'work_days' not in df.columns:
-            df['work_days'] = "0:M,1:M,2:M,3:M,4:M,5:M,6:M"  # أيام العمل الافتراضية
-        
-        if 'department' not in df.columns:
-            df['department'] = "غير محدد"
-        
-        return df
-
-    def save_to_database(self, df):
-        """حفظ البيانات المستوردة في قاعدة البيانات"""
-        try:
-            total = len(df)
-            success = 0
-            errors = []
-        
-            for idx, row in df.iterrows():
-                try:
-                    serial_number = str(row['serial_number']).strip()
-                    if not serial_number:
-                        continue
-                        
-                    self.db.execute_query(
-                        "INSERT OR REPLACE INTO employees ("
-                        "serial_number, name, national_id, department, "
-                        "job_grade, hiring_date, grade_date, bonus, "
-                        "vacation_balance, work_days"
-                        ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                        (
-                            serial_number,
-                            str(row.get('name', '')).strip(),
-                            str(row.get('national_id', '')).strip(),
-                            str(row.get('department', 'غير محدد')).strip(),
-                            str(row.get('job_grade', '')).strip(),
-                            row.get('hiring_date', ''),
-                            row.get('grade_date', ''),
-                            int(row.get('bonus', 0)),
-                            int(row.get('vacation_balance', 30)),
-                            row.get('work_days', "0:M,1:M,2:M,3:M,4:M,5:M,6:M")
-                        )
-                    )
-                    success += 1
-                except Exception as e:
-                    errors.append(f"سطر {idx+2}: {str(e)}")
-                
-                # تحديث شريط التقدم
-                progress = 50 + int((idx + 1) / total * 50)
-                self.progress_bar.setValue(progress)
-                self.status_label.setText(f"جاري معالجة السجل {idx+1} من {total}")
-            
-            if errors:
-                with open("import_errors.log", "w", encoding="utf-8") as f:
-                    f.write("\n".join(errors))
-                
-                QMessageBox.warning(
-                    self,
-                    "تحذير",
-                    f"تم استيراد {success} سجل بنجاح، مع {len(errors)} أخطاء.\n"
-                    "تم حفظ تفاصيل الأخطاء في ملف import_errors.log"
-                )
-            if success > 0:  
-                self.refresh_employee_view()
-                
-        except Exception as e:
-            raise e
+        if success > 0:
+            self.refresh_employee_view()
 
     def export_data(self):
-        """تصدير البيانات إلى ملف Excel"""
-        file_path, _ = QFileDialog.getSaveFileName(
+        """تصدير البيانات إلى ملف Excel أو CSV أو Parquet"""
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
-            "حفظ كملف Excel",
+            "حفظ ملف التصدير",
             f"employees_export_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            "Excel Files (*.xlsx)"
+            EXPORT_FILE_FILTER
         )
         
         if not file_path:
             return
+        file_path = export_path(file_path, selected_filter)
             
-        try:
-            # جلب البيانات من قاعدة البيانات
-            self.db.execute_query("""
-                SELECT 
-                    serial_number, name, national_id, department,
-                    job_grade, hiring_date, grade_date, bonus, vacation_balance
-                FROM employees
-                ORDER BY name
-            """, commit=False)
-            
-            data = self.db.cursor.fetchall()
-            
-            if not data:
-                QMessageBox.warning(
-                    self,
-                    "تحذير",
-                    "لا توجد بيانات للتصدير"
-                )
-                return
-                
-            # إنشاء DataFrame
-            columns = [
-                'serial_number', 'name', 'national_id', 'department',
-                'job_grade', 'hiring_date', 'grade_date', 'bonus', 'vacation_balance'
-            ]
-            df = pd.DataFrame(data, columns=columns)
-            
-            # تصدير إلى Excel
-            df.to_excel(file_path, index=False)
-            
-            QMessageBox.information(
-                self,
-                "تم",
-                f"تم تصدير {len(data)} سجل بنجاح"
-            )
-            
-        except Exception as e:
-            QMessageBox.critical(
+        self.start_operation(
+            self.run_export, file_path,
+            on_result=self.on_export_finished,
+            error_title="حدث خطأ أثناء التصدير"
+        )
+
+    def run_export(self, worker, file_path):
+        """تصدير الموظفين على دفعات (تعمل في خيط خلفي)"""
+        worker.report_progress(0, "جاري تصدير البيانات...")
+        return self.exporter.export(
+            EMPLOYEES_EXPORT, file_path,
+            progress=worker.report_progress,
+            check_cancelled=worker.check_cancelled
+        )
+
+    def on_export_finished(self, count):
+        if not count:
+            QMessageBox.warning(
                 self,
-                "خطأ",
-                f"حدث خطأ أثناء التصدير: {str(e)}"
+                "تحذير",
+                "لا توجد بيانات للتصدير"
             )
+            return
+        QMessageBox.information(
+            self,
+            "تم",
+            f"تم تصدير {count} سجل بنجاح"
+        )
+
+    def export_hr_pack(self):
+        """تصدير الموظفين والإجازات والغياب ورؤساء الأقسام وسجل التدقيق في ملف واحد"""
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "حفظ حزمة الموارد البشرية",
+            f"hr_pack_{datetime.now().strftime('%Y%m%d')}.xlsx",
+            EXPORT_FILE_FILTER
+        )
+        if not file_path:
+            return
+        file_path = export_path(file_path, selected_filter)
+        self.start_operation(
+            self.run_hr_pack_export, file_path,
+            on_result=self.on_hr_pack_finished,
+            error_title="حدث خطأ أثناء التصدير"
+        )
+
+    def run_hr_pack_export(self, worker, file_path):
+        worker.report_progress(0, "جاري تصدير الحزمة...")
+        return self.exporter.export_workbook(
+            HR_WORKBOOK_SHEETS, file_path,
+            progress=worker.report_progress,
+            check_cancelled=worker.check_cancelled
+        )
+
+    def on_hr_pack_finished(self, counts):
+        self.status_label.setText("تم تصدير الحزمة")
+        details = "\n".join(f"{sheet}: {count} سجل" for sheet, count in counts.items())
+        QMessageBox.information(self, "تم", f"تم تصدير حزمة الموارد البشرية بنجاح\n{details}")
 
     def download_template(self):
         """تحميل نموذج Excel للاستيراد"""
@@ -1,5 +1,5 @@
 from PyQt6.QtWidgets import QMainWindow, QTabWidget, QStatusBar, QLabel, QVBoxLayout, QWidget, QMessageBox
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThreadPool
 from tabs.employee_view import EmployeeViewTab
 from tabs.employee_management import EmployeeManagementTab
 from tabs.vacations import VacationsTab
@@ -75,10 +75,7 @@ class MainWindow(QMainWindow):
     def update_notifications(self):
         """تحديث الإشعارات"""
         try:
-            self.db.execute_query("""
-                SELECT COUNT(*) FROM vacations WHERE status='بانتظار موافقة رئيس القسم' OR status='بانتظار موافقة المدير'
-            """, commit=False)
-            count = self.db.cursor.fetchone()[0]
+            count = self.db.vacation_status_count()
 
             if count > 0:
                 self.notification_bar.setText(f"لديك {count} طلبات إجازة بانتظار الموافقة")
@@ -110,11 +107,7 @@ class MainWindow(QMainWindow):
     def check_pending_requests(self):
         """التحقق من طلبات الإجازة المعلقة"""
         try:
-            self.db.execute_query(
-                "SELECT COUNT(*) FROM vacations WHERE status='بانتظار موافقة رئيس القسم' OR status='بانتظار موافقة المدير'",
-                commit=False
-            )
-            count = self.db.cursor.fetchone()[0]
+            count = self.db.vacation_status_count()
             if count > 0:
                 self.show_notification(f"لديك {count} طلبات إجازة بانتظار الموافقة")
         except Exception as e:
@@ -140,5 +133,10 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """معالجة حدث إغلاق النافذة"""
+        # إيقاف المهام الخلفية قبل النسخ الاحتياطي
+        for tab in (self.import_export_tab, self.absences_tab):
+            tab.workers.cancel_all()
+        QThreadPool.globalInstance().waitForDone(10000)
         self.db.create_backup()
+        self.db.export_query_stats()
         super().closeEvent(event)
\ No newline at end of file
@@ -0,0 +1,875 @@
+import sqlite3
+
+# حالات لا تشغل فترة الإجازة (لا تدخل في كشف التداخل)
+INACTIVE_VACATION_STATUSES = ("مرفوض من المدير", "مرفوض من رئيس القسم", "مرفوض", "ملغاة")
+
+# نصوص SQL مجمّدة كما طُبقت في ترحيلاتها، فلا يتغير مخطط القواعد الجديدة إذا تغيرت دوال الوحدات لاحقاً
+# توحيد الحروف العربية في الفهرس النصي (الهمزات، التاء المربوطة، الألف المقصورة، التطويل، الحركات U+064B..U+0652)
+NORMALIZED_NAME_SQL = (
+    "replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace("
+    "replace(replace(replace(replace(replace({column}, '\u0623', '\u0627'), '\u0625', '\u0627'), "
+    "'\u0622', '\u0627'), '\u0671', '\u0627'), '\u0629', '\u0647'), '\u0649', '\u064a'), "
+    "'\u0626', '\u064a'), '\u0624', '\u0648'), '\u0640', ''), '\u064b', ''), '\u064c', ''), "
+    "'\u064d', ''), '\u064e', ''), '\u064f', ''), '\u0650', ''), '\u0651', ''), '\u0652', '')"
+)
+# قناع أيام العمل من نص work_days: بت لكل (يوم × فترة) بترتيب day*3 + (M=0، E=1، F=2)
+WORK_MASK_SQL = (
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',0:M,') > 0 THEN 1 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',0:E,') > 0 THEN 2 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',0:F,') > 0 THEN 4 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',1:M,') > 0 THEN 8 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',1:E,') > 0 THEN 16 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',1:F,') > 0 THEN 32 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',2:M,') > 0 THEN 64 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',2:E,') > 0 THEN 128 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',2:F,') > 0 THEN 256 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',3:M,') > 0 THEN 512 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',3:E,') > 0 THEN 1024 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',3:F,') > 0 THEN 2048 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',4:M,') > 0 THEN 4096 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',4:E,') > 0 THEN 8192 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',4:F,') > 0 THEN 16384 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',5:M,') > 0 THEN 32768 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',5:E,') > 0 THEN 65536 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',5:F,') > 0 THEN 131072 ELSE 0 END) | "
+    "(CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',6:M,') > 0 THEN 262144 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',6:E,') > 0 THEN 524288 ELSE 0 END) | (CASE WHEN instr(',' || COALESCE(work_days, '') || ',', ',6:F,') > 0 THEN 1048576 ELSE 0 END)"
+)
+
+
+def add_column_if_missing(conn, table, column, definition):
+    """إضافة عمود لجدول قائم إذا لم يكن موجوداً (قواعد قديمة عُدّلت يدوياً)"""
+    # table_xinfo تشمل الأعمدة المولّدة التي لا تظهر في table_info
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def migration_001_base_schema(conn):
+    """المخطط الأساسي والفهارس والأقسام الافتراضية"""
+    tables = [
+        """CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            serial_number TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            national_id TEXT UNIQUE NOT NULL,
+            department TEXT,
+            job_grade TEXT,
+            hiring_date TEXT,
+            grade_date TEXT,
+            bonus INTEGER DEFAULT 0,
+            vacation_balance INTEGER DEFAULT 30,
+            work_days TEXT,
+            telegram_user_id TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS vacations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            subtype TEXT,
+            relation TEXT, 
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            notes TEXT,
+            status TEXT DEFAULT 'تحت الإجراء',
+            approved_by TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS department_heads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            department TEXT NOT NULL,
+            phone_number TEXT,
+            telegram_user_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS absences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            duration INTEGER DEFAULT 1,
+            notes TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+            UNIQUE(employee_id, date)
+        )""",
+        """CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            record_id INTEGER,
+            changes TEXT,
+            user TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )"""
+    ]
+    for table in tables:
+        conn.execute(table)
+
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_emp_national_id ON employees(national_id)",
+        "CREATE INDEX IF NOT EXISTS idx_emp_department ON employees(department)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_employee ON vacations(employee_id)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_date ON vacations(start_date, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_absences_employee_date ON absences(employee_id, date)"
+    ]
+    for index in indexes:
+        conn.execute(index)
+
+    default_depts = [
+        'الإدارة', 'التمريض', 
+        'المحاسبة', 'المختبر', 
+        'الصيدلة'
+    ]
+    conn.executemany(
+        "INSERT OR IGNORE INTO departments (name) VALUES (?)",
+        [(dept,) for dept in default_depts]
+    )
+
+
+def migration_002_missing_columns(conn):
+    """أعمدة تستخدمها الشيفرة ولم تكن في المخطط"""
+    # كان يُضاف سابقاً بسكربت add_department_column.py لقواعد البيانات القديمة
+    add_column_if_missing(conn, "department_heads", "department", "TEXT")
+    add_column_if_missing(conn, "vacations", "rejection_reason", "TEXT")
+    add_column_if_missing(conn, "vacations", "seen_by_admin", "INTEGER DEFAULT 0")
+
+
+def migration_003_vacation_counters(conn):
+    """عدادات الإجازات حسب الحالة والقسم، تُحدَّث بالقوادح بدل COUNT(*) على كامل الجدول"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS vacation_counters (
+        status TEXT NOT NULL,
+        department TEXT NOT NULL DEFAULT '',
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (status, department)
+    ) WITHOUT ROWID""")
+
+    triggers = [
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_counters_insert
+        AFTER INSERT ON vacations
+        BEGIN
+            INSERT INTO vacation_counters (status, department, count)
+            VALUES (
+                NEW.status,
+                COALESCE((SELECT department FROM employees WHERE id = NEW.employee_id), ''),
+                1
+            )
+            ON CONFLICT(status, department) DO UPDATE SET count = count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_counters_delete
+        AFTER DELETE ON vacations
+        WHEN EXISTS (SELECT 1 FROM employees WHERE id = OLD.employee_id)
+        BEGIN
+            UPDATE vacation_counters SET count = count - 1
+            WHERE status = OLD.status
+              AND department = COALESCE((SELECT department FROM employees WHERE id = OLD.employee_id), '');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_counters_update
+        AFTER UPDATE OF status, employee_id ON vacations
+        WHEN OLD.status IS NOT NEW.status OR OLD.employee_id IS NOT NEW.employee_id
+        BEGIN
+            UPDATE vacation_counters SET count = count - 1
+            WHERE status = OLD.status
+              AND department = COALESCE((SELECT department FROM employees WHERE id = OLD.employee_id), '');
+            INSERT INTO vacation_counters (status, department, count)
+            VALUES (
+                NEW.status,
+                COALESCE((SELECT department FROM employees WHERE id = NEW.employee_id), ''),
+                1
+            )
+            ON CONFLICT(status, department) DO UPDATE SET count = count + 1;
+        END""",
+        # نقل عدادات إجازات الموظف عند تغيير قسمه
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_counters_department
+        AFTER UPDATE OF department ON employees
+        WHEN OLD.department IS NOT NEW.department
+        BEGIN
+            UPDATE vacation_counters
+            SET count = count - (
+                SELECT COUNT(*) FROM vacations v
+                WHERE v.employee_id = NEW.id AND v.status = vacation_counters.status
+            )
+            WHERE department = COALESCE(OLD.department, '');
+            INSERT INTO vacation_counters (status, department, count)
+            SELECT status, COALESCE(NEW.department, ''), COUNT(*)
+            FROM vacations WHERE employee_id = NEW.id
+            GROUP BY status
+            ON CONFLICT(status, department) DO UPDATE SET count = count + excluded.count;
+        END""",
+        # حذف الموظف يحذف إجازاته تتابعياً بعد زوال صفه، لذا تُخصم عداداته قبل الحذف
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_counters_employee_delete
+        BEFORE DELETE ON employees
+        BEGIN
+            UPDATE vacation_counters
+            SET count = count - (
+                SELECT COUNT(*) FROM vacations v
+                WHERE v.employee_id = OLD.id AND v.status = vacation_counters.status
+            )
+            WHERE department = COALESCE(OLD.department, '');
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    conn.execute("DELETE FROM vacation_counters")
+    conn.execute("""
+        INSERT INTO vacation_counters (status, department, count)
+        SELECT v.status, COALESCE(e.department, ''), COUNT(*)
+        FROM vacations v
+        LEFT JOIN employees e ON v.employee_id = e.id
+        WHERE v.status IS NOT NULL
+        GROUP BY v.status, COALESCE(e.department, '')
+    """)
+
+
+def migration_004_date_keys(conn):
+    """مفاتيح تاريخ مولّدة ومفهرسة: الشهر ورقم اليوم بدلاً من strftime على كل صف"""
+    day_number = "CAST(julianday({}) AS INTEGER)"
+    add_column_if_missing(conn, "absences", "year_month", "TEXT GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL")
+    add_column_if_missing(conn, "absences", "day_num", f"INTEGER GENERATED ALWAYS AS ({day_number.format('date')}) VIRTUAL")
+    add_column_if_missing(conn, "vacations", "start_month", "TEXT GENERATED ALWAYS AS (substr(start_date, 1, 7)) VIRTUAL")
+    add_column_if_missing(conn, "vacations", "start_day_num", f"INTEGER GENERATED ALWAYS AS ({day_number.format('start_date')}) VIRTUAL")
+    add_column_if_missing(conn, "vacations", "end_day_num", f"INTEGER GENERATED ALWAYS AS ({day_number.format('end_date')}) VIRTUAL")
+
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_absences_year_month ON absences(year_month, date)",
+        "CREATE INDEX IF NOT EXISTS idx_absences_day_num ON absences(day_num)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_start_month ON vacations(start_month)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_employee_days ON vacations(employee_id, start_day_num, end_day_num)"
+    ]
+    for index in indexes:
+        conn.execute(index)
+
+
+def migration_005_vacation_intervals(conn):
+    """فهرس R*Tree لفترات الإجازات النشطة: البعد الأول الأيام والثاني رقم الموظف"""
+    inactive = ", ".join(f"'{status}'" for status in INACTIVE_VACATION_STATUSES)
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS vacation_intervals USING rtree_i32(
+        id, start_day, end_day, min_employee, max_employee
+    )""")
+
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_insert
+        AFTER INSERT ON vacations
+        WHEN NEW.status NOT IN ({inactive})
+        BEGIN
+            INSERT INTO vacation_intervals
+            VALUES (NEW.id, NEW.start_day_num, NEW.end_day_num, NEW.employee_id, NEW.employee_id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_update
+        AFTER UPDATE OF status, start_date, end_date, employee_id ON vacations
+        BEGIN
+            DELETE FROM vacation_intervals WHERE id = OLD.id;
+            INSERT INTO vacation_intervals
+            SELECT NEW.id, NEW.start_day_num, NEW.end_day_num, NEW.employee_id, NEW.employee_id
+            WHERE NEW.status NOT IN ({inactive});
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_delete
+        AFTER DELETE ON vacations
+        BEGIN
+            DELETE FROM vacation_intervals WHERE id = OLD.id;
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    conn.execute("DELETE FROM vacation_intervals")
+    conn.execute(f"""
+        INSERT INTO vacation_intervals
+        SELECT id, start_day_num, end_day_num, employee_id, employee_id
+        FROM vacations
+        WHERE status NOT IN ({inactive}) AND start_day_num IS NOT NULL AND end_day_num IS NOT NULL
+    """)
+
+
+def migration_006_employee_search(conn):
+    """فهرس FTS5 للبحث بالاسم والرقم الآلي والوطني بعد توحيد الحروف العربية"""
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5(
+        name, serial_number, national_id,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""")
+    indexed_values = f"{NORMALIZED_NAME_SQL.format(column='NEW.name')}, NEW.serial_number, NEW.national_id"
+
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_search_insert
+        AFTER INSERT ON employees
+        BEGIN
+            INSERT INTO employee_search (rowid, name, serial_number, national_id)
+            VALUES (NEW.id, {indexed_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_search_update
+        AFTER UPDATE OF name, serial_number, national_id ON employees
+        BEGIN
+            DELETE FROM employee_search WHERE rowid = OLD.id;
+            INSERT INTO employee_search (rowid, name, serial_number, national_id)
+            VALUES (NEW.id, {indexed_values});
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employee_search_delete
+        AFTER DELETE ON employees
+        BEGIN
+            DELETE FROM employee_search WHERE rowid = OLD.id;
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    conn.execute("DELETE FROM employee_search")
+    conn.execute(f"""
+        INSERT INTO employee_search (rowid, name, serial_number, national_id)
+        SELECT id, {NORMALIZED_NAME_SQL.format(column='name')}, serial_number, national_id FROM employees
+    """)
+
+
+def migration_007_employee_name_index(conn):
+    """فهرس (الاسم، المعرف) للتنقل بين صفحات الموظفين بمفتاح الترتيب"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employees_name_id ON employees(name, id)")
+
+
+def migration_008_vacation_balance_ledger(conn):
+    """دفتر قيود رصيد الإجازات، مع قيد افتتاحي بالرصيد الحالي لكل موظف"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS vacation_balance_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        entry_type TEXT NOT NULL CHECK(entry_type IN ('استحقاق', 'خصم', 'استرجاع', 'تسوية')),
+        days INTEGER NOT NULL,
+        balance_after INTEGER NOT NULL,
+        entry_date TEXT NOT NULL,
+        vacation_id INTEGER,
+        note TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+        FOREIGN KEY(vacation_id) REFERENCES vacations(id) ON DELETE SET NULL
+    )""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_balance_ledger_employee_date
+        ON vacation_balance_ledger(employee_id, entry_date, id, balance_after)""")
+    conn.execute("""
+        INSERT INTO vacation_balance_ledger (employee_id, entry_type, days, balance_after, entry_date, note)
+        SELECT id, 'تسوية', vacation_balance, vacation_balance, date('now', 'localtime'), 'رصيد افتتاحي'
+        FROM employees
+        WHERE vacation_balance IS NOT NULL
+    """)
+
+
+def migration_009_vacation_rollovers(conn):
+    """سجل ترحيل أرصدة نهاية السنة، سطر واحد لكل سنة يمنع تكرار الترحيل"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS vacation_rollovers (
+        year INTEGER PRIMARY KEY,
+        employees INTEGER NOT NULL,
+        forfeited_days INTEGER NOT NULL,
+        accrued_days INTEGER NOT NULL,
+        annual_days INTEGER NOT NULL,
+        carry_over_cap INTEGER NOT NULL,
+        run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+
+def migration_010_work_schedule(conn):
+    """قناع بتات لأيام العمل (7 أيام × 3 فترات) وجدول جدولة مفهرس تحدّثه القوادح"""
+    add_column_if_missing(conn, "employees", "work_mask", f"INTEGER GENERATED ALWAYS AS ({WORK_MASK_SQL}) VIRTUAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS schedule_slots (
+        bit INTEGER PRIMARY KEY,
+        day INTEGER NOT NULL,
+        shift TEXT NOT NULL
+    )""")
+    conn.execute("""
+        WITH RECURSIVE bits(bit) AS (SELECT 0 UNION ALL SELECT bit + 1 FROM bits WHERE bit < 20)
+        INSERT OR IGNORE INTO schedule_slots (bit, day, shift)
+        SELECT bit, bit / 3, substr('MEF', bit % 3 + 1, 1) FROM bits
+    """)
+    conn.execute("""CREATE TABLE IF NOT EXISTS employee_schedule (
+        day INTEGER NOT NULL,
+        shift TEXT NOT NULL,
+        employee_id INTEGER NOT NULL,
+        PRIMARY KEY (day, shift, employee_id)
+    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_schedule_employee ON employee_schedule(employee_id)")
+
+    insert_slots = """
+            INSERT INTO employee_schedule (day, shift, employee_id)
+            SELECT day, shift, NEW.id FROM schedule_slots
+            WHERE NEW.work_mask & (1 << bit);"""
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_schedule_insert
+        AFTER INSERT ON employees
+        BEGIN{insert_slots}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_schedule_update
+        AFTER UPDATE OF work_days, id ON employees
+        WHEN OLD.work_days IS NOT NEW.work_days OR OLD.id != NEW.id
+        BEGIN
+            DELETE FROM employee_schedule WHERE employee_id = OLD.id;{insert_slots}
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employee_schedule_delete
+        AFTER DELETE ON employees
+        BEGIN
+            DELETE FROM employee_schedule WHERE employee_id = OLD.id;
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    conn.execute("DELETE FROM employee_schedule")
+    conn.execute("""
+        INSERT INTO employee_schedule (day, shift, employee_id)
+        SELECT s.day, s.shift, e.id
+        FROM employees e JOIN schedule_slots s ON e.work_mask & (1 << s.bit)
+    """)
+
+
+def migration_011_staffing_rules(conn):
+    """حدود الحضور الدنيا لكل قسم وفترة، مع أعداد مجهزة مسبقاً للعاملين والمجازين تحدّثها القوادح"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS staffing_rules (
+        department TEXT NOT NULL,
+        shift TEXT NOT NULL CHECK(shift IN ('M', 'E', 'F')),
+        min_staff INTEGER NOT NULL CHECK(min_staff >= 0),
+        PRIMARY KEY (department, shift)
+    ) WITHOUT ROWID""")
+    # أيام التقويم بأرقامها ويومها في ترتيب المشروع (0 = السبت) لتوسيع فترات الإجازات داخل SQL
+    conn.execute("""CREATE TABLE IF NOT EXISTS calendar_days (
+        day_num INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        weekday INTEGER NOT NULL
+    )""")
+    conn.execute("""
+        WITH RECURSIVE days(day_num) AS (
+            SELECT CAST(julianday('2000-01-01') AS INTEGER)
+            UNION ALL
+            SELECT day_num + 1 FROM days WHERE day_num < CAST(julianday('2100-12-31') AS INTEGER)
+        )
+        INSERT OR IGNORE INTO calendar_days (day_num, date, weekday)
+        SELECT day_num, date(day_num + 0.5), (CAST(strftime('%w', day_num + 0.5) AS INTEGER) + 1) % 7
+        FROM days
+    """)
+    # عدد العاملين في كل قسم لكل يوم أسبوع وفترة حسب work_mask
+    conn.execute("""CREATE TABLE IF NOT EXISTS department_slot_staff (
+        department TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        shift TEXT NOT NULL,
+        staff INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (department, day, shift)
+    ) WITHOUT ROWID""")
+    # عدد من هم في إجازة موافق عليها من العاملين في كل قسم ويوم وفترة
+    conn.execute("""CREATE TABLE IF NOT EXISTS department_day_occupancy (
+        department TEXT NOT NULL,
+        day_num INTEGER NOT NULL,
+        shift TEXT NOT NULL,
+        on_leave INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (department, day_num, shift)
+    ) WITHOUT ROWID""")
+
+    def staff_slots(row):
+        return f"""SELECT COALESCE({row}.department, ''), s.day, s.shift
+            FROM schedule_slots s WHERE {row}.work_mask & (1 << s.bit)"""
+
+    def leave_slots(source, department, mask, where):
+        return f"""SELECT COALESCE({department}, '') AS department, c.day_num, s.shift
+            FROM {source}
+            JOIN calendar_days c ON c.day_num BETWEEN v.start_day_num AND v.end_day_num
+            JOIN schedule_slots s ON s.day = c.weekday AND {mask} & (1 << s.bit)
+            WHERE {where}"""
+
+    def add_staff(row):
+        return f"""INSERT INTO department_slot_staff (department, day, shift, staff)
+            SELECT *, 1 FROM ({staff_slots(row)}) WHERE 1
+            ON CONFLICT(department, day, shift) DO UPDATE SET staff = staff + 1;"""
+
+    def remove_staff(row):
+        return f"""UPDATE department_slot_staff SET staff = staff - 1
+            WHERE (department, day, shift) IN ({staff_slots(row)});"""
+
+    def add_leave(slots):
+        return f"""INSERT INTO department_day_occupancy (department, day_num, shift, on_leave)
+            SELECT *, 1 FROM ({slots}) WHERE 1
+            ON CONFLICT(department, day_num, shift) DO UPDATE SET on_leave = on_leave + 1;"""
+
+    def remove_leave(slots):
+        return f"""UPDATE department_day_occupancy SET on_leave = on_leave - 1
+            WHERE (department, day_num, shift) IN ({slots});"""
+
+    def vacation_slots(row, condition):
+        return leave_slots(
+            f"(SELECT {row}.start_day_num AS start_day_num, {row}.end_day_num AS end_day_num) v "
+            f"JOIN employees e ON e.id = {row}.employee_id",
+            "e.department", "e.work_mask", condition
+        )
+
+    def employee_leave_slots(row):
+        return leave_slots(
+            "vacations v", f"{row}.department", f"{row}.work_mask",
+            f"v.employee_id = {row}.id AND v.status = 'موافق'"
+        )
+
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_slot_staff_insert
+        AFTER INSERT ON employees
+        BEGIN
+            {add_staff("NEW")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_slot_staff_update
+        AFTER UPDATE OF department, work_days ON employees
+        WHEN OLD.department IS NOT NEW.department OR OLD.work_days IS NOT NEW.work_days
+        BEGIN
+            {remove_staff("OLD")}
+            {add_staff("NEW")}
+            {remove_leave(employee_leave_slots("OLD"))}
+            {add_leave(employee_leave_slots("NEW"))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_slot_staff_delete
+        BEFORE DELETE ON employees
+        BEGIN
+            {remove_staff("OLD")}
+            {remove_leave(employee_leave_slots("OLD"))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_day_occupancy_insert
+        AFTER INSERT ON vacations
+        WHEN NEW.status = 'موافق'
+        BEGIN
+            {add_leave(vacation_slots("NEW", "1"))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_day_occupancy_update
+        AFTER UPDATE OF status, start_date, end_date, employee_id ON vacations
+        WHEN OLD.status = 'موافق' OR NEW.status = 'موافق'
+        BEGIN
+            {remove_leave(vacation_slots("OLD", "OLD.status = 'موافق'"))}
+            {add_leave(vacation_slots("NEW", "NEW.status = 'موافق'"))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_day_occupancy_delete
+        AFTER DELETE ON vacations
+        WHEN OLD.status = 'موافق'
+        BEGIN
+            {remove_leave(vacation_slots("OLD", "1"))}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    conn.execute("DELETE FROM department_slot_staff")
+    conn.execute("""
+        INSERT INTO department_slot_staff (department, day, shift, staff)
+        SELECT COALESCE(e.department, ''), s.day, s.shift, COUNT(*)
+        FROM employees e JOIN schedule_slots s ON e.work_mask & (1 << s.bit)
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute("DELETE FROM department_day_occupancy")
+    conn.execute(f"""
+        INSERT INTO department_day_occupancy (department, day_num, shift, on_leave)
+        SELECT department, day_num, shift, COUNT(*) FROM (
+            {leave_slots("vacations v JOIN employees e ON e.id = v.employee_id", "e.department", "e.work_mask", "v.status = 'موافق'")}
+        )
+        GROUP BY 1, 2, 3
+    """)
+
+
+def migration_012_work_calendar(conn):
+    """العطل الرسمية وعلامات عطلة نهاية الأسبوع في جدول التقويم لحساب أيام الإجازة المحتسبة"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS public_holidays (
+        date TEXT PRIMARY KEY,
+        name TEXT NOT NULL
+    )""")
+    add_column_if_missing(conn, "calendar_days", "is_weekend", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "calendar_days", "is_holiday", "INTEGER NOT NULL DEFAULT 0")
+    # الجمعة (6 في ترتيب المشروع) عطلة نهاية الأسبوع
+    conn.execute("UPDATE calendar_days SET is_weekend = (weekday = 6)")
+
+    triggers = [
+        """CREATE TRIGGER IF NOT EXISTS trg_public_holidays_insert
+        AFTER INSERT ON public_holidays
+        BEGIN
+            UPDATE calendar_days SET is_holiday = 1 WHERE day_num = CAST(julianday(NEW.date) AS INTEGER);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_public_holidays_update
+        AFTER UPDATE OF date ON public_holidays
+        BEGIN
+            UPDATE calendar_days SET is_holiday = 0 WHERE day_num = CAST(julianday(OLD.date) AS INTEGER);
+            UPDATE calendar_days SET is_holiday = 1 WHERE day_num = CAST(julianday(NEW.date) AS INTEGER);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_public_holidays_delete
+        AFTER DELETE ON public_holidays
+        BEGIN
+            UPDATE calendar_days SET is_holiday = 0 WHERE day_num = CAST(julianday(OLD.date) AS INTEGER);
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+    conn.execute("""
+        UPDATE calendar_days SET is_holiday = 1
+        WHERE day_num IN (SELECT CAST(julianday(date) AS INTEGER) FROM public_holidays)
+    """)
+
+
+def migration_013_guard_vacation_intervals(conn):
+    """قوادح فهرس R*Tree تتجاهل الإجازات بتواريخ فارغة أو غير صالحة أو نهاية قبل البداية كما يفعل الملء الأولي"""
+    inactive = ", ".join(f"'{status}'" for status in INACTIVE_VACATION_STATUSES)
+    valid = "NEW.start_day_num IS NOT NULL AND NEW.end_day_num >= NEW.start_day_num"
+    conn.execute("DROP TRIGGER IF EXISTS trg_vacation_intervals_insert")
+    conn.execute("DROP TRIGGER IF EXISTS trg_vacation_intervals_update")
+    conn.execute(f"""CREATE TRIGGER trg_vacation_intervals_insert
+        AFTER INSERT ON vacations
+        WHEN NEW.status NOT IN ({inactive}) AND {valid}
+        BEGIN
+            INSERT INTO vacation_intervals
+            VALUES (NEW.id, NEW.start_day_num, NEW.end_day_num, NEW.employee_id, NEW.employee_id);
+        END""")
+    conn.execute(f"""CREATE TRIGGER trg_vacation_intervals_update
+        AFTER UPDATE OF status, start_date, end_date, employee_id ON vacations
+        BEGIN
+            DELETE FROM vacation_intervals WHERE id = OLD.id;
+            INSERT INTO vacation_intervals
+            SELECT NEW.id, NEW.start_day_num, NEW.end_day_num, NEW.employee_id, NEW.employee_id
+            WHERE NEW.status NOT IN ({inactive}) AND {valid};
+        END""")
+
+    conn.execute("DELETE FROM vacation_intervals")
+    conn.execute(f"""
+        INSERT INTO vacation_intervals
+        SELECT id, start_day_num, end_day_num, employee_id, employee_id
+        FROM vacations
+        WHERE status NOT IN ({inactive}) AND start_day_num IS NOT NULL AND end_day_num >= start_day_num
+    """)
+
+
+def migration_014_employee_roster_version(conn):
+    """عداد يزداد مع كل إضافة أو حذف موظف أو تغيير قسمه أو أيام عمله، لتعرف ذاكرة تغطية الحضور متى تُعاد بناؤها"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS change_counters (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('employee_roster', 0)")
+
+    bump = """
+            UPDATE change_counters SET version = version + 1 WHERE name = 'employee_roster';"""
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_roster_insert
+        AFTER INSERT ON employees
+        BEGIN{bump}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_roster_update
+        AFTER UPDATE OF department, work_days, id ON employees
+        WHEN OLD.department IS NOT NEW.department OR OLD.work_days IS NOT NEW.work_days OR OLD.id != NEW.id
+        BEGIN{bump}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_roster_delete
+        AFTER DELETE ON employees
+        BEGIN{bump}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+
+def migration_015_backdate_opening_balances(conn):
+    """نقل القيد الافتتاحي من يوم الترحيل 8 إلى تاريخ التعيين، ليكون أقدم رصيد معروف لتواريخ الرصيد السابقة"""
+    # بلا تاريخ تعيين صالح يُؤرخ بـ 0001-01-01، وقبل التعيين يبقى الرصيد غير معروف
+    conn.execute("""
+        UPDATE vacation_balance_ledger
+        SET entry_date = MIN(entry_date, COALESCE(
+            (SELECT date(e.hiring_date) FROM employees e WHERE e.id = vacation_balance_ledger.employee_id),
+            '0001-01-01'
+        ))
+        WHERE entry_type = 'تسوية' AND note = 'رصيد افتتاحي'
+          AND id = (
+              SELECT MIN(first.id) FROM vacation_balance_ledger first
+              WHERE first.employee_id = vacation_balance_ledger.employee_id
+          )
+    """)
+
+
+def migration_016_employee_listing_version(conn):
+    """عداد يزداد مع كل تغيير في الاسم أو الأرقام أو القسم أو إضافة موظف أو حذفه، لذاكرة صفحات عرض الموظفين"""
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('employee_listing', 0)")
+
+    bump = """
+            UPDATE change_counters SET version = version + 1 WHERE name = 'employee_listing';"""
+    triggers = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_listing_insert
+        AFTER INSERT ON employees
+        BEGIN{bump}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_listing_update
+        AFTER UPDATE OF name, serial_number, national_id, department, id ON employees
+        WHEN OLD.name IS NOT NEW.name OR OLD.serial_number IS NOT NEW.serial_number
+          OR OLD.national_id IS NOT NEW.national_id OR OLD.department IS NOT NEW.department OR OLD.id != NEW.id
+        BEGIN{bump}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_employee_listing_delete
+        AFTER DELETE ON employees
+        BEGIN{bump}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+
+def migration_017_distinct_leave_occupancy(conn):
+    """عدد الإجازات الموافق عليها لكل موظف ويوم، ولا يتغير department_day_occupancy إلا عند انتقاله بين 0 و 1"""
+    # قوادح الترحيل 11 كانت تحسب الموظف مرتين في يوم تتداخل فيه إجازتان موافق عليهما وتنقصه مرة واحدة
+    conn.execute("""CREATE TABLE IF NOT EXISTS employee_leave_days (
+        employee_id INTEGER NOT NULL,
+        day_num INTEGER NOT NULL,
+        leaves INTEGER NOT NULL,
+        PRIMARY KEY (employee_id, day_num)
+    ) WITHOUT ROWID""")
+    for trigger in ("trg_slot_staff_update", "trg_slot_staff_delete", "trg_day_occupancy_insert",
+                    "trg_day_occupancy_update", "trg_day_occupancy_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    def staff_slots(row):
+        return f"""SELECT COALESCE({row}.department, ''), s.day, s.shift
+            FROM schedule_slots s WHERE {row}.work_mask & (1 << s.bit)"""
+
+    def day_slots(employee, days, where):
+        return f"""SELECT COALESCE({employee}.department, '') AS department, c.day_num, s.shift
+            FROM {days}
+            JOIN calendar_days c ON c.day_num = d.day_num
+            JOIN schedule_slots s ON s.day = c.weekday AND {employee}.work_mask & (1 << s.bit)
+            WHERE {where}"""
+
+    def add_leave(slots):
+        return f"""INSERT INTO department_day_occupancy (department, day_num, shift, on_leave)
+            SELECT *, 1 FROM ({slots}) WHERE 1
+            ON CONFLICT(department, day_num, shift) DO UPDATE SET on_leave = on_leave + 1;"""
+
+    def remove_leave(slots):
+        return f"""UPDATE department_day_occupancy SET on_leave = on_leave - 1
+            WHERE (department, day_num, shift) IN ({slots});"""
+
+    def employee_days(row):
+        return day_slots(row, "employee_leave_days d", f"d.employee_id = {row}.id")
+
+    def leave_day(row):
+        return day_slots("e", f"employees e JOIN (SELECT {row}.day_num AS day_num) d", f"e.id = {row}.employee_id")
+
+    def vacation_days(row):
+        return f"""FROM calendar_days c
+            WHERE c.day_num BETWEEN {row}.start_day_num AND {row}.end_day_num AND {row}.status = 'موافق'"""
+
+    def add_days(row):
+        return f"""INSERT INTO employee_leave_days (employee_id, day_num, leaves)
+            SELECT {row}.employee_id, c.day_num, 1 {vacation_days(row)}
+            ON CONFLICT(employee_id, day_num) DO UPDATE SET leaves = leaves + 1;"""
+
+    def remove_days(row):
+        # الأيام التي يصل عدادها إلى الصفر تُحذف فينقص إشغالها قادح الحذف
+        return f"""UPDATE employee_leave_days SET leaves = leaves - 1
+            WHERE employee_id = {row}.employee_id AND day_num IN (SELECT c.day_num {vacation_days(row)});
+            DELETE FROM employee_leave_days
+            WHERE employee_id = {row}.employee_id AND leaves <= 0;"""
+
+    conn.execute("DELETE FROM employee_leave_days")
+    conn.execute("""
+        INSERT INTO employee_leave_days (employee_id, day_num, leaves)
+        SELECT v.employee_id, c.day_num, COUNT(*)
+        FROM vacations v JOIN calendar_days c ON c.day_num BETWEEN v.start_day_num AND v.end_day_num
+        WHERE v.status = 'موافق'
+        GROUP BY 1, 2
+    """)
+    conn.execute("DELETE FROM department_day_occupancy")
+    conn.execute(f"""
+        INSERT INTO department_day_occupancy (department, day_num, shift, on_leave)
+        SELECT department, day_num, shift, COUNT(*) FROM (
+            {day_slots("e", "employee_leave_days d JOIN employees e ON e.id = d.employee_id", "1")}
+        )
+        GROUP BY 1, 2, 3
+    """)
+
+    triggers = [
+        f"""CREATE TRIGGER trg_slot_staff_update
+        AFTER UPDATE OF department, work_days ON employees
+        WHEN OLD.department IS NOT NEW.department OR OLD.work_days IS NOT NEW.work_days
+        BEGIN
+            UPDATE department_slot_staff SET staff = staff - 1
+            WHERE (department, day, shift) IN ({staff_slots("OLD")});
+            INSERT INTO department_slot_staff (department, day, shift, staff)
+            SELECT *, 1 FROM ({staff_slots("NEW")}) WHERE 1
+            ON CONFLICT(department, day, shift) DO UPDATE SET staff = staff + 1;
+            {remove_leave(employee_days("OLD"))}
+            {add_leave(employee_days("NEW"))}
+        END""",
+        # حذف أيام الإجازة قبل حذف الموظف حتى يجد قادحها قسمه وأيام عمله
+        f"""CREATE TRIGGER trg_slot_staff_delete
+        BEFORE DELETE ON employees
+        BEGIN
+            UPDATE department_slot_staff SET staff = staff - 1
+            WHERE (department, day, shift) IN ({staff_slots("OLD")});
+            DELETE FROM employee_leave_days WHERE employee_id = OLD.id;
+        END""",
+        f"""CREATE TRIGGER trg_leave_days_insert
+        AFTER INSERT ON employee_leave_days
+        BEGIN
+            {add_leave(leave_day("NEW"))}
+        END""",
+        f"""CREATE TRIGGER trg_leave_days_delete
+        AFTER DELETE ON employee_leave_days
+        BEGIN
+            {remove_leave(leave_day("OLD"))}
+        END""",
+        f"""CREATE TRIGGER trg_day_occupancy_insert
+        AFTER INSERT ON vacations
+        WHEN NEW.status = 'موافق'
+        BEGIN
+            {add_days("NEW")}
+        END""",
+        f"""CREATE TRIGGER trg_day_occupancy_update
+        AFTER UPDATE OF status, start_date, end_date, employee_id ON vacations
+        WHEN OLD.status = 'موافق' OR NEW.status = 'موافق'
+        BEGIN
+            {remove_days("OLD")}
+            {add_days("NEW")}
+        END""",
+        f"""CREATE TRIGGER trg_day_occupancy_delete
+        AFTER DELETE ON vacations
+        WHEN OLD.status = 'موافق'
+        BEGIN
+            {remove_days("OLD")}
+        END""",
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+
+# (رقم الإصدار، دالة الترحيل) بترتيب تصاعدي، ولا يُعدّل ترحيل بعد نشره
+MIGRATIONS = [
+    (1, migration_001_base_schema),
+    (2, migration_002_missing_columns),
+    (3, migration_003_vacation_counters),
+    (4, migration_004_date_keys),
+    (5, migration_005_vacation_intervals),
+    (6, migration_006_employee_search),
+    (7, migration_007_employee_name_index),
+    (8, migration_008_vacation_balance_ledger),
+    (9, migration_009_vacation_rollovers),
+    (10, migration_010_work_schedule),
+    (11, migration_011_staffing_rules),
+    (12, migration_012_work_calendar),
+    (13, migration_013_guard_vacation_intervals),
+    (14, migration_014_employee_roster_version),
+    (15, migration_015_backdate_opening_balances),
+    (16, migration_016_employee_listing_version),
+    (17, migration_017_distinct_leave_occupancy),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """تطبيق الترحيلات المعلقة في معاملة واحدة، وإرجاع عدد ما طُبق منها"""
+    # المسار السريع: المخطط محدث فلا حاجة لأي أمر DDL
+    if schema_version(conn) >= LATEST_VERSION:
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # إعادة القراءة بعد حجز القفل، فقد تكون عملية أخرى طبقت الترحيلات
+        current = schema_version(conn)
+        pending = [(version, migration) for version, migration in MIGRATIONS if version > current]
+        for version, migration in pending:
+            migration(conn)
+        if pending:
+            conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+        conn.commit()
+        return len(pending)
+    except sqlite3.Error:
+        conn.rollback()
+        raise
@@ -0,0 +1,171 @@
+import csv
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query):
+    """توحيد نص الاستعلام لتجميع الاستعلامات المتشابهة تحت مفتاح واحد"""
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return _IN_LIST.sub("(?...)", normalized)
+
+
+class StatementStats:
+    """إحصائيات استعلام واحد موحّد"""
+
+    def __init__(self, max_samples):
+        self.max_samples = max_samples
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        # عينة عشوائية محدودة الحجم تكفي لتقدير النسب المئوية
+        if len(self.samples) < self.max_samples:
+            self.samples.append(elapsed)
+        else:
+            slot = random.randrange(self.calls)
+            if slot < self.max_samples:
+                self.samples[slot] = elapsed
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class TimedConnection:
+    """غلاف لاتصال معاملة أو لقطة قراءة يقيس زمن execute وexecutemany ويمرر بقية الخصائص كما هي"""
+
+    def __init__(self, conn, instrumentation):
+        self.conn = conn
+        self.instrumentation = instrumentation
+
+    def execute(self, query, params=()):
+        return self.instrumentation.timed(self.conn, query, params, lambda: self.conn.execute(query, params))
+
+    def executemany(self, query, seq_of_params):
+        started = time.perf_counter()
+        cursor = self.conn.executemany(query, seq_of_params)
+        # لا خطة تنفيذ هنا لأن المعاملات قائمة صفوف وليست صفاً واحداً
+        self.instrumentation.record(query, time.perf_counter() - started)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class QueryInstrumentation:
+    """قياس زمن الاستعلامات وتسجيل البطيء منها مع خطة التنفيذ"""
+
+    EXPORT_FIELDS = ['statement', 'calls', 'total_ms', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    LOCK_WAIT_FIELDS = ['acquisitions', 'retries', 'failures', 'total_wait_ms', 'avg_wait_ms', 'max_wait_ms']
+
+    def __init__(self, slow_threshold_ms=100, slow_log_path="slow_queries.log", max_samples=500, lock_stats=None):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.slow_log_path = slow_log_path
+        self.max_samples = max_samples
+        # إحصائيات انتظار قفل الكتابة (LockWaitStats) من DatabaseManager
+        self.lock_stats = lock_stats
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def timed(self, conn, query, params, run):
+        """تنفيذ run() وقياس زمنها ثم تسجيلها تحت الاستعلام الموحّد"""
+        started = time.perf_counter()
+        result = run()
+        self.observe(conn, query, params, time.perf_counter() - started)
+        return result
+
+    def observe(self, conn, query, params, elapsed):
+        """تسجيل زمن مقيس مسبقاً (مثل مجموع دفعات القراءة المتدفقة) وتسجيله في سجل البطيء إن تجاوز الحد"""
+        self.record(query, elapsed)
+        if elapsed >= self.slow_threshold:
+            self.log_slow_query(conn, query, params, elapsed)
+
+    def record(self, query, elapsed):
+        statement = normalize_sql(query)
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = StatementStats(self.max_samples)
+            stats.add(elapsed)
+
+    def explain(self, conn, query, params):
+        """خطة التنفيذ التي اختارها SQLite للاستعلام"""
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            return "\n".join(f"  {row[3]}" for row in rows)
+        except Exception as e:
+            return f"  تعذر الحصول على الخطة: {e}"
+
+    def log_slow_query(self, conn, query, params, elapsed):
+        if not self.slow_log_path:
+            return
+        plan = self.explain(conn, query, params)
+        entry = (
+            f"[{datetime.now().isoformat(timespec='seconds')}] {elapsed * 1000:.1f} ms\n"
+            f"{normalize_sql(query)}\n"
+            f"params: {list(params)}\n"
+            f"plan:\n{plan}\n\n"
+        )
+        with self._lock:
+            with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(entry)
+
+    def snapshot(self):
+        """الإحصائيات المجمعة لكل استعلام مرتبة حسب الزمن الكلي (بالميلي ثانية)"""
+        with self._lock:
+            rows = []
+            for statement, stats in self._stats.items():
+                rows.append({
+                    'statement': statement,
+                    'calls': stats.calls,
+                    'total_ms': round(stats.total * 1000, 3),
+                    'avg_ms': round(stats.total / stats.calls * 1000, 3),
+                    'p50_ms': round(stats.percentile(0.50) * 1000, 3),
+                    'p95_ms': round(stats.percentile(0.95) * 1000, 3),
+                    'p99_ms': round(stats.percentile(0.99) * 1000, 3),
+                    'max_ms': round(stats.max * 1000, 3),
+                })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def export_csv(self, file_path):
+        """تصدير الإحصائيات المجمعة إلى ملف CSV"""
+        with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=self.EXPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.snapshot())
+
+    def lock_waits(self):
+        """إحصائيات انتظار الكُتّاب على قفل القاعدة (الأزمنة بالميلي ثانية)"""
+        return self.lock_stats.snapshot() if self.lock_stats else {}
+
+    def export_lock_waits_csv(self, file_path):
+        """تصدير إحصائيات انتظار قفل الكتابة إلى ملف CSV"""
+        with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=self.LOCK_WAIT_FIELDS)
+            writer.writeheader()
+            writer.writerow(self.lock_waits())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        if self.lock_stats:
+            self.lock_stats.reset()
@@ -0,0 +1,161 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from date_keys import day_number
+from work_schedule import DAY_NAMES, SHIFTS, SHIFT_NAMES, WorkSchedule, mask_matrix
+
+
+def presence_matrix(masks):
+    """حضور كل موظف (موظف × يوم × فترة): كامل اليوم يُحسب في الصباحية والمسائية"""
+    slots = mask_matrix(masks)
+    presence = slots.copy()
+    full_day = SHIFTS.index("F")
+    for shift in ("M", "E"):
+        presence[:, :, SHIFTS.index(shift)] |= slots[:, :, full_day]
+    return presence.astype(np.int32)
+
+
+def project_weekday(value):
+    """رقم اليوم في ترتيب المشروع (0 = السبت)"""
+    return (value.weekday() + 2) % 7
+
+
+class StaffingCoverage:
+    """عدد الحاضرين لكل قسم ويوم وفترة للأيام القادمة، من جداول العمل ناقص الإجازات الموافق عليها والغياب"""
+
+    def __init__(self, db_manager, horizon_days=60):
+        self.db = db_manager
+        self.schedule = WorkSchedule(db_manager)
+        self.horizon = horizon_days
+        self._lock = threading.Lock()
+        self.start = None
+        self.signature = None
+        self.departments = []
+        self.scheduled = np.zeros((0, horizon_days, len(SHIFTS)), dtype=np.int32)
+        self.absent = np.zeros_like(self.scheduled)
+        self.leaves = {}
+
+    def refresh(self):
+        """إعادة البناء عند تغير اليوم أو الموظفين، وإلا تطبيق فروق الإجازات والغياب فقط"""
+        with self._lock:
+            today = date.today()
+            # عداد تزيده قوادح الموظفين مع كل تعديل يمس الجداول، فلا يفوته تعديلان في نفس الثانية
+            signature = self.db.change_version('employee_roster')
+            if today != self.start or signature != self.signature:
+                self.rebuild(today, signature)
+            self.sync_leaves()
+
+    def rebuild(self, start, signature):
+        ids, departments, masks = self.schedule.load_masks()
+        departments = np.array([dept or "" for dept in departments], dtype=object)
+        self.start = start
+        self.signature = signature
+        self.start_day = day_number(start)
+        self.dates = [start + timedelta(days=offset) for offset in range(self.horizon)]
+        self.weekdays = np.array([project_weekday(day) for day in self.dates], dtype=np.int64)
+        self.departments, self.dept_index = np.unique(departments, return_inverse=True)
+        self.departments = list(self.departments)
+        self.row_of = {int(emp_id): row for row, emp_id in enumerate(ids)}
+        self.presence = presence_matrix(masks)
+
+        weekly = np.zeros((len(self.departments), len(DAY_NAMES), len(SHIFTS)), dtype=np.int32)
+        np.add.at(weekly, self.dept_index, self.presence)
+        self.scheduled = weekly[:, self.weekdays, :]
+        self.absent = np.zeros_like(self.scheduled)
+        # عدد أسباب الغياب لكل موظف ويوم، حتى لا يُخصم يوم تتداخل فيه إجازة وغياب مرتين
+        self.off = np.zeros((len(ids), self.horizon), dtype=np.int16)
+        self.leaves = {}
+
+    def current_leaves(self):
+        """الإجازات الموافق عليها والغياب داخل الفترة: مفتاح ← (الموظف، أول يوم، آخر يوم)"""
+        first, last = self.start_day, self.start_day + self.horizon - 1
+        leaves = {}
+        rows = self.db.execute_query("""
+            SELECT id, employee_id, start_day_num, end_day_num FROM vacations
+            WHERE status = 'موافق' AND start_day_num <= ? AND end_day_num >= ?
+        """, (last, first), commit=False).fetchall()
+        for vacation_id, employee_id, start_day, end_day in rows:
+            leaves[('vacation', vacation_id)] = (employee_id, start_day, end_day)
+        rows = self.db.execute_query("""
+            SELECT id, employee_id, day_num, day_num + MAX(COALESCE(duration, 1), 1) - 1 FROM absences
+            WHERE day_num BETWEEN ? AND ?
+        """, (first - 31, last), commit=False).fetchall()
+        for absence_id, employee_id, start_day, end_day in rows:
+            if end_day >= first:
+                leaves[('absence', absence_id)] = (employee_id, start_day, end_day)
+        return leaves
+
+    def sync_leaves(self):
+        """تطبيق ما أضيف أو أزيل أو تغير من الإجازات والغياب منذ آخر تحديث"""
+        current = self.current_leaves()
+        for key, leave in list(self.leaves.items()):
+            if current.get(key) != leave:
+                self.mark(*leave, -1)
+                del self.leaves[key]
+        for key, leave in current.items():
+            if key not in self.leaves:
+                self.mark(*leave, 1)
+                self.leaves[key] = leave
+
+    def mark(self, employee_id, start_day, end_day, delta):
+        """إضافة (1) أو إزالة (-1) غياب موظف عن أيام، وتعديل عدد الغائبين عند تغير حالته فقط"""
+        row = self.row_of.get(employee_id)
+        first = max(start_day - self.start_day, 0)
+        last = min(end_day - self.start_day, self.horizon - 1)
+        if row is None or first > last:
+            return
+        span = slice(first, last + 1)
+        before = self.off[row, span] > 0
+        self.off[row, span] += delta
+        changed = (self.off[row, span] > 0).astype(np.int32) - before
+        self.absent[self.dept_index[row], span, :] += changed[:, None] * self.presence[row, self.weekdays[span], :]
+
+    def department_coverage(self, department):
+        """مصفوفة (يوم × فترة) بعدد الحاضرين المتوقع في القسم"""
+        self.refresh()
+        with self._lock:
+            if department not in self.departments:
+                return np.zeros((self.horizon, len(SHIFTS)), dtype=np.int32)
+            index = self.departments.index(department)
+            return self.scheduled[index] - self.absent[index]
+
+    def coverage_rows(self, department):
+        """صفوف العرض: (التاريخ، اسم اليوم، حاضرون لكل فترة...)"""
+        coverage = self.department_coverage(department)
+        return [
+            (day.isoformat(), DAY_NAMES[weekday], *counts.tolist())
+            for day, weekday, counts in zip(self.dates, self.weekdays, coverage)
+        ]
+
+    def vacation_impact(self, employee_id, start_date, end_date):
+        """أثر غياب الموظف على حضور قسمه: لكل فترة يعمل بها (الفترة، أدنى حضور بعد الإجازة، قبلها، التاريخ)"""
+        self.refresh()
+        with self._lock:
+            row = self.row_of.get(employee_id)
+            first = max(day_number(start_date) - self.start_day, 0)
+            last = min(day_number(end_date) - self.start_day, self.horizon - 1)
+            if row is None or first > last:
+                return []
+            span = slice(first, last + 1)
+            index = self.dept_index[row]
+            before = self.scheduled[index, span] - self.absent[index, span]
+            working = self.presence[row, self.weekdays[span], :] * (self.off[row, span] == 0)[:, None]
+            after = before - working
+            impact = []
+            for column, shift in enumerate(SHIFTS):
+                if not working[:, column].any():
+                    continue
+                # أسوأ يوم من الأيام التي يغيب فيها الموظف عن هذه الفترة
+                worked_days = np.flatnonzero(working[:, column])
+                worst = worked_days[np.argmin(after[worked_days, column])]
+                impact.append((shift, int(after[worst, column]), int(before[worst, column]), self.dates[first + worst]))
+            return impact
+
+    @staticmethod
+    def impact_lines(impact):
+        return [
+            f"• {SHIFT_NAMES[shift]}: {after} حاضر بعد الإجازة (من {before}) يوم {day.isoformat()}"
+            for shift, after, before, day in impact
+        ]
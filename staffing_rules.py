@@ -0,0 +1,79 @@
+from work_schedule import SHIFTS, SHIFT_NAMES
+
+# الحضور المتاح لكل يوم من أيام الإجازة وكل فترة لها حد أدنى في قسم الموظف، من الجداول المجهزة مسبقاً.
+# كامل اليوم يُحسب ضمن الصباحية والمسائية، وown هو حضور الموظف نفسه في تلك الفترة،
+# وcounted أن الموظف محسوب أصلاً في department_day_occupancy ذلك اليوم (بهذه الإجازة داخل معاملة الاعتماد أو بغيرها)
+CAPACITY_CHECK_SQL = """
+    WITH request AS (
+        SELECT COALESCE(e.department, '') AS department, e.work_mask AS mask,
+               v.employee_id, v.start_day_num AS first_day, v.end_day_num AS last_day
+        FROM vacations v JOIN employees e ON e.id = v.employee_id
+        WHERE v.id = ?
+    )
+    SELECT c.date, r.shift, r.min_staff,
+           COALESCE((SELECT SUM(staff) FROM department_slot_staff
+                     WHERE department = q.department AND day = c.weekday AND shift IN (r.shift, 'F')), 0)
+         - COALESCE((SELECT SUM(on_leave) FROM department_day_occupancy
+                     WHERE department = q.department AND day_num = c.day_num AND shift IN (r.shift, 'F')), 0)
+           AS available,
+           (q.mask & ((1 << (c.weekday * 3 + CASE r.shift WHEN 'M' THEN 0 WHEN 'E' THEN 1 ELSE 2 END))
+                      | (1 << (c.weekday * 3 + 2)))) != 0 AS own,
+           EXISTS (SELECT 1 FROM employee_leave_days
+                   WHERE employee_id = q.employee_id AND day_num = c.day_num) AS counted
+    FROM request q
+    JOIN staffing_rules r ON r.department = q.department
+    JOIN calendar_days c ON c.day_num BETWEEN q.first_day AND q.last_day
+    ORDER BY c.day_num, r.shift
+"""
+
+
+class StaffingRules:
+    """حدود الحضور الدنيا لكل قسم وفترة، وفحصها عند اعتماد الإجازات"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def rules(self, department):
+        """{الفترة: الحد الأدنى} للقسم"""
+        rows = self.db.execute_query(
+            "SELECT shift, min_staff FROM staffing_rules WHERE department = ?", (department,), commit=False
+        ).fetchall()
+        return dict(rows)
+
+    def set_rule(self, department, shift, min_staff):
+        """تعيين الحد الأدنى لفترة، وحذفه إذا كان صفراً"""
+        if shift not in SHIFTS:
+            raise Exception(f"فترة غير معروفة: {shift}")
+        if min_staff > 0:
+            self.db.execute_query("""
+                INSERT INTO staffing_rules (department, shift, min_staff) VALUES (?, ?, ?)
+                ON CONFLICT(department, shift) DO UPDATE SET min_staff = excluded.min_staff
+            """, (department, shift, min_staff))
+        else:
+            self.db.execute_query(
+                "DELETE FROM staffing_rules WHERE department = ? AND shift = ?", (department, shift)
+            )
+
+    @staticmethod
+    def violations(conn, vacation_id):
+        """الأيام والفترات التي ينزل فيها الحضور عن الحد إذا اعتُمدت الإجازة: (التاريخ، الفترة، المتاح بعدها، الحد)"""
+        rows = conn.execute(CAPACITY_CHECK_SQL, (vacation_id,)).fetchall()
+        violations = []
+        for day, shift, min_staff, available, own, counted in rows:
+            after = available if counted else available - own
+            if own and after < min_staff:
+                violations.append((day, shift, after, min_staff))
+        return violations
+
+    @staticmethod
+    def check(conn, vacation_id):
+        """رفع استثناء إذا كان اعتماد الإجازة يخالف حدود الحضور الدنيا لقسم الموظف"""
+        violations = StaffingRules.violations(conn, vacation_id)
+        if not violations:
+            return
+        details = "\n".join(
+            f"• {day} {SHIFT_NAMES[shift]}: {available} حاضر والحد الأدنى {min_staff}"
+            for day, shift, available, min_staff in violations[:5]
+        )
+        more = f"\n... و{len(violations) - 5} فترات أخرى" if len(violations) > 5 else ""
+        raise Exception(f"اعتماد الإجازة ينزل بالحضور عن الحد الأدنى للقسم:\n{details}{more}")
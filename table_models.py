@@ -0,0 +1,227 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor
+from PyQt6.QtWidgets import (
+    QTableView, QHeaderView, QStyledItemDelegate, QStyleOptionButton,
+    QStyle, QApplication, QMessageBox
+)
+
+# ألوان حالات الإجازة المشتركة بين الجداول
+VACATION_STATUS_COLORS = {
+    'موافق': QColor(200, 255, 200),
+    'مرفوض من المدير': QColor(255, 200, 200),
+    'مرفوض من رئيس القسم': QColor(255, 200, 200),
+    'مرفوض': QColor(255, 200, 200),
+    'بانتظار موافقة رئيس القسم': QColor(255, 245, 200),
+    'بانتظار موافقة المدير': QColor(220, 220, 255),
+}
+
+
+class SqlQueryTableModel(QAbstractTableModel):
+    """نموذج جدول يقرأ نتيجة استعلام SQL على دفعات عند التمرير بدلاً من تحميلها كاملة"""
+
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, db_manager, headers, batch_size=200, empty_text=None, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.headers = list(headers)
+        self.batch_size = batch_size
+        self.empty_text = empty_text
+        # رقم العمود ← تعبير SQL يُرتب به عند الفرز
+        self.sort_expressions = {}
+        self.query = None
+        self.params = ()
+        self.order_by = None
+        self.rows = []
+        self.has_more = False
+        self.error = None
+
+    def set_query(self, query, params=(), order_by=None):
+        """تعيين الاستعلام (بدون ORDER BY) وإعادة التحميل من أول دفعة"""
+        self.query = query
+        self.params = tuple(params)
+        self.order_by = order_by
+        self.refresh()
+
+    def refresh(self):
+        """إعادة تنفيذ الاستعلام الحالي"""
+        self.beginResetModel()
+        self.rows = []
+        self.has_more = self.query is not None
+        self.error = None
+        self.rows.extend(self.next_batch())
+        self.endResetModel()
+
+    def next_batch(self):
+        """الدفعة التالية باستعلام LIMIT مستقل، فلا يبقى مؤشر أو لقطة قراءة مفتوحة بين أحداث الواجهة"""
+        if not self.has_more:
+            return []
+        query = self.query + (f" ORDER BY {self.order_by}" if self.order_by else "") + " LIMIT ? OFFSET ?"
+        try:
+            # صف زائد لمعرفة وجود دفعة تالية دون استعلام عدّ
+            rows = self.db.execute_query(
+                query, self.params + (self.batch_size + 1, len(self.rows)), commit=False
+            ).fetchall()
+        except Exception as e:
+            self.error = str(e)
+            self.has_more = False
+            self.load_failed.emit(self.error)
+            return []
+        self.has_more = len(rows) > self.batch_size
+        return rows[:self.batch_size]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        rows = self.next_batch()
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def is_empty(self):
+        """لا توجد صفوف ولا دفعات متبقية"""
+        return not self.rows and not self.has_more
+
+    def row_values(self, row):
+        """قيم الصف كما أرجعها الاستعلام، أو None لصف غير موجود"""
+        if 0 <= row < len(self.rows):
+            return self.rows[row]
+        return None
+
+    def display_value(self, values, column):
+        """النص المعروض في الخلية، ويمكن للنماذج الفرعية تخصيصه"""
+        value = values[column] if column < len(values) else None
+        return "" if value is None else str(value)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self.is_empty() and self.message():
+            return 1
+        return len(self.rows)
+
+    def message(self):
+        """نص الصف الوحيد للجدول الفارغ: سبب فشل التحميل أو رسالة عدم وجود بيانات"""
+        if self.error:
+            return f"تعذر تحميل البيانات: {self.error}"
+        return self.empty_text
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        values = self.row_values(index.row())
+        if values is None:
+            # صف رسالة الجدول الفارغ
+            if index.column() == 0 and role == Qt.ItemDataRole.DisplayRole:
+                return self.message()
+            if role == Qt.ItemDataRole.TextAlignmentRole:
+                return Qt.AlignmentFlag.AlignCenter
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.display_value(values, index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def flags(self, index):
+        if self.row_values(index.row()) is None:
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """الفرز في SQL حتى لا يلزم تحميل كل الصفوف"""
+        expression = self.sort_expressions.get(column)
+        if not expression:
+            return
+        direction = "DESC" if order == Qt.SortOrder.DescendingOrder else "ASC"
+        self.order_by = f"{expression} {direction}"
+        self.refresh()
+
+
+class SqlTableView(QTableView):
+    """جدول للقراءة فقط يعرض SqlQueryTableModel ويمد رسالة الجدول الفارغ على كل الأعمدة"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        model.modelReset.connect(self.update_empty_span)
+        # مؤجلة حتى لا تظهر الرسالة أثناء إعادة ضبط النموذج
+        model.load_failed.connect(self.show_load_error, Qt.ConnectionType.QueuedConnection)
+        self.update_empty_span()
+
+    def update_empty_span(self):
+        self.clearSpans()
+        model = self.model()
+        if model.is_empty() and model.message():
+            self.setSpan(0, 0, 1, model.columnCount())
+
+    def show_load_error(self, message):
+        self.update_empty_span()
+        QMessageBox.critical(self, "خطأ", f"خطأ في تحميل بيانات الجدول: {message}")
+
+
+class StatusColorDelegate(QStyledItemDelegate):
+    """تلوين خلفية الصف حسب قيمة عمود الحالة عند الرسم"""
+
+    def __init__(self, status_column, colors=VACATION_STATUS_COLORS, parent=None):
+        super().__init__(parent)
+        self.status_column = status_column
+        self.colors = colors
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        color = self.colors.get(index.siblingAtColumn(self.status_column).data())
+        if color is not None:
+            option.backgroundBrush = QBrush(color)
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """زر مرسوم داخل الخلية دون إنشاء عنصر واجهة لكل صف"""
+
+    clicked = pyqtSignal(int)
+
+    def __init__(self, text, is_visible, parent=None):
+        super().__init__(parent)
+        self.text = text
+        # is_visible(values) تحدد الصفوف التي يظهر فيها الزر
+        self.is_visible = is_visible
+
+    def button_visible(self, index):
+        values = index.model().row_values(index.row())
+        return values is not None and self.is_visible(values)
+
+    def paint(self, painter, option, index):
+        if not self.button_visible(index):
+            super().paint(painter, option, index)
+            return
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(4, 3, -4, -3)
+        button.text = self.text
+        button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and self.button_visible(index)
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index.row())
+            return True
+        return False
@@ -1,4 +1,12 @@
 from approval_flow import ApprovalFlow
+from async_db import AsyncDatabase
+from vacation_overlap import VacationOverlapService
+from vacation_ledger import VacationLedger
+from database_queries import DatabaseQueries
+from work_schedule import SPECIAL_WORK_STATUSES, describe_work_days
+from staffing_coverage import StaffingCoverage
+from vacation_calendar import VacationCalendar
+from hijri import format_hijri, parse_hijri
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
     ApplicationBuilder,
@@ -9,7 +17,7 @@ from telegram.ext import (
     ConversationHandler
 )
 import logging
-from datetime import datetime, timedelta
+from datetime import date
 from PyQt6.QtCore import QDate
 
 # Logging configuration
@@ -32,6 +40,12 @@ class EmployeeQueryBot:
     def __init__(self, token, db_manager):
         self.token = token
         self.db = db_manager
+        self.adb = AsyncDatabase(db_manager)
+        self.approval_flow = ApprovalFlow(db_manager)
+        self.overlap_service = VacationOverlapService(db_manager)
+        self.coverage = StaffingCoverage(db_manager)
+        self.calendar = VacationCalendar(db_manager)
+        self.ledger = VacationLedger(db_manager)
         self.setup_handlers()
 
     def setup_handlers(self):
@@ -85,7 +99,7 @@ class EmployeeQueryBot:
         return SERIAL_NUMBER
 
     async def handle_serial_number(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        employee = self.get_employee(
+        employee = await self.get_employee(
             context.user_data['national_id'],
             update.message.text
         )
@@ -117,21 +131,12 @@ class EmployeeQueryBot:
         if text.startswith("❌ إلغاء الإجازة"):
             try:
                 vac_id = int(text.replace("❌ إلغاء الإجازة", "").strip())
-                self.db.execute_query("SELECT type, duration, status FROM vacations WHERE id=? AND employee_id=?", (vac_id, context.user_data['employee']['id']))
-                row = self.db.cursor.fetchone()
-                if not row:
-                    await update.message.reply_text("تعذر العثور على الإجازة.")
-                    return MAIN_MENU
-                vac_type, duration, status = row
-                if status != "موافق":
-                    await update.message.reply_text("لا يمكن إلغاء إلا الإجازات الموافق عليها فقط.")
+                error = await self.adb.transaction(
+                    self.cancel_approved_vacation, vac_id, context.user_data['employee']['id']
+                )
+                if error:
+                    await update.message.reply_text(error)
                     return MAIN_MENU
-                self.db.execute_query("UPDATE vacations SET status='ملغاة' WHERE id=?", (vac_id,))
-                if vac_type == "سنوية":
-                    self.db.execute_query(
-                        "UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id = ?",
-                        (duration, context.user_data['employee']['id'])
-                    )
                 await update.message.reply_text("تم إلغاء الإجازة بنجاح وتم استرجاع الأيام للرصيد.")
                 await self.show_vacation_history(update, context)
                 return MAIN_MENU
@@ -164,6 +169,22 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
 
+    @staticmethod
+    def cancel_approved_vacation(conn, vac_id, emp_id):
+        """إلغاء إجازة موافق عليها واسترجاع رصيدها، وإرجاع رسالة خطأ أو None"""
+        row = conn.execute(
+            "SELECT type, duration, status FROM vacations WHERE id=? AND employee_id=?", (vac_id, emp_id)
+        ).fetchone()
+        if not row:
+            return "تعذر العثور على الإجازة."
+        vac_type, duration, status = row
+        if status != "موافق":
+            return "لا يمكن إلغاء إلا الإجازات الموافق عليها فقط."
+        DatabaseQueries.change_status(conn, vac_id, "موافق", "ملغاة")
+        if vac_type == "سنوية":
+            VacationLedger.refund(conn, emp_id, duration, vac_id)
+        return None
+
     async def show_vacation_types(self, update: Update):
         keyboard = [
             ["سنوية", "وفاة", "حج"],
@@ -200,7 +221,7 @@ class EmployeeQueryBot:
         else:
             context.user_data['date_step'] = 'year'
             await update.message.reply_text(
-                "الرجاء إدخال سنة بداية الإجازة (مثال: 2023):",
+                "الرجاء إدخال سنة بداية الإجازة (مثال: 2023)،\nأو التاريخ الهجري كاملاً (مثال: 1447-09-15):",
                 reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
             )
             return VACATION_DATE
@@ -215,7 +236,7 @@ class EmployeeQueryBot:
         context.user_data['vacation']['subtype'] = subtype
         context.user_data['date_step'] = 'year'
         await update.message.reply_text(
-            "الرجاء إدخال سنة بداية الإجازة (مثال: 2023):",
+            "الرجاء إدخال سنة بداية الإجازة (مثال: 2023)،\nأو التاريخ الهجري كاملاً (مثال: 1447-09-15):",
             reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
         )
         return VACATION_DATE
@@ -228,27 +249,17 @@ class EmployeeQueryBot:
             await update.message.reply_text("لم أستطع تحديد الموظف. يرجى التأكد من اختيار الموظف أولاً.")
             return
 
-        self.db.execute_query("SELECT work_days FROM employees WHERE id = ?", (emp_id,))
-        result = self.db.cursor.fetchone()
+        result = await self.adb.fetchone("SELECT work_days FROM employees WHERE id = ?", (emp_id,))
         if not result:
             await update.message.reply_text("لم يتم العثور على بيانات هذا الموظف.")
             return
 
         work_days = result[0] or ""
-        if work_days == "الندب" or work_days == "تفرغ":
-            await update.message.reply_text(f"حالة الموظف: {work_days}")
-        elif work_days:
-            days_map = {
-                "0": "السبت", "1": "الأحد", "2": "الإثنين",
-                "3": "الثلاثاء", "4": "الأربعاء", "5": "الخميس", "6": "الجمعة"
-            }
-            periods_map = {"M": "صباحية", "E": "مسائية", "F": "كامل اليوم"}
-            msg = "أيام العمل:\n"
-            for wd in work_days.split(","):
-                if ":" in wd:
-                    day, period = wd.split(":")
-                    msg += f"- {days_map.get(day, day)}: {periods_map.get(period, period)}\n"
-            await update.message.reply_text(msg)
+        lines = describe_work_days(work_days)
+        if work_days in SPECIAL_WORK_STATUSES:
+            await update.message.reply_text(lines[0])
+        elif lines:
+            await update.message.reply_text("أيام العمل:\n" + "\n".join(lines) + "\n")
         else:
             await update.message.reply_text("لا توجد بيانات أيام عمل لهذا الموظف.")
 
@@ -264,9 +275,9 @@ class EmployeeQueryBot:
             return ConversationHandler.END
 
         if action == "موافق":
-            success, message = self.approval_flow.approve_by_head(vacation_id, telegram_id)
+            success, message = await self.adb.run(self.approval_flow.approve_by_head, vacation_id, telegram_id)
         elif action == "رفض":
-            success, message = self.approval_flow.reject_by_head(vacation_id, telegram_id, reason)
+            success, message = await self.adb.run(self.approval_flow.reject_by_head, vacation_id, telegram_id, reason)
         else:
             success, message = False, "إجراء غير صالح."
 
@@ -277,11 +288,10 @@ class EmployeeQueryBot:
 
     async def notify_manager(self, vacation_id):
         try:
-            self.db.execute_query(
+            vacation = await self.adb.fetchone(
                 "SELECT e.name, v.type, v.start_date, v.end_date FROM vacations v JOIN employees e ON v.employee_id = e.id WHERE v.id = ?",
                 (vacation_id,)
             )
-            vacation = self.db.cursor.fetchone()
             if not vacation:
                 raise Exception("تعذر العثور على تفاصيل الإجازة.")
 
@@ -304,23 +314,36 @@ class EmployeeQueryBot:
 
     async def send_vacation_request_to_head(self, context, employee, vacation, vacation_id):
         try:
-            self.db.execute_query("""
+            result = await self.adb.fetchone("""
                 SELECT telegram_user_id
                 FROM department_heads
                 WHERE department = ?
             """, (employee['department'],))
-            result = self.db.cursor.fetchone()
             if not result or not result[0]:
                 return False, "❌ لم يتم العثور على رئيس قسم لهذا القسم أو لا يوجد معرف تليجرام."
 
             telegram_id = result[0]
+            overlapping = await self.adb.run(
+                self.overlap_service.overlapping_in_department,
+                employee['department'], vacation['start_date'], vacation['end_date'], employee['id']
+            )
             msg = (
                 f"📢 طلب إجازة جديد من {employee['name']} في قسم {employee['department']}:\n"
                 f"• النوع: {vacation['type']}\n"
                 f"• المدة: {vacation['duration']} يوم\n"
                 f"• من: {vacation['start_date']} إلى {vacation['end_date']}\n"
-                f"\nيرجى اختيار أحد الخيارات:"
             )
+            if overlapping:
+                msg += "\n👥 زملاء في إجازة خلال نفس الفترة:\n"
+                for _, name, start, end, status in overlapping:
+                    msg += f"• {name}: {start} إلى {end} ({status})\n"
+            impact = await self.adb.run(
+                self.coverage.vacation_impact, employee['id'], vacation['start_date'], vacation['end_date']
+            )
+            if impact:
+                msg += "\n📊 أدنى حضور متوقع في القسم خلال الإجازة:\n"
+                msg += "\n".join(self.coverage.impact_lines(impact)) + "\n"
+            msg += "\nيرجى اختيار أحد الخيارات:"
             from telegram import ReplyKeyboardMarkup
             keyboard = [["موافق", "رفض"]]
 
@@ -361,7 +384,7 @@ class EmployeeQueryBot:
             context.user_data['vacation']['duration'] = 3
             context.user_data['date_step'] = 'year'
             await update.message.reply_text(
-                "الرجاء إدخال سنة الوفاة (مثال: 2023):",
+                "الرجاء إدخال سنة الوفاة (مثال: 2023)،\nأو التاريخ الهجري كاملاً (مثال: 1447-09-15):",
                 reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
             )
             return VACATION_DATE
@@ -384,7 +407,7 @@ class EmployeeQueryBot:
             context.user_data['vacation']['duration'] = 7
         context.user_data['date_step'] = 'year'
         await update.message.reply_text(
-            "الرجاء إدخال سنة الوفاة (مثال: 2023):",
+            "الرجاء إدخال سنة الوفاة (مثال: 2023)،\nأو التاريخ الهجري كاملاً (مثال: 1447-09-15):",
             reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
         )
         return VACATION_DATE
@@ -408,6 +431,13 @@ class EmployeeQueryBot:
         try:
             current_step = context.user_data.get('date_step', 'year')
             if current_step == 'year':
+                # يمكن إدخال تاريخ البداية هجرياً كاملاً بدل اختيار السنة والشهر واليوم الميلادية
+                hijri_start = parse_hijri(text)
+                if hijri_start:
+                    context.user_data['vacation'].update(
+                        year=hijri_start.year, month=hijri_start.month, day=hijri_start.day
+                    )
+                    return await self.handle_start_date(update, context, hijri_start.isoformat())
                 year = int(text)
                 if year < 2000 or year > 2100:
                     raise ValueError("السنة يجب أن تكون بين 2000 و 2100")
@@ -454,39 +484,8 @@ class EmployeeQueryBot:
                 month = context.user_data['vacation']['month']
                 if not QDate(year, month, day).isValid():
                     raise ValueError("تاريخ غير صالح")
-                start_date = f"{year}-{month:02d}-{day:02d}"
-                context.user_data['vacation']['start_date'] = start_date
-                vac_type = context.user_data['vacation']['type']
-
-                if vac_type == "سنوية":
-                    await update.message.reply_text(
-                        "أدخل عدد أيام الإجازة السنوية (1-90):",
-                        reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
-                    )
-                    return VACATION_DURATION
-                elif vac_type == "مرضية":
-                    await update.message.reply_text(
-                        "أدخل عدد أيام الإجازة المرضية:",
-                        reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
-                    )
-                    return VACATION_DURATION
-                elif vac_type == "وضع":
-                    subtype = context.user_data['vacation'].get('subtype', 'وضع عادي')
-                    if subtype == "وضع توأم":
-                        context.user_data['vacation']['duration'] = 112
-                    else:
-                        context.user_data['vacation']['duration'] = 98
-                else:
-                    if vac_type == "حج":
-                        context.user_data['vacation']['duration'] = 20
-                    elif vac_type == "زواج":
-                        context.user_data['vacation']['duration'] = 14
-
-                end_date = (QDate(year, month, day).addDays(context.user_data['vacation']['duration'] - 1)).toString("yyyy-MM-dd")
-                context.user_data['vacation']['end_date'] = end_date
-                if 'date_step' in context.user_data:
-                    del context.user_data['date_step']
-                return await self.show_vacation_summary(update, context)
+                context.user_data['vacation']['day'] = day
+                return await self.handle_start_date(update, context, f"{year}-{month:02d}-{day:02d}")
             return VACATION_DATE
         except Exception as e:
             await update.message.reply_text(
@@ -495,6 +494,44 @@ class EmployeeQueryBot:
             )
             return VACATION_DATE
 
+    async def handle_start_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE, start_date):
+        """متابعة الطلب بعد تحديد تاريخ البداية: طلب المدة أو حساب تاريخ النهاية"""
+        context.user_data['vacation']['start_date'] = start_date
+        vac_type = context.user_data['vacation']['type']
+
+        if vac_type == "سنوية":
+            await update.message.reply_text(
+                "أدخل عدد أيام الإجازة السنوية (1-90):",
+                reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
+            )
+            return VACATION_DURATION
+        elif vac_type == "مرضية":
+            await update.message.reply_text(
+                "أدخل عدد أيام الإجازة المرضية:",
+                reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
+            )
+            return VACATION_DURATION
+        elif vac_type == "وضع":
+            subtype = context.user_data['vacation'].get('subtype', 'وضع عادي')
+            if subtype == "وضع توأم":
+                context.user_data['vacation']['duration'] = 112
+            else:
+                context.user_data['vacation']['duration'] = 98
+        else:
+            if vac_type == "حج":
+                context.user_data['vacation']['duration'] = 20
+            elif vac_type == "زواج":
+                context.user_data['vacation']['duration'] = 14
+
+        end_date = await self.adb.run(
+            self.calendar.vacation_end_date, context.user_data['employee']['id'],
+            vac_type, start_date, context.user_data['vacation']['duration']
+        )
+        context.user_data['vacation']['end_date'] = end_date.isoformat()
+        if 'date_step' in context.user_data:
+            del context.user_data['date_step']
+        return await self.show_vacation_summary(update, context)
+
     async def handle_vacation_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if update.message.text == "إلغاء":
             return await self.cancel(update, context)
@@ -516,9 +553,12 @@ class EmployeeQueryBot:
                     raise ValueError("مدة الإجازة المرضية يجب أن تكون يوم واحد على الأقل")
             context.user_data['vacation']['duration'] = duration
             if 'start_date' in context.user_data['vacation']:
-                start_date = QDate.fromString(context.user_data['vacation']['start_date'], "yyyy-MM-dd")
-                end_date = start_date.addDays(duration - 1)
-                context.user_data['vacation']['end_date'] = end_date.toString("yyyy-MM-dd")
+                # السنوية تنتهي بعد عدد أيام العمل المطلوبة دون الجمعة والعطل الرسمية
+                end_date = await self.adb.run(
+                    self.calendar.vacation_end_date, context.user_data['employee']['id'],
+                    vac_type, context.user_data['vacation']['start_date'], duration
+                )
+                context.user_data['vacation']['end_date'] = end_date.isoformat()
                 return await self.show_vacation_summary(update, context)
             else:
                 await update.message.reply_text(
@@ -541,8 +581,8 @@ class EmployeeQueryBot:
             summary += f"• نوع الوفاة: {vacation.get('death_type', '')}\n"
             if vacation.get('relation'):
                 summary += f"• صلة القرابة: {vacation['relation']}\n"
-        summary += f"• تاريخ البداية: {vacation['start_date']}\n"
-        summary += f"• تاريخ النهاية: {vacation['end_date']}\n"
+        summary += f"• تاريخ البداية: {vacation['start_date']} ({format_hijri(vacation['start_date'])})\n"
+        summary += f"• تاريخ النهاية: {vacation['end_date']} ({format_hijri(vacation['end_date'])})\n"
         if vacation['type'] in ["وضع"]:
             weeks = vacation['duration'] // 7
             summary += f"• المدة: {weeks} أسبوع\n"
@@ -581,9 +621,10 @@ class EmployeeQueryBot:
                 else:
                     raise ValueError("بيانات التاريخ غير مكتملة، الرجاء إعادة إدخال التاريخ")
             if 'end_date' not in vacation:
-                start_dt = datetime.strptime(vacation['start_date'], "%Y-%m-%d")
-                end_dt = start_dt + timedelta(days=vacation['duration'] - 1)
-                vacation['end_date'] = end_dt.strftime("%Y-%m-%d")
+                end_date = await self.adb.run(
+                    self.calendar.vacation_end_date, emp_id, vacation['type'], vacation['start_date'], vacation['duration']
+                )
+                vacation['end_date'] = end_date.isoformat()
 
             notes = vacation.get('notes', '').strip() if vacation.get('notes') else ""
             extra_note = ""
@@ -594,12 +635,16 @@ class EmployeeQueryBot:
             if extra_note:
                 notes = (notes + "\n" if notes else "") + extra_note
 
+            if await self.adb.run(self.overlap_service.has_conflict, emp_id, vacation['start_date'], vacation['end_date']):
+                await update.message.reply_text("❌ لديك إجازة أخرى في هذه الفترة، لا يمكن تقديم الطلب.")
+                return MAIN_MENU
+
             # حفظ الطلب في قاعدة البيانات (الحالة: بانتظار موافقة رئيس القسم)
-            self.db.execute_query(
+            result = await self.adb.execute(
                 "INSERT INTO vacations (employee_id, type, relation, start_date, end_date, duration, notes, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
                 (emp_id, vacation['type'], vacation.get('relation'), vacation['start_date'], vacation['end_date'], vacation['duration'], notes, 'بانتظار موافقة رئيس القسم')
             )
-            vacation_id = self.db.cursor.lastrowid
+            vacation_id = result.lastrowid
 
             # إرسال الإشعار لرئيس القسم بعد الحفظ (اختياري)
             emp = context.user_data['employee']
@@ -625,14 +670,13 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            records = await self.adb.fetchall("""
                 SELECT id, type, start_date, end_date, duration, status
                 FROM vacations
                 WHERE employee_id = ?
                 ORDER BY start_date DESC
                 LIMIT 10
             """, (context.user_data['employee']['id'],))
-            records = self.db.cursor.fetchall()
             if not records:
                 await update.message.reply_text(
                     "لا يوجد سجل إجازات لك",
@@ -668,14 +712,13 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            records = await self.adb.fetchall("""
                 SELECT date, type, duration 
                 FROM absences 
                 WHERE employee_id = ?
                 ORDER BY date DESC 
                 LIMIT 30
             """, (context.user_data['employee']['id'],))
-            records = self.db.cursor.fetchall()
             if not records:
                 await update.message.reply_text(
                     "لا يوجد سجل غياب لك",
@@ -683,8 +726,8 @@ class EmployeeQueryBot:
                 )
                 return MAIN_MENU
             response = "📝 سجل الغياب (آخر 30 يوم):\n"
-            for date, abs_type, duration in records:
-                response += f"\n📅 {date}: {abs_type} ({duration} يوم)"
+            for abs_date, abs_type, duration in records:
+                response += f"\n📅 {abs_date}: {abs_type} ({duration} يوم)"
             await update.message.reply_text(
                 response,
                 reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
@@ -699,12 +742,11 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            grade, grade_date, bonus = await self.adb.fetchone("""
                 SELECT job_grade, grade_date, bonus 
                 FROM employees 
                 WHERE id = ?
             """, (context.user_data['employee']['id'],))
-            grade, grade_date, bonus = self.db.cursor.fetchone()
             response = (
                 "📊 الدرجة الوظيفية:\n"
                 f"• الدرجة: {grade}\n"
@@ -725,14 +767,27 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            emp_id = context.user_data['employee']['id']
+            balance = (await self.adb.fetchone("""
                 SELECT vacation_balance 
                 FROM employees 
                 WHERE id = ?
-            """, (context.user_data['employee']['id'],))
-            balance = self.db.cursor.fetchone()[0]
+            """, (emp_id,)))[0]
+            # الرصيد في نهاية السنة الماضية وآخر الحركات من دفتر الإجازات
+            year_end = date(date.today().year - 1, 12, 31)
+            opening = await self.adb.run(self.ledger.balance_as_of, emp_id, year_end)
+            entries = await self.adb.run(self.ledger.history, emp_id, 5)
+            response = f"✈️ رصيد الإجازات: {balance} يوم حتى تاريخ {date.today():%d/%m/%Y}"
+            if opening is not None:
+                response += f"\n• الرصيد في {year_end:%d/%m/%Y}: {opening} يوم"
+            if entries:
+                response += "\n\n📒 آخر الحركات:"
+                for entry_date, entry_type, days, balance_after, vacation_id, note in entries:
+                    response += f"\n• {entry_date} {entry_type} {days:+d} ← {balance_after}"
+                    if note:
+                        response += f" ({note})"
             await update.message.reply_text(
-                f"✈️ رصيد الإجازات: {balance} يوم حتى تاريخ 31/12/2024",
+                response,
                 reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
             )
             return MAIN_MENU
@@ -767,15 +822,14 @@ class EmployeeQueryBot:
         await self.show_main_menu(update)
         return MAIN_MENU
 
-    def get_employee(self, national_id: str, serial_number: str) -> dict:
+    async def get_employee(self, national_id: str, serial_number: str) -> dict:
         try:
-            self.db.execute_query("""
+            if row := await self.adb.fetchone("""
                 SELECT id, name, national_id, department, 
                        job_grade, hiring_date, vacation_balance
                 FROM employees
                 WHERE national_id=? AND serial_number=?
-            """, (national_id, serial_number))
-            if row := self.db.cursor.fetchone():
+            """, (national_id, serial_number)):
                 return {
                     'id': row[0],
                     'name': row[1],
@@ -790,4 +844,7 @@ class EmployeeQueryBot:
         return None
 
     def run(self):
-        self.application.run_polling()
\ No newline at end of file
+        try:
+            self.application.run_polling()
+        finally:
+            self.adb.close()
\ No newline at end of file
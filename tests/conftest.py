@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    """قاعدة في الذاكرة بالمخطط الكامل، بوضع autocommit كما تستخدمه الترحيلات"""
+    connection = sqlite3.connect(":memory:", isolation_level=None)
+    connection.execute("PRAGMA foreign_keys = ON")
+    run_migrations(connection)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    """DatabaseManager على ملف مؤقت"""
+    manager = DatabaseManager(db_path=str(tmp_path / "employees.db"))
+    yield manager
+    manager.close()
+
+
+def add_employee(conn, serial, name=None, department="التمريض", work_days=None,
+                 vacation_balance=30, hiring_date=None):
+    return conn.execute("""
+        INSERT INTO employees (serial_number, name, national_id, department, work_days, vacation_balance, hiring_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (serial, name or f"موظف {serial}", f"N{serial}", department, work_days, vacation_balance,
+          hiring_date)).lastrowid
+
+
+def add_vacation(conn, employee_id, start_date, end_date, status="موافق", vacation_type="سنوية"):
+    return conn.execute("""
+        INSERT INTO vacations (employee_id, type, start_date, end_date, duration, status)
+        VALUES (?, ?, ?, ?, julianday(?) - julianday(?) + 1, ?)
+    """, (employee_id, vacation_type, start_date, end_date, end_date, start_date, status)).lastrowid
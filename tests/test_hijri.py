@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_employee, add_vacation
+from date_keys import day_number
+from hijri import (
+    FIRST_DAY, LAST_DAY, format_hijri, from_hijri, hajj_leaves_by_hijri_year, hijri_years, month_length,
+    parse_hijri, to_hijri
+)
+
+
+@pytest.mark.parametrize("gregorian, hijri", [
+    (date(2000, 1, 1), (1420, 9, 24)),
+    (date(2023, 7, 19), (1445, 1, 1)),
+    (date(2024, 3, 11), (1445, 9, 1)),
+    (date(2026, 10, 18), (1448, 5, 6)),
+])
+def test_known_dates(gregorian, hijri):
+    assert to_hijri(gregorian) == hijri
+    assert from_hijri(*hijri) == gregorian
+
+
+def test_round_trip_over_whole_table():
+    day = date(2000, 1, 1)
+    previous = None
+    while day <= date(2100, 12, 31):
+        hijri = to_hijri(day)
+        assert from_hijri(*hijri) == day
+        if previous is not None:
+            # كل يوم يلي سابقه في التقويم الهجري أيضاً
+            assert hijri == (previous[0], previous[1], previous[2] + 1) or hijri[2] == 1
+        previous = hijri
+        day += timedelta(days=1)
+
+
+def test_month_and_year_lengths():
+    for year in range(1421, 1524):
+        lengths = [month_length(year, month) for month in range(1, 13)]
+        assert lengths[:11] == [30, 29] * 5 + [30]
+        assert lengths[11] in (29, 30)
+        assert sum(lengths) in (354, 355)
+    # 1445 كبيسة و1446 بسيطة
+    assert month_length(1445, 12) == 30
+    assert month_length(1446, 12) == 29
+
+
+@pytest.mark.parametrize("text", ["1445-09-01", "1/9/1445", " 01/09/1445 هـ ", "1445-9-1هـ"])
+def test_parse_hijri_formats(text):
+    assert parse_hijri(text) == date(2024, 3, 11)
+
+
+@pytest.mark.parametrize("text", ["", None, "2024-03-11", "11/3/2024", "1445/09/01", "غداً"])
+def test_parse_hijri_rejects_other_text(text):
+    assert parse_hijri(text) is None
+
+
+@pytest.mark.parametrize("year, month, day", [(1445, 13, 1), (1445, 0, 1), (1446, 12, 30), (1445, 1, 0)])
+def test_from_hijri_rejects_invalid_dates(year, month, day):
+    with pytest.raises(ValueError):
+        from_hijri(year, month, day)
+
+
+def test_out_of_range():
+    with pytest.raises(ValueError):
+        to_hijri(date(1999, 12, 31))
+    with pytest.raises(ValueError):
+        from_hijri(1300, 1, 1)
+    assert format_hijri(date(1999, 12, 31)) == ""
+    assert format_hijri("2024-03-11") == "1 رمضان 1445هـ"
+
+
+def test_hijri_years_clips_to_table():
+    years = hijri_years([FIRST_DAY - 10, day_number("2024-03-11"), LAST_DAY + 10])
+    assert years.tolist() == [1420, 1445, 1524]
+
+
+def test_hajj_leaves_grouped_by_hijri_year(db):
+    new_year = from_hijri(1446, 1, 1)
+
+    def day(offset):
+        return (new_year + timedelta(days=offset)).isoformat()
+
+    with db.transaction() as conn:
+        employee = add_employee(conn, "1")
+        # تُحسب الإجازة في السنة الهجرية ليوم بدايتها
+        add_vacation(conn, employee, "2023-07-20", "2023-08-08", vacation_type="حج")
+        add_vacation(conn, employee, day(-1), day(18), vacation_type="حج")
+        add_vacation(conn, employee, day(0), day(9), vacation_type="حج")
+        add_vacation(conn, employee, "2024-08-01", "2024-08-20", vacation_type="حج", status="مرفوض")
+        add_vacation(conn, employee, "2024-09-01", "2024-09-05", vacation_type="سنوية")
+    assert hajj_leaves_by_hijri_year(db) == [(1445, 2, 40), (1446, 1, 10)]
@@ -0,0 +1,152 @@
+import sqlite3
+
+import pytest
+
+from conftest import add_vacation
+from migrations import LATEST_VERSION, MIGRATIONS, run_migrations, schema_version
+
+# مخطط قاعدة البيانات كما أنشأه البرنامج قبل الترحيلات المرقمة (user_version = 0)
+BASELINE_SCHEMA = [
+    """CREATE TABLE employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        serial_number TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        national_id TEXT UNIQUE NOT NULL,
+        department TEXT,
+        job_grade TEXT,
+        hiring_date TEXT,
+        grade_date TEXT,
+        bonus INTEGER DEFAULT 0,
+        vacation_balance INTEGER DEFAULT 30,
+        work_days TEXT,
+        telegram_user_id TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE departments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE vacations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        subtype TEXT,
+        relation TEXT,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        notes TEXT,
+        status TEXT DEFAULT 'تحت الإجراء',
+        approved_by TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE department_heads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        department TEXT NOT NULL,
+        phone_number TEXT,
+        telegram_user_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees (id)
+    )""",
+    """CREATE TABLE absences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        type TEXT NOT NULL,
+        duration INTEGER DEFAULT 1,
+        notes TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+        UNIQUE(employee_id, date)
+    )""",
+    """CREATE TABLE audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        record_id INTEGER,
+        changes TEXT,
+        user TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX idx_emp_national_id ON employees(national_id)",
+    "CREATE INDEX idx_emp_department ON employees(department)",
+    "CREATE INDEX idx_vacations_employee ON vacations(employee_id)",
+    "CREATE INDEX idx_vacations_date ON vacations(start_date, end_date)",
+    "CREATE INDEX idx_absences_employee_date ON absences(employee_id, date)",
+]
+
+
+@pytest.fixture
+def baseline():
+    """قاعدة بالمخطط القديم وبيانات فيه: موظفان وإجازتان متداخلتان موافق عليهما وطلب معلق وغياب"""
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    for statement in BASELINE_SCHEMA:
+        conn.execute(statement)
+    conn.executemany("""
+        INSERT INTO employees (serial_number, name, national_id, department, hiring_date, vacation_balance, work_days)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        ("100", "أحمد علي", "N1", "التمريض", "2018-05-01", 25, "0:M,1:M,2:E,3:F"),
+        ("101", "سارة محمد", "N2", "التمريض", None, None, "الندب"),
+    ])
+    add_vacation(conn, 1, "2026-03-01", "2026-03-05")
+    add_vacation(conn, 1, "2026-03-04", "2026-03-08")
+    add_vacation(conn, 2, "2026-03-02", "2026-03-03", status="بانتظار موافقة المدير")
+    conn.execute("INSERT INTO absences (employee_id, date, type) VALUES (1, '2026-02-10', 'غياب')")
+    yield conn
+    conn.close()
+
+
+def test_versions_are_strictly_increasing():
+    versions = [version for version, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert LATEST_VERSION == versions[-1]
+
+
+def test_fresh_database_reaches_latest_version(conn):
+    assert schema_version(conn) == LATEST_VERSION
+    assert run_migrations(conn) == 0
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+
+
+def test_baseline_schema_upgrades_cleanly(baseline):
+    assert run_migrations(baseline) == len(MIGRATIONS)
+    assert schema_version(baseline) == LATEST_VERSION
+    assert baseline.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert baseline.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert baseline.execute("SELECT COUNT(*) FROM employees").fetchone()[0] == 2
+    assert baseline.execute("SELECT COUNT(*) FROM vacations").fetchone()[0] == 3
+
+
+def test_upgrade_fills_derived_tables(baseline):
+    run_migrations(baseline)
+    # الرصيد الافتتاحي مؤرخ بتاريخ التعيين، ولا قيد لموظف بلا رصيد
+    assert baseline.execute(
+        "SELECT employee_id, entry_date, balance_after FROM vacation_balance_ledger"
+    ).fetchall() == [(1, "2018-05-01", 25)]
+    # الإجازتان المتداخلتان تحسبان الموظف مرة واحدة في الأيام المشتركة
+    assert baseline.execute("""
+        SELECT MAX(on_leave) FROM department_day_occupancy WHERE department = 'التمريض'
+    """).fetchone()[0] == 1
+    assert baseline.execute("""
+        SELECT COUNT(*) FROM employee_leave_days WHERE employee_id = 1
+    """).fetchone()[0] == 8
+    # فهرس البحث يوحّد الحروف العربية
+    assert baseline.execute(
+        "SELECT rowid FROM employee_search WHERE employee_search MATCH ?", ('"احمد"',)
+    ).fetchall() == [(1,)]
+    assert baseline.execute("SELECT day_num IS NOT NULL FROM absences").fetchone()[0] == 1
+
+
+def test_pending_migrations_roll_back_together(baseline):
+    baseline.execute("CREATE TABLE vacation_balance_ledger (id INTEGER PRIMARY KEY)")
+    with pytest.raises(sqlite3.Error):
+        run_migrations(baseline)
+    assert schema_version(baseline) == 0
+    assert baseline.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'employee_search'"
+    ).fetchone()[0] == 0
@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import add_employee, add_vacation
+from staffing_rules import StaffingRules
+
+# 2026-03-07 سبت (اليوم 0 في ترتيب المشروع)
+SATURDAY = "2026-03-07"
+PENDING = "بانتظار موافقة المدير"
+
+
+@pytest.fixture
+def staff(conn):
+    """ثلاثة يعملون صباح السبت (أحدهم كامل اليوم) وواحد لا يعمل السبت، والحد الأدنى للصباحية 2"""
+    ids = {
+        "a": add_employee(conn, "1", department="X", work_days="0:M"),
+        "b": add_employee(conn, "2", department="X", work_days="0:M"),
+        "c": add_employee(conn, "3", department="X", work_days="0:F"),
+        "d": add_employee(conn, "4", department="X", work_days="1:M"),
+    }
+    conn.execute("INSERT INTO staffing_rules (department, shift, min_staff) VALUES ('X', 'M', 2)")
+    return ids
+
+
+def on_leave(conn, day=SATURDAY):
+    return conn.execute("""
+        SELECT COALESCE(SUM(on_leave), 0) FROM department_day_occupancy
+        WHERE department = 'X' AND day_num = CAST(julianday(?) AS INTEGER) AND shift IN ('M', 'F')
+    """, (day,)).fetchone()[0]
+
+
+def test_no_violation_when_enough_staff_remain(conn, staff):
+    request = add_vacation(conn, staff["a"], SATURDAY, SATURDAY, status=PENDING)
+    assert StaffingRules.violations(conn, request) == []
+
+
+def test_violation_when_approval_drops_below_minimum(conn, staff):
+    add_vacation(conn, staff["c"], SATURDAY, SATURDAY)
+    request = add_vacation(conn, staff["a"], "2026-03-06", SATURDAY, status=PENDING)
+    assert StaffingRules.violations(conn, request) == [(SATURDAY, "M", 1, 2)]
+
+
+def test_approved_request_is_not_subtracted_twice(conn, staff):
+    add_vacation(conn, staff["c"], SATURDAY, SATURDAY)
+    request = add_vacation(conn, staff["a"], SATURDAY, SATURDAY)
+    # داخل معاملة الاعتماد تكون الإجازة محسوبة أصلاً في الإشغال
+    assert StaffingRules.violations(conn, request) == [(SATURDAY, "M", 1, 2)]
+
+
+def test_employee_not_working_that_shift_is_ignored(conn, staff):
+    add_vacation(conn, staff["a"], SATURDAY, SATURDAY)
+    add_vacation(conn, staff["b"], SATURDAY, SATURDAY)
+    request = add_vacation(conn, staff["d"], SATURDAY, SATURDAY, status=PENDING)
+    assert StaffingRules.violations(conn, request) == []
+
+
+def test_overlapping_leave_of_same_employee_counts_once(conn, staff):
+    add_vacation(conn, staff["b"], SATURDAY, SATURDAY)
+    request = add_vacation(conn, staff["b"], "2026-03-05", SATURDAY, status=PENDING)
+    assert StaffingRules.violations(conn, request) == []
+
+
+def test_occupancy_survives_cancelling_one_of_overlapping_leaves(conn, staff):
+    first = add_vacation(conn, staff["a"], "2026-03-05", SATURDAY)
+    second = add_vacation(conn, staff["a"], SATURDAY, "2026-03-09")
+    assert on_leave(conn) == 1
+    conn.execute("UPDATE vacations SET status = 'ملغاة' WHERE id = ?", (first,))
+    assert on_leave(conn) == 1
+    conn.execute("DELETE FROM vacations WHERE id = ?", (second,))
+    assert on_leave(conn) == 0
+
+
+def test_check_raises_with_details(conn, staff):
+    add_vacation(conn, staff["c"], SATURDAY, SATURDAY)
+    request = add_vacation(conn, staff["a"], SATURDAY, SATURDAY, status=PENDING)
+    with pytest.raises(Exception, match="الحد الأدنى"):
+        StaffingRules.check(conn, request)
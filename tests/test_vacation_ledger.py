@@ -0,0 +1,59 @@
+from datetime import date
+
+import pytest
+
+from conftest import add_employee
+from vacation_ledger import ENTRY_ACCRUAL, ENTRY_ADJUSTMENT, ENTRY_DEDUCTION, VacationLedger
+
+
+@pytest.fixture
+def ledger(db):
+    with db.transaction() as conn:
+        add_employee(conn, "1", vacation_balance=0)
+        VacationLedger.record(conn, 1, ENTRY_ACCRUAL, 30, entry_date="2025-01-01")
+        VacationLedger.record(conn, 1, ENTRY_DEDUCTION, -5, entry_date="2025-03-10")
+        VacationLedger.record(conn, 1, ENTRY_DEDUCTION, -3, entry_date="2025-03-10")
+        VacationLedger.record(conn, 1, ENTRY_ACCRUAL, 30, entry_date="2026-01-01")
+    return VacationLedger(db)
+
+
+def test_balance_as_of_returns_last_entry_up_to_date(ledger):
+    assert ledger.balance_as_of(1, "2024-12-31") is None
+    assert ledger.balance_as_of(1, "2025-01-01") == 30
+    assert ledger.balance_as_of(1, date(2025, 3, 9)) == 30
+    # قيدان في نفس اليوم: الأحدث إدراجاً هو الرصيد في نهايته
+    assert ledger.balance_as_of(1, "2025-03-10") == 22
+    assert ledger.balance_as_of(1, "2025-12-31") == 22
+    assert ledger.balance_as_of(1, "2026-06-01") == 52
+
+
+def test_balance_as_of_unknown_employee(ledger):
+    assert ledger.balance_as_of(99, "2026-01-01") is None
+
+
+def test_history_is_newest_first(ledger):
+    history = ledger.history(1, limit=2)
+    assert [(entry_date, days, balance) for entry_date, _, days, balance, _, _ in history] == [
+        ("2026-01-01", 30, 52),
+        ("2025-03-10", -3, 22),
+    ]
+
+
+def test_deduct_rejects_insufficient_balance(db, ledger):
+    with pytest.raises(Exception, match="غير كافٍ"):
+        with db.transaction() as conn:
+            VacationLedger.deduct(conn, 1, 60)
+    assert db.execute_query("SELECT vacation_balance FROM employees WHERE id = 1").fetchone()[0] == 52
+
+
+def test_reconcile_records_changes_made_outside_the_ledger(db, ledger):
+    with db.transaction() as conn:
+        conn.execute("UPDATE employees SET vacation_balance = 40 WHERE id = 1")
+        VacationLedger.reconcile(conn, "e.id = ?", (1,), "تعديل يدوي")
+        VacationLedger.reconcile(conn, "e.id = ?", (1,), "تعديل يدوي")
+    entry_type, days, balance = db.execute_query("""
+        SELECT entry_type, days, balance_after FROM vacation_balance_ledger ORDER BY id DESC LIMIT 1
+    """).fetchone()
+    assert (entry_type, days, balance) == (ENTRY_ADJUSTMENT, -12, 40)
+    assert ledger.balance_as_of(1, date.today()) == 40
+    assert db.execute_query("SELECT COUNT(*) FROM vacation_balance_ledger").fetchone()[0] == 5
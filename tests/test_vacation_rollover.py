@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from conftest import add_employee
+from vacation_rollover import VacationRollover
+
+YEAR = 2025
+
+
+@pytest.fixture
+def rollover(db):
+    with db.transaction() as conn:
+        add_employee(conn, "1", vacation_balance=10, hiring_date="2015-01-01")
+        add_employee(conn, "2", vacation_balance=50, hiring_date="2015-01-01")
+        add_employee(conn, "3", vacation_balance=80, hiring_date="2015-01-01")
+        add_employee(conn, "4", vacation_balance=0, hiring_date="2025-07-02")
+        add_employee(conn, "5", vacation_balance=None, hiring_date=None)
+        add_employee(conn, "6", vacation_balance=5, hiring_date="2026-02-01")
+    return VacationRollover(db, annual_days=30, carry_over_cap=60)
+
+
+def plan_by_id(rows):
+    return {row[0]: row[2:] for row in rows}
+
+
+def test_dry_run_prorates_accrual_and_caps_after_it(rollover):
+    # (الرصيد، الساقط، المستحق، الرصيد الجديد)
+    assert plan_by_id(rollover.dry_run(YEAR)) == {
+        1: (10, 0, 30, 40),
+        2: (50, 20, 30, 60),
+        3: (80, 50, 30, 60),
+        # 183 يوماً من 365
+        4: (0, 0, 15, 15),
+        # بلا رصيد يُعامل كصفر، وبلا تاريخ تعيين يستحق السنة كاملة
+        5: (0, 0, 30, 30),
+    }
+
+
+def test_dry_run_writes_nothing(db, rollover):
+    rollover.dry_run(YEAR)
+    assert db.execute_query("SELECT COUNT(*) FROM vacation_balance_ledger").fetchone()[0] == 0
+    assert not rollover.is_done(YEAR)
+
+
+@pytest.mark.parametrize("year", [date.today().year, date.today().year + 1])
+def test_unfinished_years_are_rejected(rollover, year):
+    with pytest.raises(Exception, match="قبل انتهائها"):
+        rollover.dry_run(year)
+    with pytest.raises(Exception, match="قبل انتهائها"):
+        rollover.run(year)
+
+
+def test_run_applies_plan_once(db, rollover):
+    summary = rollover.run(YEAR)
+    assert (summary['employees'], summary['forfeited'], summary['accrued']) == (5, 70, 135)
+    balances = dict(db.execute_query("SELECT id, vacation_balance FROM employees").fetchall())
+    assert balances == {1: 40, 2: 60, 3: 60, 4: 15, 5: 30, 6: 5}
+    # الاستحقاق ثم التسوية، ورصيد آخر قيد يساوي رصيد الموظف
+    assert db.execute_query("""
+        SELECT entry_type, days, balance_after FROM vacation_balance_ledger WHERE employee_id = 3 ORDER BY id
+    """).fetchall() == [('استحقاق', 30, 110), ('تسوية', -50, 60)]
+    assert rollover.is_done(YEAR)
+    with pytest.raises(Exception, match="مسبقاً"):
+        rollover.run(YEAR)
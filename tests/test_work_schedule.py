@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from work_schedule import (
+    SLOT_COUNT, covering_bits, day_shift, describe_work_days, format_work_days, mask_matrix,
+    parse_work_days, slot_bit
+)
+
+
+def test_slot_bits_cover_the_week_once():
+    bits = [slot_bit(day, shift) for day in range(7) for shift in "MEF"]
+    assert sorted(bits) == list(range(SLOT_COUNT))
+
+
+@pytest.mark.parametrize("work_days", [
+    "",
+    "0:M",
+    "0:M,1:E,2:F",
+    "0:M,0:E,6:F",
+    ",".join(f"{day}:{shift}" for day in range(7) for shift in "MEF"),
+])
+def test_format_parse_round_trip(work_days):
+    assert format_work_days(parse_work_days(work_days)) == work_days
+
+
+def test_parse_normalizes_order_and_spacing():
+    assert format_work_days(parse_work_days(" 3:E , 1:M,1:M ")) == "1:M,3:E"
+
+
+@pytest.mark.parametrize("work_days", [None, "الندب", "تفرغ", "7:M", "1:X", "a:M", "1"])
+def test_parse_ignores_special_and_invalid_values(work_days):
+    assert parse_work_days(work_days) == 0
+
+
+@pytest.mark.parametrize("mask", [0, 1, 0b101, (1 << SLOT_COUNT) - 1, 1 << (SLOT_COUNT - 1)])
+def test_parse_format_round_trip(mask):
+    assert parse_work_days(format_work_days(mask)) == mask
+
+
+def test_day_shift_and_covering_bits():
+    mask = parse_work_days("0:M,2:F")
+    assert day_shift(mask, 0) == "M"
+    assert day_shift(mask, 1) is None
+    assert day_shift(mask, 2) == "F"
+    # كامل اليوم يغطي الصباحية والمسائية
+    assert mask & covering_bits(2, "E")
+    assert not mask & covering_bits(0, "E")
+
+
+def test_describe_work_days():
+    assert describe_work_days("الندب") == ["حالة الموظف: الندب"]
+    assert describe_work_days("0:M,6:E") == ["- السبت: صباحية", "- الجمعة: مسائية"]
+
+
+def test_mask_matrix_matches_parse():
+    masks = [parse_work_days("0:M,1:E"), parse_work_days("6:F")]
+    matrix = mask_matrix(masks)
+    assert matrix.shape == (2, 7, 3)
+    assert np.argwhere(matrix).tolist() == [[0, 0, 0], [0, 1, 1], [1, 6, 2]]
+
+
+@pytest.mark.parametrize("work_days", [None, "", "الندب", "0:M,1:E,2:F", "6:F,0:M", "1:M,1:E,5:F"])
+def test_generated_work_mask_matches_parse(conn, work_days):
+    conn.execute(
+        "INSERT INTO employees (serial_number, name, national_id, work_days) VALUES ('1', 'أ', '1', ?)",
+        (work_days,)
+    )
+    assert conn.execute("SELECT work_mask FROM employees").fetchone()[0] == parse_work_days(work_days)
@@ -0,0 +1,66 @@
+from date_keys import day_number, from_day_number, to_date
+
+# الإجازات التي تُحتسب بأيام العمل الفعلية، وبقية الأنواع بالأيام التقويمية
+WORKING_DAY_TYPES = ("سنوية",)
+
+# يوم محتسب: ليس جمعة ولا عطلة رسمية، ومن أيام عمل الموظف حسب قناعه (قناع 0 = لا جدول محدد فكل الأيام)
+CHARGEABLE_DAY_FILTER = """
+    c.is_weekend = 0 AND c.is_holiday = 0
+    AND (m.mask = 0 OR (m.mask >> (c.weekday * 3)) & 7 != 0)
+"""
+EMPLOYEE_MASK = "(SELECT COALESCE((SELECT work_mask FROM employees WHERE id = ?), 0) AS mask) m"
+
+
+class VacationCalendar:
+    """حساب الأيام المحتسبة وتاريخ النهاية من جدول التقويم وجدول عمل الموظف"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def chargeable_days(self, employee_id, start_date, end_date):
+        """عدد أيام العمل المحتسبة من الإجازة بين تاريخين شاملين"""
+        row = self.db.execute_query(f"""
+            SELECT COUNT(*) FROM calendar_days c, {EMPLOYEE_MASK}
+            WHERE c.day_num BETWEEN ? AND ? AND {CHARGEABLE_DAY_FILTER}
+        """, (employee_id, day_number(start_date), day_number(end_date)), commit=False).fetchone()
+        return row[0]
+
+    def end_date(self, employee_id, start_date, days):
+        """تاريخ آخر يوم محتسب بحيث تكون الإجازة days يوم عمل بدءاً من start_date"""
+        row = self.db.execute_query(f"""
+            SELECT c.day_num FROM calendar_days c, {EMPLOYEE_MASK}
+            WHERE c.day_num >= ? AND {CHARGEABLE_DAY_FILTER}
+            ORDER BY c.day_num
+            LIMIT 1 OFFSET ?
+        """, (employee_id, day_number(start_date), max(days, 1) - 1), commit=False).fetchone()
+        if not row:
+            raise Exception("التاريخ خارج نطاق التقويم")
+        return from_day_number(row[0])
+
+    def vacation_days(self, employee_id, vac_type, start_date, end_date):
+        """مدة الإجازة حسب نوعها: أيام عمل للسنوية وأيام تقويمية لغيرها"""
+        if vac_type in WORKING_DAY_TYPES:
+            return self.chargeable_days(employee_id, start_date, end_date)
+        return (to_date(end_date) - to_date(start_date)).days + 1
+
+    def vacation_end_date(self, employee_id, vac_type, start_date, days):
+        if vac_type in WORKING_DAY_TYPES:
+            return self.end_date(employee_id, start_date, days)
+        return from_day_number(day_number(start_date) + days - 1)
+
+    def holidays(self, year=None):
+        query = "SELECT date, name FROM public_holidays"
+        params = []
+        if year:
+            query += " WHERE date BETWEEN ? AND ?"
+            params = [f"{year}-01-01", f"{year}-12-31"]
+        return self.db.execute_query(query + " ORDER BY date", params, commit=False).fetchall()
+
+    def add_holiday(self, holiday_date, name):
+        self.db.execute_query("""
+            INSERT INTO public_holidays (date, name) VALUES (?, ?)
+            ON CONFLICT(date) DO UPDATE SET name = excluded.name
+        """, (to_date(holiday_date).isoformat(), name))
+
+    def remove_holiday(self, holiday_date):
+        self.db.execute_query("DELETE FROM public_holidays WHERE date = ?", (to_date(holiday_date).isoformat(),))
@@ -0,0 +1,97 @@
+from datetime import date
+
+from date_keys import to_date
+
+# أنواع قيود دفتر رصيد الإجازات
+ENTRY_ACCRUAL = 'استحقاق'
+ENTRY_DEDUCTION = 'خصم'
+ENTRY_REFUND = 'استرجاع'
+ENTRY_ADJUSTMENT = 'تسوية'
+ENTRY_TYPES = (ENTRY_ACCRUAL, ENTRY_DEDUCTION, ENTRY_REFUND, ENTRY_ADJUSTMENT)
+
+# آخر قيد للموظف حتى تاريخ معين، عبر الفهرس (employee_id, entry_date, id)
+BALANCE_AS_OF_SQL = """
+    SELECT balance_after FROM vacation_balance_ledger
+    WHERE employee_id = ? AND entry_date <= ?
+    ORDER BY entry_date DESC, id DESC
+    LIMIT 1
+"""
+
+
+class VacationLedger:
+    """دفتر رصيد الإجازات: كل تغيير في employees.vacation_balance يُسجَّل قيداً برصيده بعد التغيير"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    @staticmethod
+    def record(conn, employee_id, entry_type, days, vacation_id=None, note=None, entry_date=None):
+        """تعديل الرصيد الحالي بمقدار days وتسجيل القيد داخل معاملة المستدعي، وإرجاع الرصيد الجديد"""
+        if entry_type not in ENTRY_TYPES:
+            raise Exception(f"نوع قيد غير معروف: {entry_type}")
+        row = conn.execute(
+            "UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id = ? RETURNING vacation_balance",
+            (days, employee_id)
+        ).fetchone()
+        if not row:
+            raise Exception("الموظف غير موجود")
+        conn.execute("""
+            INSERT INTO vacation_balance_ledger
+                (employee_id, entry_type, days, balance_after, entry_date, vacation_id, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            employee_id, entry_type, days, row[0],
+            to_date(entry_date or date.today()).isoformat(), vacation_id, note
+        ))
+        return row[0]
+
+    @staticmethod
+    def deduct(conn, employee_id, days, vacation_id=None, note=None):
+        """خصم أيام إجازة بعد التحقق من كفاية الرصيد"""
+        row = conn.execute("SELECT vacation_balance FROM employees WHERE id = ?", (employee_id,)).fetchone()
+        if not row:
+            raise Exception("الموظف غير موجود")
+        if days > row[0]:
+            raise Exception("رصيد الإجازات غير كافٍ")
+        return VacationLedger.record(conn, employee_id, ENTRY_DEDUCTION, -days, vacation_id, note)
+
+    @staticmethod
+    def refund(conn, employee_id, days, vacation_id=None, note=None):
+        """إعادة أيام إجازة ملغاة إلى الرصيد"""
+        return VacationLedger.record(conn, employee_id, ENTRY_REFUND, days, vacation_id, note)
+
+    @staticmethod
+    def reconcile(conn, where, params=(), note=None):
+        """قيد تسوية واحد لكل موظف (يحدده شرط where على e) تغيّر رصيده خارج الدفتر، كالتعديل اليدوي والاستيراد"""
+        conn.execute(f"""
+            INSERT INTO vacation_balance_ledger
+                (employee_id, entry_type, days, balance_after, entry_date, note)
+            SELECT e.id, ?, e.vacation_balance - COALESCE(last.balance_after, 0),
+                   e.vacation_balance, ?, ?
+            FROM employees e
+            LEFT JOIN vacation_balance_ledger last ON last.id = (
+                SELECT id FROM vacation_balance_ledger
+                WHERE employee_id = e.id
+                ORDER BY entry_date DESC, id DESC
+                LIMIT 1
+            )
+            WHERE ({where})
+              AND e.vacation_balance IS NOT COALESCE(last.balance_after, 0)
+        """, (ENTRY_ADJUSTMENT, date.today().isoformat(), note, *params))
+
+    def balance_as_of(self, employee_id, as_of):
+        """رصيد الموظف في نهاية تاريخ معين، أو None إن لم يكن له قيد حتى ذلك التاريخ"""
+        row = self.db.execute_query(
+            BALANCE_AS_OF_SQL, (employee_id, to_date(as_of).isoformat()), commit=False
+        ).fetchone()
+        return row[0] if row else None
+
+    def history(self, employee_id, limit=50):
+        """آخر قيود الموظف: (التاريخ، النوع، الأيام، الرصيد بعده، الإجازة، ملاحظة)"""
+        return self.db.execute_query("""
+            SELECT entry_date, entry_type, days, balance_after, vacation_id, note
+            FROM vacation_balance_ledger
+            WHERE employee_id = ?
+            ORDER BY entry_date DESC, id DESC
+            LIMIT ?
+        """, (employee_id, limit), commit=False).fetchall()
@@ -0,0 +1,42 @@
+from date_keys import day_number
+
+
+class VacationOverlapService:
+    """كشف تداخل الإجازات عبر فهرس الفترات vacation_intervals (R*Tree)"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def find_conflicts(self, employee_id, start_date, end_date, exclude_id=None):
+        """أرقام إجازات الموظف النشطة التي تتداخل مع الفترة المحددة"""
+        query = """
+            SELECT id FROM vacation_intervals
+            WHERE start_day <= ? AND end_day >= ?
+              AND min_employee <= ? AND max_employee >= ?
+        """
+        params = [day_number(end_date), day_number(start_date), employee_id, employee_id]
+        if exclude_id is not None:
+            query += " AND id != ?"
+            params.append(exclude_id)
+        rows = self.db.execute_query(query, params, commit=False).fetchall()
+        return [row[0] for row in rows]
+
+    def has_conflict(self, employee_id, start_date, end_date, exclude_id=None):
+        return bool(self.find_conflicts(employee_id, start_date, end_date, exclude_id))
+
+    def overlapping_in_department(self, department, start_date, end_date, exclude_employee_id=None):
+        """إجازات القسم النشطة المتداخلة مع الفترة: (رقم الإجازة، الموظف، من، إلى، الحالة)"""
+        query = """
+            SELECT v.id, e.name, v.start_date, v.end_date, v.status
+            FROM vacation_intervals i
+            JOIN vacations v ON v.id = i.id
+            JOIN employees e ON e.id = v.employee_id
+            WHERE i.start_day <= ? AND i.end_day >= ?
+              AND e.department = ?
+        """
+        params = [day_number(end_date), day_number(start_date), department]
+        if exclude_employee_id is not None:
+            query += " AND e.id != ?"
+            params.append(exclude_employee_id)
+        query += " ORDER BY v.start_date"
+        return self.db.execute_query(query, params, commit=False).fetchall()
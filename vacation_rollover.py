@@ -0,0 +1,116 @@
+import time
+from datetime import date
+
+from vacation_ledger import ENTRY_ACCRUAL, ENTRY_ADJUSTMENT
+
+ANNUAL_ACCRUAL_DAYS = 30
+CARRY_OVER_CAP = 60
+
+# خطة الترحيل لكل موظف: الرصيد الحالي، الاستحقاق النسبي حسب تاريخ التعيين، وما يسقط فوق الحد بعد إضافته
+# المعاملات المرقمة: ?1 بداية السنة، ?2 نهايتها، ?3 الاستحقاق السنوي، ?4 حد الترحيل
+ROLLOVER_PLAN_SQL = """
+    WITH service AS (
+        SELECT id, name, COALESCE(vacation_balance, 0) AS balance,
+               julianday(?2) - julianday(MAX(COALESCE(hiring_date, ?1), ?1)) + 1 AS days
+        FROM employees
+        WHERE COALESCE(hiring_date, ?1) <= ?2
+    ),
+    accrual AS (
+        SELECT id, name, balance,
+               CAST(ROUND(?3 * days / (julianday(?2) - julianday(?1) + 1)) AS INTEGER) AS accrued
+        FROM service
+    )
+    SELECT id, name, balance, MAX(balance + accrued - ?4, 0) AS forfeited, accrued,
+           MIN(balance + accrued, ?4) AS new_balance
+    FROM accrual
+"""
+
+
+class VacationRollover:
+    """ترحيل أرصدة الإجازات في نهاية السنة لكل الموظفين بعبارات SQL مجمّعة، مرة واحدة لكل سنة"""
+
+    def __init__(self, db_manager, annual_days=ANNUAL_ACCRUAL_DAYS, carry_over_cap=CARRY_OVER_CAP):
+        self.db = db_manager
+        self.annual_days = annual_days
+        self.carry_over_cap = carry_over_cap
+
+    def plan_params(self, year):
+        return (f"{year:04d}-01-01", f"{year:04d}-12-31", self.annual_days, self.carry_over_cap)
+
+    @staticmethod
+    def check_year(year):
+        """لا يُرحّل إلا رصيد سنة انتهت، فالاستحقاق يُحسب حتى نهايتها"""
+        if year >= date.today().year:
+            raise Exception(f"لا يمكن ترحيل أرصدة سنة {year} قبل انتهائها")
+
+    def is_done(self, year):
+        row = self.db.execute_query(
+            "SELECT 1 FROM vacation_rollovers WHERE year = ?", (year,), commit=False
+        ).fetchone()
+        return row is not None
+
+    def dry_run(self, year):
+        """خطة الترحيل دون أي كتابة: (المعرف، الاسم، الرصيد، الساقط، المستحق، الرصيد الجديد)"""
+        self.check_year(year)
+        return self.db.execute_query(
+            f"SELECT * FROM ({ROLLOVER_PLAN_SQL}) ORDER BY name, id", self.plan_params(year), commit=False
+        ).fetchall()
+
+    @staticmethod
+    def summary(rows):
+        return {
+            'employees': len(rows),
+            'forfeited': sum(row[3] for row in rows),
+            'accrued': sum(row[4] for row in rows),
+        }
+
+    def run(self, year):
+        """تطبيق الترحيل في معاملة واحدة وإرجاع ملخصه، ورفض تكراره لنفس السنة"""
+        self.check_year(year)
+        started = time.perf_counter()
+        entry_date = date.today().isoformat()
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM vacation_rollovers WHERE year = ?", (year,)).fetchone():
+                raise Exception(f"تم ترحيل أرصدة سنة {year} مسبقاً")
+
+            conn.execute("""CREATE TEMP TABLE IF NOT EXISTS rollover_plan (
+                employee_id INTEGER PRIMARY KEY, name TEXT, balance INTEGER,
+                forfeited INTEGER, accrued INTEGER, new_balance INTEGER
+            )""")
+            conn.execute("DELETE FROM temp.rollover_plan")
+            conn.execute("INSERT INTO temp.rollover_plan " + ROLLOVER_PLAN_SQL, self.plan_params(year))
+
+            # قيد الاستحقاق أولاً، ثم قيد تسوية بما تجاوز حد الترحيل فيصل الرصيد إلى قيمته النهائية
+            conn.execute("""
+                INSERT INTO vacation_balance_ledger (employee_id, entry_type, days, balance_after, entry_date, note)
+                SELECT employee_id, ?, accrued, balance + accrued, ?, ?
+                FROM temp.rollover_plan WHERE accrued > 0
+            """, (ENTRY_ACCRUAL, entry_date, f"استحقاق سنة {year}"))
+            conn.execute("""
+                INSERT INTO vacation_balance_ledger (employee_id, entry_type, days, balance_after, entry_date, note)
+                SELECT employee_id, ?, -forfeited, new_balance, ?, ?
+                FROM temp.rollover_plan WHERE forfeited > 0
+            """, (ENTRY_ADJUSTMENT, entry_date, f"تجاوز حد الترحيل لسنة {year}"))
+            conn.execute("""
+                UPDATE employees SET vacation_balance = plan.new_balance
+                FROM temp.rollover_plan AS plan
+                WHERE employees.id = plan.employee_id AND employees.vacation_balance IS NOT plan.new_balance
+            """)
+
+            totals = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(forfeited), 0), COALESCE(SUM(accrued), 0)
+                FROM temp.rollover_plan
+            """).fetchone()
+            conn.execute("""
+                INSERT INTO vacation_rollovers
+                    (year, employees, forfeited_days, accrued_days, annual_days, carry_over_cap)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (year, *totals, self.annual_days, self.carry_over_cap))
+            conn.execute("DELETE FROM temp.rollover_plan")
+
+        return {
+            'employees': totals[0],
+            'forfeited': totals[1],
+            'accrued': totals[2],
+            'elapsed': time.perf_counter() - started,
+        }
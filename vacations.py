@@ -1,18 +1,50 @@
 from approval_flow import ApprovalFlow
+from vacation_overlap import VacationOverlapService
+from table_models import SqlQueryTableModel, SqlTableView, StatusColorDelegate, ButtonDelegate
+from vacation_ledger import VacationLedger
+from database_queries import DatabaseQueries
+from vacation_calendar import VacationCalendar
+from dialogs import HolidaysDialog
+from hijri import format_hijri, hajj_leaves_by_hijri_year, parse_hijri
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox,
-    QDateEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QLabel, QMessageBox, QLineEdit, QHeaderView, QGroupBox,
-    QSpinBox, QInputDialog
+    QDateEdit, QPushButton, QLabel, QMessageBox, QLineEdit,
+    QGroupBox, QSpinBox, QInputDialog
 )
 from PyQt6.QtCore import QDate, Qt
-from PyQt6.QtGui import QColor
+
+
+class VacationsTableModel(SqlQueryTableModel):
+    """سجل الإجازات: نوع الوفاة مع صلة القرابة وعمودا الإجراء والإلغاء"""
+
+    HEADERS = ["ID", "الموظف", "النوع", "من", "إلى", "المدة", "الحالة", "الإجراء", "إلغاء"]
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(db_manager, self.HEADERS, empty_text="لا يوجد سجل إجازات", parent=parent)
+        self.sort_expressions = {
+            0: "v.id", 1: "e.name", 2: "v.type", 3: "v.start_date",
+            4: "v.end_date", 5: "v.duration", 6: "v.status"
+        }
+
+    def display_value(self, values, column):
+        vid, name, vtype, start, end, days, status, relation = values
+        if column == 2:
+            return f"وفاة ({relation})" if vtype == "وفاة" and relation else (vtype or "")
+        if column == 7:
+            return "عن طريق البوت"
+        if column == 8:
+            # زر الإلغاء يرسمه ButtonDelegate للإجازات الموافق عليها
+            return "" if status == "موافق" else "-"
+        return super().display_value(values, column)
+
 
 class VacationsTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
         self.approval_flow = ApprovalFlow(db_manager)
+        self.overlap_service = VacationOverlapService(db_manager)
+        self.calendar = VacationCalendar(db_manager)
         self.setup_ui()
         self.load_employees()
         self.load_vacations()
@@ -23,6 +55,7 @@ class VacationsTab(QWidget):
         input_form = QFormLayout()
 
         self.employee_combo = QComboBox()
+        self.employee_combo.currentIndexChanged.connect(self.update_duration)
         input_form.addRow("الموظف:", self.employee_combo)
 
         self.vacation_type = QComboBox()
@@ -56,13 +89,31 @@ class VacationsTab(QWidget):
         self.end_date.dateChanged.connect(self.update_duration)
         dates_layout.addWidget(QLabel("إلى:"))
         dates_layout.addWidget(self.end_date)
+        self.hijri_start_btn = QPushButton("بداية بالهجري")
+        self.hijri_start_btn.clicked.connect(self.enter_hijri_start)
+        dates_layout.addWidget(self.hijri_start_btn)
         dates_group.setLayout(dates_layout)
         input_form.addRow(dates_group)
+        self.hijri_label = QLabel()
+        input_form.addRow("بالهجري:", self.hijri_label)
 
         self.days_count = QSpinBox()
-        self.days_count.setRange(1, 365)
+        self.days_count.setRange(0, 365)
         self.days_count.setReadOnly(True)
-        input_form.addRow("المدة (أيام):", self.days_count)
+        self.duration_error = None
+        self.duration_error_label = QLabel()
+        self.duration_error_label.setStyleSheet("color: red;")
+        self.duration_error_label.setVisible(False)
+        self.holidays_btn = QPushButton("العطل الرسمية")
+        self.holidays_btn.clicked.connect(self.manage_holidays)
+        duration_layout = QHBoxLayout()
+        duration_layout.addWidget(self.days_count)
+        duration_layout.addWidget(self.holidays_btn)
+        self.hajj_report_btn = QPushButton("الحج حسب السنة الهجرية")
+        self.hajj_report_btn.clicked.connect(self.show_hajj_report)
+        duration_layout.addWidget(self.hajj_report_btn)
+        input_form.addRow("المدة (أيام):", duration_layout)
+        input_form.addRow(self.duration_error_label)
         self.notes_input = QLineEdit()
         self.notes_input.setPlaceholderText("ملاحظات إضافية...")
         input_form.addRow("ملاحظات:", self.notes_input)
@@ -73,16 +124,16 @@ class VacationsTab(QWidget):
         input_group.setLayout(input_form)
         main_layout.addWidget(input_group)
 
-        self.vacations_table = QTableWidget()
-        self.vacations_table.setColumnCount(9)
-        self.vacations_table.setHorizontalHeaderLabels([
-            "ID", "الموظف", "النوع", "من", "إلى",
-            "المدة", "الحالة", "الإجراء", "إلغاء"
-        ])
-        self.vacations_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.vacations_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.vacations_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.vacations_model = VacationsTableModel(self.db)
+        self.vacations_table = SqlTableView(self.vacations_model)
+        self.vacations_table.setItemDelegate(StatusColorDelegate(6, parent=self.vacations_table))
+        self.cancel_delegate = ButtonDelegate(
+            "إلغاء الإجازة", lambda values: values[6] == "موافق", self.vacations_table
+        )
+        self.cancel_delegate.clicked.connect(self.cancel_vacation_at_row)
+        self.vacations_table.setItemDelegateForColumn(8, self.cancel_delegate)
         self.vacations_table.setSortingEnabled(True)
+        self.vacations_table.horizontalHeader().setSortIndicator(3, Qt.SortOrder.DescendingOrder)
         self.vacations_table.verticalHeader().setDefaultSectionSize(38)
         main_layout.addWidget(QLabel("سجل الإجازات:"))
         main_layout.addWidget(self.vacations_table)
@@ -104,7 +155,7 @@ class VacationsTab(QWidget):
         elif vac_type == "مرضية":
             self.days_count.setValue(1)
         elif vac_type == "سنوية":
-            self.days_count.setValue(1)
+            self.update_duration()
         elif vac_type == "وفاة":
             self.update_death_vacation_duration()
         else:
@@ -140,8 +191,56 @@ class VacationsTab(QWidget):
         if start > end:
             self.end_date.setDate(start)
             end = start
-        days = start.daysTo(end) + 1
+        try:
+            # السنوية بأيام العمل المحتسبة (دون الجمعة والعطل وأيام راحة الموظف)
+            days = self.calendar.vacation_days(
+                self.employee_combo.currentData(), self.vacation_type.currentText(), start, end
+            )
+            self.duration_error = None
+        except Exception as e:
+            # لا تُحفظ الإجازة بمدة قديمة أو تقديرية حتى يُعاد الحساب بنجاح
+            self.duration_error = f"تعذر حساب أيام الإجازة المحتسبة: {str(e)}"
+            days = 0
+        self.duration_error_label.setText(self.duration_error or "")
+        self.duration_error_label.setVisible(self.duration_error is not None)
+        self.save_btn.setEnabled(self.duration_error is None)
         self.days_count.setValue(days)
+        self.hijri_label.setText(f"من {format_hijri(start)} إلى {format_hijri(end)}")
+
+    def enter_hijri_start(self):
+        text, ok = QInputDialog.getText(
+            self, "تاريخ البداية بالهجري", "أدخل التاريخ الهجري (مثال: 1447-09-15 أو 15/9/1447):"
+        )
+        if not ok or not text.strip():
+            return
+        try:
+            start = parse_hijri(text)
+            if not start:
+                raise ValueError("صيغة التاريخ الهجري غير صحيحة")
+        except ValueError as e:
+            QMessageBox.warning(self, "تنبيه", str(e))
+            return
+        # الحفاظ على المدة الحالية عند نقل تاريخ البداية
+        length = self.start_date.date().daysTo(self.end_date.date())
+        start = QDate(start.year, start.month, start.day)
+        self.start_date.setDate(start)
+        self.end_date.setDate(start.addDays(length))
+
+    def show_hajj_report(self):
+        try:
+            rows = hajj_leaves_by_hijri_year(self.db)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"خطأ في إعداد التقرير: {str(e)}")
+            return
+        if not rows:
+            QMessageBox.information(self, "إجازات الحج", "لا توجد إجازات حج موافق عليها")
+            return
+        lines = [f"• {year}هـ: {count} إجازة، {days} يوم" for year, count, days in rows]
+        QMessageBox.information(self, "إجازات الحج حسب السنة الهجرية", "\n".join(lines))
+
+    def manage_holidays(self):
+        HolidaysDialog(self.db, self).exec()
+        self.update_duration()
 
     def validate_vacation_data(self):
         errors = []
@@ -151,7 +250,9 @@ class VacationsTab(QWidget):
         end_date = self.end_date.date()
         if start_date > end_date:
             errors.append("تاريخ النهاية يجب أن يكون بعد تاريخ البداية")
-        if self.days_count.value() < 1:
+        if self.duration_error:
+            errors.append(self.duration_error)
+        elif self.days_count.value() < 1:
             errors.append("المدة يجب أن تكون يوم واحد على الأقل")
         return errors
 
@@ -231,50 +332,22 @@ class VacationsTab(QWidget):
 
     def load_vacations(self):
         try:
-            self.vacations_table.setRowCount(0)
-            query = """
+            self.vacations_model.set_query("""
                 SELECT v.id, e.name, v.type, v.start_date,
                        v.end_date, v.duration, v.status, v.relation
                 FROM vacations v
                 JOIN employees e ON v.employee_id = e.id
-                ORDER BY v.start_date DESC
-            """
-            self.db.execute_query(query)
-            vacations = self.db.cursor.fetchall()
-            if not vacations:
-                self.vacations_table.setRowCount(1)
-                for col in range(9):
-                    self.vacations_table.setItem(0, col, QTableWidgetItem(''))
-                self.vacations_table.setSpan(0, 0, 1, self.vacations_table.columnCount())
-                self.vacations_table.setItem(0, 0, QTableWidgetItem("لا يوجد سجل إجازات"))
-                return
-            self.vacations_table.setRowCount(len(vacations))
-            for row_idx, row in enumerate(vacations):
-                vid, name, vtype, start, end, days, status, relation = row
-                self.vacations_table.setItem(row_idx, 0, QTableWidgetItem(str(vid) if vid else ''))
-                self.vacations_table.setItem(row_idx, 1, QTableWidgetItem(name if name else ''))
-                display_type = f"وفاة ({relation})" if vtype == "وفاة" and relation else vtype
-                self.vacations_table.setItem(row_idx, 2, QTableWidgetItem(display_type if display_type else ''))
-                self.vacations_table.setItem(row_idx, 3, QTableWidgetItem(start if start else ''))
-                self.vacations_table.setItem(row_idx, 4, QTableWidgetItem(end if end else ''))
-                self.vacations_table.setItem(row_idx, 5, QTableWidgetItem(str(days) if days else ''))
-                self.vacations_table.setItem(row_idx, 6, QTableWidgetItem(status if status else ''))
-                self.vacations_table.setCellWidget(row_idx, 7, QLabel("عن طريق البوت"))
-                if status == "موافق":
-                    btn_cancel = QPushButton("إلغاء الإجازة")
-                    btn_cancel.clicked.connect(lambda _, vid=vid, vtype=vtype, days=days, status=status: self.cancel_vacation(vid, vtype, days, status))
-                    cancel_widget = QWidget()
-                    cancel_layout = QHBoxLayout()
-                    cancel_layout.setContentsMargins(0, 0, 0, 0)
-                    cancel_layout.addWidget(btn_cancel)
-                    cancel_widget.setLayout(cancel_layout)
-                    self.vacations_table.setCellWidget(row_idx, 8, cancel_widget)
-                else:
-                    self.vacations_table.setCellWidget(row_idx, 8, QLabel("-"))
-                self.color_row_by_status(row_idx, status)
+            """, order_by=self.vacations_model.order_by or "v.start_date DESC")
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"خطأ في تحميل الإجازات: {str(e)}")
 
+    def cancel_vacation_at_row(self, row):
+        values = self.vacations_model.row_values(row)
+        if values is None:
+            return
+        vid, name, vtype, start, end, days, status, relation = values
+        self.cancel_vacation(vid, vtype, days, status)
+
     def cancel_vacation(self, vacation_id, vac_type, days, status):
         try:
             if status != "موافق":
@@ -283,46 +356,22 @@ class VacationsTab(QWidget):
             reply = QMessageBox.question(self, "تأكيد الإلغاء", "هل أنت متأكد من إلغاء هذه الإجازة؟ ستتم إعادة الأيام إلى الرصيد إذا كانت سنوية.", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if reply != QMessageBox.StandardButton.Yes:
                 return
-            self.db.execute_query("UPDATE vacations SET status='ملغاة' WHERE id=?", (vacation_id,), commit=True)
-            if vac_type == "سنوية":
-                self.db.execute_query("UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id=(SELECT employee_id FROM vacations WHERE id=?)", (days, vacation_id), commit=True)
+            with self.db.transaction() as conn:
+                # الصف المعروض قد يكون قديماً: لا يُسترجع الرصيد إلا إذا نجح الإلغاء من حالة "موافق" الآن
+                DatabaseQueries.change_status(conn, vacation_id, "موافق", "ملغاة")
+                if vac_type == "سنوية":
+                    employee_id, days = conn.execute(
+                        "SELECT employee_id, duration FROM vacations WHERE id=?", (vacation_id,)
+                    ).fetchone()
+                    VacationLedger.refund(conn, employee_id, days, vacation_id)
             QMessageBox.information(self, "تم", "تم إلغاء الإجازة بنجاح.")
             self.load_vacations()
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء الإلغاء: {str(e)}")
 
-    def color_row_by_status(self, row_idx, status):
-        color = QColor(255, 255, 255)
-        if status == 'موافق':
-            color = QColor(200, 255, 200)
-        elif status == 'مرفوض من المدير' or status == 'مرفوض من رئيس القسم' or status == 'مرفوض':
-            color = QColor(255, 200, 200)
-        elif status == 'بانتظار موافقة رئيس القسم':
-            color = QColor(255, 245, 200)
-        elif status == 'بانتظار موافقة المدير':
-            color = QColor(220, 220, 255)
-        for col in range(9):
-            if self.vacations_table.item(row_idx, col):
-                self.vacations_table.item(row_idx, col).setBackground(color)
-
     def check_vacation_conflict(self, emp_id, start_date, end_date):
         try:
-            self.db.execute_query("""
-                SELECT COUNT(*) FROM vacations
-                WHERE employee_id = ?
-                AND status != 'مرفوض من المدير'
-                AND status != 'مرفوض من رئيس القسم'
-                AND status != 'مرفوض'
-                AND (
-                    (? BETWEEN start_date AND end_date)
-                    OR (? BETWEEN start_date AND end_date)
-                    OR (start_date BETWEEN ? AND ?)
-                    OR (end_date BETWEEN ? AND ?)
-                )
-            """, (emp_id, start_date, end_date, start_date, end_date, start_date, end_date),
-            commit=False)
-            count = self.db.cursor.fetchone()[0]
-            return count > 0
+            return self.overlap_service.has_conflict(emp_id, start_date, end_date)
         except Exception as e:
             print(f"Error checking vacation conflict: {e}")
             return False
\ No newline at end of file
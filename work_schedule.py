@@ -0,0 +1,114 @@
+import numpy as np
+
+# ترتيب الأيام في المشروع: 0 = السبت ... 6 = الجمعة
+DAY_NAMES = ["السبت", "الأحد", "الإثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة"]
+# الفترات بترتيب بتاتها داخل اليوم: صباحية، مسائية، كامل اليوم
+SHIFTS = ["M", "E", "F"]
+SHIFT_NAMES = {"M": "صباحية", "E": "مسائية", "F": "كامل اليوم"}
+SPECIAL_WORK_STATUSES = ["الندب", "تفرغ"]
+SLOT_COUNT = len(DAY_NAMES) * len(SHIFTS)
+
+
+def slot_bit(day, shift):
+    """رقم البت لليوم والفترة: day*3 + ترتيب الفترة"""
+    return day * len(SHIFTS) + SHIFTS.index(shift)
+
+
+def parse_work_days(work_days):
+    """تحويل نص أيام العمل ("0:M,1:E") إلى قناع بتات، والندب والتفرغ وغير الصالح إلى 0"""
+    mask = 0
+    for item in (work_days or "").split(","):
+        day, _, shift = item.strip().partition(":")
+        if day.isdigit() and int(day) < len(DAY_NAMES) and shift in SHIFTS:
+            mask |= 1 << slot_bit(int(day), shift)
+    return mask
+
+
+def format_work_days(mask):
+    """النص المخزن في employees.work_days لقناع بتات"""
+    return ",".join(f"{day}:{shift}" for day, shift in schedule_entries(mask))
+
+
+def schedule_entries(mask):
+    """أزواج (اليوم، الفترة) المفعلة في القناع بترتيب الأيام"""
+    return [
+        (day, shift)
+        for day in range(len(DAY_NAMES))
+        for shift in SHIFTS
+        if mask >> slot_bit(day, shift) & 1
+    ]
+
+
+def day_shift(mask, day):
+    """فترة العمل في يوم معين أو None"""
+    for shift in SHIFTS:
+        if mask >> slot_bit(day, shift) & 1:
+            return shift
+    return None
+
+
+def covering_bits(day, shift):
+    """بتات من يحضر الفترة: كامل اليوم يغطي الصباحية والمسائية"""
+    bits = 1 << slot_bit(day, shift)
+    if shift != "F":
+        bits |= 1 << slot_bit(day, "F")
+    return bits
+
+
+def describe_work_days(work_days):
+    """وصف أيام العمل بالعربية سطراً لكل يوم"""
+    if work_days in SPECIAL_WORK_STATUSES:
+        return [f"حالة الموظف: {work_days}"]
+    return [f"- {DAY_NAMES[day]}: {SHIFT_NAMES[shift]}" for day, shift in schedule_entries(parse_work_days(work_days))]
+
+
+def mask_matrix(masks):
+    """مصفوفة منطقية (موظف × يوم × فترة) من أقنعة البتات"""
+    masks = np.asarray(masks, dtype=np.uint32)
+    bits = (masks[:, None] >> np.arange(SLOT_COUNT, dtype=np.uint32)) & 1
+    return bits.astype(bool).reshape(len(masks), len(DAY_NAMES), len(SHIFTS))
+
+
+class WorkSchedule:
+    """استعلامات "من يعمل متى" عبر جدول employee_schedule المفهرس وأقنعة work_mask"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def who_works(self, day, shift, department=None):
+        """الموظفون الحاضرون في اليوم والفترة (كامل اليوم يُحسب في الفترتين): (المعرف، الاسم، القسم، الفترة)"""
+        shifts = [shift] if shift == "F" else [shift, "F"]
+        query = f"""
+            SELECT e.id, e.name, e.department, s.shift
+            FROM employee_schedule s
+            JOIN employees e ON e.id = s.employee_id
+            WHERE s.day = ? AND s.shift IN ({', '.join('?' for _ in shifts)})
+        """
+        params = [day, *shifts]
+        if department:
+            query += " AND e.department = ?"
+            params.append(department)
+        query += " ORDER BY e.name, e.id"
+        return self.db.execute_query(query, params, commit=False).fetchall()
+
+    def load_masks(self, department=None):
+        """(المعرفات، الأقسام، الأقنعة) كمصفوفات NumPy لعمليات البتات على كل الموظفين"""
+        query = "SELECT id, department, work_mask FROM employees"
+        params = []
+        if department:
+            query += " WHERE department = ?"
+            params.append(department)
+        rows = self.db.execute_query(query, params, commit=False).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=np.uint32)
+        ids, departments, masks = zip(*rows)
+        return (
+            np.array(ids, dtype=np.int64),
+            np.array(departments, dtype=object),
+            np.array(masks, dtype=np.uint32),
+        )
+
+    def working_ids(self, day, shift, department=None):
+        """نفس who_works بعملية AND واحدة على أقنعة كل الموظفين"""
+        ids, departments, masks = self.load_masks(department)
+        return ids[(masks & covering_bits(day, shift)) != 0]
@@ -0,0 +1,102 @@
+import threading
+import traceback
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerCancelled(Exception):
+    """تُرفع داخل المهمة عند طلب إلغائها"""
+
+
+class WorkerSignals(QObject):
+    """إشارات المهمة الخلفية، تُسلَّم في خيط الواجهة"""
+
+    progress = pyqtSignal(int, str)
+    rows = pyqtSignal(object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """تشغيل fn(worker, *args, **kwargs) على مجمع خيوط Qt بعيداً عن خيط الواجهة"""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """طلب الإلغاء؛ تتوقف المهمة عند أول check_cancelled"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise WorkerCancelled()
+
+    def report_progress(self, value, message=""):
+        self.signals.progress.emit(int(value), message)
+
+    def emit_rows(self, rows):
+        """إرسال دفعة من النتائج إلى الواجهة قبل انتهاء المهمة"""
+        self.signals.rows.emit(rows)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        except WorkerCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+
+class WorkerPool:
+    """إطلاق المهام الخلفية وربط إشاراتها والاحتفاظ بها حتى تنتهي"""
+
+    def __init__(self, thread_pool=None):
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self._active = set()
+
+    def start(self, fn, *args, on_result=None, on_error=None, on_progress=None,
+              on_rows=None, on_cancelled=None, on_finished=None, **kwargs):
+        worker = Worker(fn, *args, **kwargs)
+        signals = worker.signals
+        for signal, slot in (
+            (signals.result, on_result),
+            (signals.error, on_error),
+            (signals.progress, on_progress),
+            (signals.rows, on_rows),
+            (signals.cancelled, on_cancelled),
+            (signals.finished, on_finished),
+        ):
+            if slot:
+                signal.connect(slot)
+        # الاحتفاظ بالمهمة حتى تُسلَّم كل إشاراتها
+        self._active.add(worker)
+        signals.finished.connect(lambda: self._active.discard(worker))
+        self.thread_pool.start(worker)
+        return worker
+
+    def is_busy(self):
+        return bool(self._active)
+
+    def cancel_all(self):
+        for worker in list(self._active):
+            worker.cancel()
+
+    def wait_for_done(self, msecs=-1):
+        """انتظار انتهاء كل المهام (عند إغلاق البرنامج)"""
+        return self.thread_pool.waitForDone(msecs)